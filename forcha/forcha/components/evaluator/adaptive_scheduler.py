@@ -0,0 +1,186 @@
+import numpy as np
+
+
+class Adaptive_Scheduler():
+    """Adaptive Scheduler decides, round by round, which of the enabled evaluation
+    methods should be run, so the total time spent on the evaluation stays within
+    a given budget. The budget is paced evenly over all the training iterations.
+    Every time a method is run, the scheduler measures its cost (wall time) and
+    the change of the contribution ranking it produced. Methods whose rankings
+    were stable in the recent rounds are backed off exponentially, while the
+    remaining budget is given first to the methods that change the ranking the
+    most per second of the evaluation."""
+
+    def __init__(
+        self,
+        methods: list[str],
+        nodes: list,
+        iterations: int,
+        budget: float,
+        tolerance: float = 0.05,
+        max_interval: int = 8,
+        smoothing: float = 0.5
+        ) -> None:
+        """Constructor for the Adaptive Scheduler.
+
+        Parameters
+        ----------
+        methods: list[str]
+            A list of the enabled evaluation methods (compiled flags of the
+            Evaluation_Manager), e.g. ['in_sample_loo', 'in_sample_alpha'].
+        nodes: list
+            A list containing ids of all the nodes engaged in the training.
+        iterations: int
+            A number of training iterations.
+        budget: float
+            A total time (in seconds) that can be spent on the evaluation.
+        tolerance: float, default to 0.05
+            A fraction of the pairs of nodes (involving the nodes evaluated in the round)
+            that can swap their order in the ranking while the ranking is still considered stable.
+        max_interval: int, default to 8
+            Maximal number of rounds between two evaluations with the same method.
+        smoothing: float, default to 0.5
+            A weight of the last measurement in the moving average of the cost.
+
+        Returns
+        -------
+        None
+        """
+        self.methods = list(methods)
+        self.index = {node: position for position, node in enumerate(nodes)}
+        self.iterations = iterations
+        self.budget = float(budget)
+        self.tolerance = tolerance
+        self.max_interval = max(1, max_interval)
+        self.smoothing = smoothing
+        self.spent = 0.
+        self.cost = {method: None for method in self.methods} # Moving average of the cost, None until measured.
+        self.change = {method: 1. for method in self.methods} # Last change of the ranking, maximal until measured.
+        self.streak = {method: 0 for method in self.methods} # Number of consecutive stable evaluations.
+        self.next_due = {method: 0 for method in self.methods} # First iteration at which the method can be run again.
+        self.totals = {method: np.zeros(len(self.index)) for method in self.methods} # Cumulative contributions.
+
+
+    def select(
+        self,
+        iteration: int
+        ) -> list[str]:
+        """Selects the methods that should be run in the current iteration.
+        Methods that were never measured are always selected (as long as the
+        budget is not exhausted), so their cost can be established.
+
+        Parameters
+        ----------
+        iteration: int
+            The current iteration.
+
+        Returns
+        -------
+        list[str]
+            The methods to be run, in the order of their priority.
+        """
+        # The budget is paced, so the unspent budget of the skipped rounds carries over.
+        allowance = self.budget * (iteration + 1) / self.iterations - self.spent
+        remaining = self.budget - self.spent
+        due = [method for method in self.methods if iteration >= self.next_due[method]]
+        due.sort(key = lambda method: (self.cost[method] is not None,
+                                       -self.change[method] / max(self.cost[method] or 0., 1e-9)))
+        selected = []
+        for method in due:
+            if self.cost[method] is None:
+                if allowance > 0:
+                    selected.append(method)
+            elif self.cost[method] <= min(allowance, remaining):
+                selected.append(method)
+                allowance -= self.cost[method]
+                remaining -= self.cost[method]
+        return selected
+
+
+    def record(
+        self,
+        method: str,
+        iteration: int,
+        elapsed: float,
+        values: dict
+        ) -> float:
+        """Records the cost and the results of the evaluation and re-schedules
+        the method.
+
+        Parameters
+        ----------
+        method: str
+            The method that was run.
+        iteration: int
+            The current iteration.
+        elapsed: float
+            The time (in seconds) spent on the evaluation.
+        values: dict
+            A dictionary mapping the nodes' ids to the partial results of the round.
+
+        Returns
+        -------
+        float
+            The change of the ranking caused by the round.
+        """
+        self.spent += elapsed
+        if self.cost[method] is None:
+            self.cost[method] = elapsed
+        else:
+            self.cost[method] = self.smoothing * elapsed + (1 - self.smoothing) * self.cost[method]
+
+        previous = self.totals[method].copy()
+        for node, value in values.items():
+            self.totals[method][self.index[node]] += value
+        # Only the totals of the evaluated nodes change, so only their pairs can swap.
+        evaluated = np.array([self.index[node] for node in values], dtype=int)
+        change = ranking_distance(previous, self.totals[method], evaluated)
+
+        self.change[method] = change
+        if change <= self.tolerance:
+            self.streak[method] += 1
+        else:
+            self.streak[method] = 0
+        self.next_due[method] = iteration + min(2 ** self.streak[method], self.max_interval)
+        return change
+
+
+def ranking_distance(
+    first: np.ndarray,
+    second: np.ndarray,
+    nodes: np.ndarray = None
+    ) -> float:
+    """Returns the fraction of the pairs of nodes that are ordered differently
+    in two rankings (normalized Kendall tau distance, ties counted as an order).
+    If the nodes are passed, only the pairs involving at least one of them
+    are considered, so the change of a small sample is not diluted by the
+    (unchanged) pairs of the rest of the population.
+
+    Parameters
+    ----------
+    first: np.ndarray
+        Scores of the nodes in the first ranking.
+    second: np.ndarray
+        Scores of the nodes in the second ranking.
+    nodes: np.ndarray, default to None
+        Positions of the nodes whose pairs are considered. If None, all the pairs are considered.
+
+    Returns
+    -------
+    float
+    """
+    if len(first) < 2:
+        return 0.
+    if nodes is None:
+        nodes = np.arange(len(first))
+    nodes = np.unique(nodes)
+    if len(nodes) == 0:
+        return 0.
+    # Pairs (node, other) for every node, each pair of two passed nodes counted once.
+    pairs = np.ones((len(nodes), len(first)), dtype=bool)
+    pairs[:, nodes] = np.triu(np.ones((len(nodes), len(nodes)), dtype=bool), k = 1)
+    if not pairs.any():
+        return 0.
+    first_order = np.sign(first[nodes, None] - first[None, :])[pairs]
+    second_order = np.sign(second[nodes, None] - second[None, :])[pairs]
+    return float(np.mean(first_order != second_order))
@@ -2,6 +2,7 @@ import numpy as np
 import copy
 from forcha.models.federated_model import FederatedModel
 from forcha.utils.optimizers import Optimizers
+from forcha.components.evaluator.partial_results import Partial_Results
 from forcha.utils.computations import Aggregators
 from collections import OrderedDict
 
@@ -34,7 +35,7 @@ class Alpha_Amplified():
         """
         
         self.alpha = {node: np.float64(0) for node in nodes} # Hash map containing all the nodes and their respective marginal contribution values.
-        self.partial_alpha = {round:{node: np.float64(0) for node in nodes} for round in range(iterations)} # Hash map containing all the partial alpha scores for each sampled subset.
+        self.partial_alpha = Partial_Results(nodes, iterations) # Array containing all the partial results for each sampled subset (see Partial_Results).
     
 
     def evaluate_round(
@@ -43,7 +44,7 @@ class Alpha_Amplified():
         optimizer_template: Optimizers,
         gradients: OrderedDict,
         nodes_in_sample: list,
-        optimizer: Optimizers,
+        optimizer: dict,
         iteration: int,
         search_length: int,
         final_model: OrderedDict,
@@ -66,8 +67,8 @@ class Alpha_Amplified():
             An OrderedDict containing gradients of the sampled nodes.
         nodes_in_sample: list
             A list containing FederatedNodes that participated in the training.
-        previous_optimizer: Optimizers
-            An instance of the forcha.Optimizers class.
+        previous_optimizer: dict
+            State of the optimizer from the previous round (see Optimizers.state_dict).
         iteration: int
             The current iteration.
         search_length: int
@@ -85,16 +86,14 @@ class Alpha_Amplified():
         
         recorded_values = {}
         model_template.update_weights(final_model)
-        final_model_score = model_template.evaluate_model()[1]
+        final_model_score = model_template.quick_evaluate()[1]
         recorded_values[tuple(gradients.keys())] = final_model_score
         
         for node in nodes_in_sample:
             node_id = node.node_id
             gradients_copy = copy.deepcopy(gradients)
             del gradients_copy[node_id]   
-            optimizer_template.set_weights(previous_delta=copy.deepcopy(optimizer[0]),
-                                           previous_momentum=copy.deepcopy(optimizer[1]),
-                                           learning_rate=copy.deepcopy(optimizer[2]))
+            optimizer_template.load_state_dict(optimizer)
             
             for phi in range(search_length):
                 gradients_copy[(f"{phi + 1}_of_{node.node_id}")] = copy.deepcopy(gradients[node.node_id])
@@ -104,9 +103,9 @@ class Alpha_Amplified():
                 weights=copy.deepcopy(previous_model),
                 delta=grad_avg)
             model_template.update_weights(weights)
-            appended_score = model_template.evaluate_model()[1]
+            appended_score = model_template.quick_evaluate()[1]
             
-            self.partial_alpha[iteration][node_id] = final_model_score - appended_score
+            self.partial_alpha.record(iteration, node_id, final_model_score - appended_score)
             recorded_values[tuple(gradients_copy.keys())] = appended_score 
             print(f"Evaluated alpha-amplication score of client {node_id}")
        
@@ -131,7 +130,7 @@ class Alpha_Amplified():
         return values
         
     
-    def calculate_final_result(self) -> tuple[dict[int: dict], dict[int: float]]:
+    def calculate_final_result(self) -> tuple[Partial_Results, dict[int: float]]:
         """Method used to sum up all the partial LOO scores to obtain
         a final LOO score for each client.
         
@@ -141,11 +140,9 @@ class Alpha_Amplified():
         
         Returns
         -------
-        tuple[dict[int: dict], dict[int: float]]
+        tuple[Partial_Results, dict[int: float]]
         """
         
-        for iteration_results in self.partial_alpha.values():
-            for node, value in iteration_results.items():
-                self.alpha[node] += np.float64(value)
+        self.alpha.update(self.partial_alpha.totals())
         return (self.partial_alpha, self.alpha)
 
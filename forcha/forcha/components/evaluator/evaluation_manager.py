@@ -1,8 +1,11 @@
 import copy
 import os
 import csv
+import time
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+from forcha.components.evaluator.adaptive_scheduler import Adaptive_Scheduler
 from forcha.components.evaluator.alpha_evaluator import Alpha_Amplified
 from forcha.components.evaluator.loo_evaluator import Sample_LOO_Evaluator
 from forcha.components.evaluator.shapley_evaluator import Sample_Shapley_Evaluator
@@ -11,6 +14,7 @@ from forcha.exceptions.evaluatorexception import Sample_Evaluator_Init_Exception
 from forcha.components.settings.evaluator_settings import EvaluatorSettings
 from forcha.utils.optimizers import Optimizers
 from forcha.utils.csv_handlers import save_coalitions
+from forcha.utils.profiler import Profiler
 
 # def compare_for_debug(dict1, dict2):
 #     for (row1, row2) in zip(dict1.values(), dict2.values()):
@@ -39,7 +43,9 @@ class Evaluation_Manager():
         optimizer_template: Optimizers,
         nodes: list[int] = None,
         iterations: int = None,
-        full_debug: bool = False
+        full_debug: bool = False,
+        pipelined: bool = False,
+        pipeline_depth: int = 1
         ) -> None:
         """Manages the process of evaluation. Creates an instance of Evaluation_Manager 
         object, that controls all the instances that perform evaluation. Evaluation
@@ -64,6 +70,14 @@ class Evaluation_Manager():
             Number of iterations.
         full_debug: bool, default to False
             Boolean flag for enabling a full debug mode.
+        pipelined: bool, default to False
+            Boolean flag for enabling a pipelined mode. In the pipelined mode
+            the evaluation of the round is handed to a background executor
+            (see Evaluation_Manager.submit_results), so the next round of training
+            can start immediately.
+        pipeline_depth: int, default to 1
+            Maximal number of rounds that can wait for the evaluation in the
+            pipelined mode. If exceeded, the oldest round is awaited first.
         
         Returns
         -------
@@ -82,6 +96,16 @@ class Evaluation_Manager():
         self.optimizer_template = copy.deepcopy(optimizer_template)
         # Boolean flag for a full debug
         self.full_debug = full_debug
+        # Phase-level instrumentation (no-op unless enabled in the settings)
+        self.profiler = Profiler(
+            enabled = getattr(settings, 'profiling', False),
+            node_name = 'evaluation_manager'
+            )
+        # Background executor for the pipelined mode
+        self.init_pipeline(
+            pipelined = pipelined,
+            pipeline_depth = pipeline_depth
+        )
         
         # Sets up a flag for each available method of evaluation.
         self.compiled_flags = []
@@ -126,10 +150,10 @@ class Evaluation_Manager():
             self.search_length = settings.line_search_length
 
         # Sets up the scheduler
-        if settings.scheduler == True:
-            self.scheduler = settings.schedule
-        else:
-            self.scheduler = {flag: [iteration for iteration in range(iterations)] for flag in self.compiled_flags}
+        self.init_scheduler(
+            settings = settings,
+            iterations = iterations
+        )
     
         
     # def set_leading_method(self,
@@ -153,6 +177,96 @@ class Evaluation_Manager():
     #         raise NameError # TODO: Add custom error.
     
     
+    def init_scheduler(
+        self,
+        settings: EvaluatorSettings,
+        iterations: int
+        ) -> None:
+        """Sets up the scheduler of the evaluation. If the settings contain
+        an evaluation_budget, the methods are scheduled adaptively by the 
+        Adaptive_Scheduler. Otherwise, the static schedule from the settings
+        is used (or every iteration is evaluated with every enabled method).
+        
+        Parameters
+        ----------
+        settings: EvaluatorSettings
+            Settings of the evaluation manager.
+        iterations: int
+            Number of iterations.
+        
+        Returns
+        -------
+        None
+        """
+        if getattr(settings, 'evaluation_budget', None) is not None:
+            self.adaptive_scheduler = Adaptive_Scheduler(
+                methods = self.compiled_flags,
+                nodes = self.nodes,
+                iterations = iterations,
+                budget = settings.evaluation_budget
+            )
+        else:
+            self.adaptive_scheduler = None
+        if settings.scheduler == True:
+            self.scheduler = settings.schedule
+        else:
+            self.scheduler = {flag: [iteration for iteration in range(iterations)] for flag in self.compiled_flags}
+    
+    
+    def scheduled_methods(
+        self,
+        iteration: int
+        ) -> list[str]:
+        """Returns the evaluation methods (compiled flags) scheduled for the iteration.
+        
+        Parameters
+        ----------
+        iteration: int
+            The current iteration.
+        
+        Returns
+        -------
+        list[str]
+        """
+        if self.adaptive_scheduler is not None:
+            return self.adaptive_scheduler.select(iteration = iteration)
+        return [flag for flag in self.compiled_flags if iteration in self.scheduler[flag]]
+    
+    
+    def record_evaluation(
+        self,
+        flag: str,
+        iteration: int,
+        started: float,
+        values: dict
+        ) -> None:
+        """Reports the cost and the partial results of the evaluation to the
+        adaptive scheduler (if enabled).
+        
+        Parameters
+        ----------
+        flag: str
+            The evaluation method.
+        iteration: int
+            The current iteration.
+        started: float
+            The time.perf_counter() reading from the start of the evaluation.
+        values: dict
+            Partial results of the method for the iteration.
+        
+        Returns
+        -------
+        None
+        """
+        if self.adaptive_scheduler is not None:
+            self.adaptive_scheduler.record(
+                method = flag,
+                iteration = iteration,
+                elapsed = time.perf_counter() - started,
+                values = values
+            )
+    
+    
     def preserve_previous_model(
         self,
         previous_model: OrderedDict
@@ -197,23 +311,22 @@ class Evaluation_Manager():
     
     def preserve_previous_optimizer(
         self,
-        previous_optimizer: tuple[OrderedDict, OrderedDict, float]):
-        """Preserves the Optimizer from the previous round by copying 
-        its structure and using it as an attribute's value. Should
-        be called each training round before the proper training
-        commences.
+        previous_optimizer: dict):
+        """Preserves the Optimizer from the previous round by storing
+        its state as an attribute's value. Should be called each training 
+        round before the proper training commences.
         
         Parameters
         ----------
-        previous_optimizer: tuple[OrderedDict, OrderedDict, float]
-            Tuple containing data of the optimizer, of the form:
-            tuple[previous_delta, previous_momentum, learning_rate]
+        previous_optimizer: dict
+            State of the optimizer, obtained from the Optimizers.state_dict().
+            The state is already a copy, so it is stored as it is.
         
         Returns
         -------
         None
         """
-        self.previous_optimizer = copy.deepcopy(previous_optimizer)
+        self.previous_optimizer = previous_optimizer
     
     
     def get_last_results(
@@ -234,11 +347,186 @@ class Evaluation_Manager():
         return self.default_method.return_last_value(iteration = iteration)
 
     
-    def track_results(
+    def init_pipeline(
+        self,
+        pipelined: bool = False,
+        pipeline_depth: int = 1
+        ) -> None:
+        """Sets up the background executor used in the pipelined mode.
+        A single worker thread is used, so the rounds are always evaluated 
+        in the order of their submission and the templates of the model and 
+        the optimizer are never shared between two evaluations.
+        
+        Parameters
+        ----------
+        pipelined: bool, default to False
+            Boolean flag for enabling a pipelined mode.
+        pipeline_depth: int, default to 1
+            Maximal number of rounds that can wait for the evaluation.
+        
+        Returns
+        -------
+        None
+        """
+        self.pipelined = pipelined
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.pending_results = []
+        if self.pipelined:
+            self.executor = ThreadPoolExecutor(
+                max_workers = 1,
+                thread_name_prefix = 'evaluation_manager'
+                )
+        else:
+            self.executor = None
+    
+    
+    def submit_results(
         self,
         gradients: OrderedDict,
         nodes_in_sample: list,
         iteration: int):
+        """Pipelined counterpart of the Evaluation_Manager.track_results().
+        Takes a snapshot of the preserved models and the optimizer and
+        hands the evaluation of the round to the background executor, so
+        the orchestrator can commence the next round of training immediately.
+        The results are merged at the Evaluation_Manager.finalize_tracking().
+        If the pipelined mode is disabled, the evaluation is performed synchronously.
+        
+        Parameters
+        ----------
+        gradients: OrderedDict
+            An OrderedDict containing gradients of the sampled nodes. Must not
+            be modified by the caller after the submission.
+        nodes_in_sample: list
+            A list containing id's of the nodes that were sampled.
+        iteration: int
+            The current iteration.
+        
+        Returns
+        -------
+        None
+        """
+        if not self.pipelined:
+            self.track_results(
+                gradients = gradients,
+                nodes_in_sample = nodes_in_sample,
+                iteration = iteration
+                )
+            return
+        # Backpressure: the number of rounds waiting for evaluation is bounded.
+        self.collect_finished(block = len(self.pending_results) >= self.pipeline_depth)
+        # The preserved attributes are replaced (not modified) every round,
+        # so references are sufficient to snapshot the state of the round.
+        self.pending_results.append(
+            self.executor.submit(
+                self.track_results,
+                gradients = gradients,
+                nodes_in_sample = nodes_in_sample,
+                iteration = iteration,
+                previous_model = self.previous_c_model,
+                updated_model = self.updated_c_model,
+                previous_optimizer = self.previous_optimizer
+                )
+            )
+    
+    
+    def collect_finished(
+        self,
+        block: bool = False
+        ) -> None:
+        """Collects the rounds that were evaluated in the background,
+        re-raising any exception that occured during the evaluation.
+        
+        Parameters
+        ----------
+        block: bool, default to False
+            If True, waits at least for the oldest pending round.
+        
+        Returns
+        -------
+        None
+        """
+        if block and self.pending_results:
+            self.pending_results[0].result()
+        still_pending = []
+        for future in self.pending_results:
+            if future.done():
+                future.result()
+            else:
+                still_pending.append(future)
+        self.pending_results = still_pending
+    
+    
+    def wait_for_results(self) -> None:
+        """Blocks until every round submitted in the pipelined mode is
+        evaluated and shuts down the background executor.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+        for future in self.pending_results:
+            future.result()
+        self.pending_results = []
+        if self.executor is not None:
+            self.executor.shutdown(wait = True)
+            self.executor = None
+            self.pipelined = False
+    
+    
+    def state_dict(self) -> dict:
+        """Returns the (partial) results of the evaluators, preserved in the
+        checkpoints. In the pipelined mode, waits for all the submitted rounds first.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        dict
+            Copies of the attributes of the enabled evaluators.
+        """
+        for future in self.pending_results:
+            future.result()
+        self.pending_results = []
+        # The factory of the pool (parallel evaluators) is not a part of the results.
+        return {name: copy.deepcopy({key: value for key, value in vars(getattr(self, name)).items() if key != 'pool'})
+                for name in ['sample_evaluator', 'shapley_evaluator', 'alpha_evaluator', 'adaptive_scheduler']
+                if getattr(self, name, None) is not None}
+    
+    
+    def load_state_dict(
+        self,
+        state_dict: dict
+        ) -> None:
+        """Restores the results of the evaluators obtained from the state_dict().
+        
+        Parameters
+        ----------
+        state_dict: dict
+            Results of the evaluators.
+        
+        Returns
+        -------
+        None
+        """
+        for name, state in state_dict.items():
+            vars(getattr(self, name)).update(copy.deepcopy(state))
+    
+    
+    def track_results(
+        self,
+        gradients: OrderedDict,
+        nodes_in_sample: list,
+        iteration: int,
+        previous_model: OrderedDict = None,
+        updated_model: OrderedDict = None,
+        previous_optimizer: dict = None):
         """Method used to track_results after each training round.
         Because the Orchestrator abstraction should be free of any
         unnecessary encumbrance, the Evaluation_Manager.track_results()
@@ -253,24 +541,48 @@ class Evaluation_Manager():
             A list containing id's of the nodes that were sampled.
         iteration: int
             The current iteration.
+        previous_model: OrderedDict, default to None
+            Weights of the previous (central) model. If None, the last
+            preserved previous model is used.
+        updated_model: OrderedDict, default to None
+            Weights of the updated (central) model. If None, the last
+            preserved updated model is used.
+        previous_optimizer: dict, default to None
+            State of the optimizer from the previous round. If None, the last
+            preserved optimizer is used.
         
         Returns
         -------
         None
         """
+        if previous_model is None:
+            previous_model = self.previous_c_model
+        if updated_model is None:
+            updated_model = self.updated_c_model
+        if previous_optimizer is None:
+            previous_optimizer = self.previous_optimizer
+        scheduled = self.scheduled_methods(iteration = iteration)
         
         # In-sample LOO
         if self.flag_sample_evaluator:
-            if iteration in self.scheduler['in_sample_loo']: # Checks scheduler
-                debug_values = self.sample_evaluator.evaluate_round(
-                    model_template = self.model_template,
-                    optimizer_template = self.optimizer_template,
-                    gradients = gradients,
-                    nodes_in_sample = nodes_in_sample,
+            if 'in_sample_loo' in scheduled: # Checks scheduler
+                started = time.perf_counter()
+                with self.profiler.phase('evaluation_loo', iteration=iteration):
+                    debug_values = self.sample_evaluator.evaluate_round(
+                        model_template = self.model_template,
+                        optimizer_template = self.optimizer_template,
+                        gradients = gradients,
+                        nodes_in_sample = nodes_in_sample,
+                        iteration = iteration,
+                        optimizer = previous_optimizer,
+                        final_model = copy.deepcopy(updated_model),
+                        previous_model = copy.deepcopy(previous_model)
+                        )
+                self.record_evaluation(
+                    flag = 'in_sample_loo',
                     iteration = iteration,
-                    optimizer = copy.deepcopy(self.previous_optimizer),
-                    final_model = copy.deepcopy(self.updated_c_model),
-                    previous_model= copy.deepcopy(self.previous_c_model)
+                    started = started,
+                    values = self.sample_evaluator.partial_psi[iteration]
                     )
                 # Preserving debug values (if enabled)
                 if self.full_debug:
@@ -293,16 +605,24 @@ class Evaluation_Manager():
 
         # In-sample Shapley
         if self.flag_samplesh_evaluator:
-            if iteration in self.scheduler['in_sample_shap']: # Checks scheduler
-                debug_values = self.shapley_evaluator.evaluate_round(
-                    model_template = self.model_template,
-                    optimizer_template = self.optimizer_template,
-                    gradients = gradients,
-                    nodes_in_sample = nodes_in_sample,
+            if 'in_sample_shap' in scheduled: # Checks scheduler
+                started = time.perf_counter()
+                with self.profiler.phase('evaluation_shap', iteration=iteration):
+                    debug_values = self.shapley_evaluator.evaluate_round(
+                        model_template = self.model_template,
+                        optimizer_template = self.optimizer_template,
+                        gradients = gradients,
+                        nodes_in_sample = nodes_in_sample,
+                        iteration = iteration,
+                        optimizer = previous_optimizer,
+                        final_model = copy.deepcopy(updated_model),
+                        previous_model = copy.deepcopy(previous_model)
+                        )
+                self.record_evaluation(
+                    flag = 'in_sample_shap',
                     iteration = iteration,
-                    optimizer = copy.deepcopy(self.previous_optimizer),
-                    final_model = copy.deepcopy(self.updated_c_model),
-                    previous_model= copy.deepcopy(self.previous_c_model)
+                    started = started,
+                    values = self.shapley_evaluator.partial_shapley[iteration]
                     )
                 # Preserving debug values (if enabled)
                 if self.full_debug:
@@ -325,17 +645,25 @@ class Evaluation_Manager():
     
         # In-sample ALPHA
         if self.flag_alpha_evaluator:
-            if iteration in self.scheduler['in_sample_alpha']: # Checks scheduler
-                debug_values = self.alpha_evaluator.evaluate_round(
-                    model_template = self.model_template,
-                    optimizer_template = self.optimizer_template,
-                    gradients = gradients,
-                    nodes_in_sample = nodes_in_sample,
+            if 'in_sample_alpha' in scheduled: # Checks scheduler
+                started = time.perf_counter()
+                with self.profiler.phase('evaluation_alpha', iteration=iteration):
+                    debug_values = self.alpha_evaluator.evaluate_round(
+                        model_template = self.model_template,
+                        optimizer_template = self.optimizer_template,
+                        gradients = gradients,
+                        nodes_in_sample = nodes_in_sample,
+                        iteration = iteration,
+                        search_length = self.search_length,
+                        optimizer = previous_optimizer,
+                        final_model = copy.deepcopy(updated_model),
+                        previous_model = copy.deepcopy(previous_model))
+                self.record_evaluation(
+                    flag = 'in_sample_alpha',
                     iteration = iteration,
-                    search_length = self.search_length,
-                    optimizer = copy.deepcopy(self.previous_optimizer),
-                    final_model = copy.deepcopy(self.updated_c_model),
-                    previous_model = copy.deepcopy(self.previous_c_model))
+                    started = started,
+                    values = self.alpha_evaluator.partial_alpha[iteration]
+                    )
             
                             # Preserving debug values (if enabled)
                 if self.full_debug:
@@ -355,6 +683,27 @@ class Evaluation_Manager():
                             iteration=iteration,
                             mode=1
                             )
+        
+        # Coalitions evaluated on the model template are attributed to this round.
+        model_records = self.model_template.profiler.pop_records()
+        for entry in model_records:
+            entry['iteration'] = iteration
+        self.profiler.extend(model_records)
+
+
+    def pop_profile(self) -> list[dict]:
+        """Returns the records collected by the profiler of the Evaluation
+        Manager (including the rounds evaluated in the background) and clears it.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        list[dict]
+        """
+        return self.profiler.pop_records()
 
 
     def finalize_tracking(
@@ -378,6 +727,8 @@ class Evaluation_Manager():
         
         None
         """
+        # Merging the rounds evaluated in the pipelined mode.
+        self.wait_for_results()
         results = {'partial': {}, 'full': {}}
 
         # if self.flag_shap_or:
@@ -401,17 +752,10 @@ class Evaluation_Manager():
             results['partial']['partial_alpha'] = partial_alpha
             results['full']['alpha'] = alpha
                 
-        # Preserve partial results
+        # Preserve partial results (columns == nodes id's followed by the iteration)
         for metric, values in results['partial'].items():
             s_path = os.path.join(path, (str(metric) + '.csv'))
-            field_names = self.nodes
-            field_names.append('iteration') # Field names == nodes id's (keys)
-            with open(s_path, 'w+', newline='') as csv_file:
-                csv_writer = csv.DictWriter(csv_file, fieldnames=field_names)
-                csv_writer.writeheader()
-                for iteration, row in values.items():
-                    row['iteration'] = iteration
-                    csv_writer.writerow(row)
+            values.to_csv(s_path)
         
         # Preserve final results
         for metric, values in results['full'].items():
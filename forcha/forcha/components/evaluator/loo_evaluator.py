@@ -7,6 +7,7 @@ import numpy as np
 from forcha.utils.computations import Aggregators
 from forcha.models.federated_model import FederatedModel
 from forcha.utils.optimizers import Optimizers
+from forcha.components.evaluator.partial_results import Partial_Results
 
 
 class Sample_LOO_Evaluator():
@@ -37,7 +38,7 @@ class Sample_LOO_Evaluator():
         """
         
         self.psi = {node: np.float64(0) for node in nodes} # Hash map containing all the nodes and their respective marginal contribution values.
-        self.partial_psi = {round:{node: np.float64(0) for node in nodes} for round in range(iterations)} # Hash map containing all the partial psi for each sampled subset.
+        self.partial_psi = Partial_Results(nodes, iterations) # Array containing all the partial results for each sampled subset (see Partial_Results).
 
 
     def evaluate_round(
@@ -46,7 +47,7 @@ class Sample_LOO_Evaluator():
         optimizer_template: Optimizers,
         gradients: OrderedDict,
         nodes_in_sample: list,
-        optimizer: Optimizers,
+        optimizer: dict,
         iteration: int,
         final_model: OrderedDict,
         previous_model: OrderedDict,
@@ -68,8 +69,8 @@ class Sample_LOO_Evaluator():
             An OrderedDict containing gradients of the sampled nodes.
         nodes_in_sample: list
             A list containing FederatedNodes that participated in the training.
-        previous_optimizer: Optimizers
-            An instance of the forcha.Optimizers class.
+        previous_optimizer: dict
+            State of the optimizer from the previous round (see Optimizers.state_dict).
         iteration: int
             The current iteration.
         final_model: FederatedModel
@@ -86,32 +87,30 @@ class Sample_LOO_Evaluator():
         recorded_values = {}
         
         model_template.update_weights(final_model)
-        final_model_score = model_template.evaluate_model()[1]
+        final_model_score = model_template.quick_evaluate()[1]
         recorded_values[tuple(gradients.keys())] = final_model_score
         
         for node in nodes_in_sample:
             node_id = node.node_id
             gradients_copy = copy.deepcopy(gradients)
             del gradients_copy[node_id]
-            optimizer_template.set_weights(previous_delta=copy.deepcopy(optimizer[0]),
-                                           previous_momentum=copy.deepcopy(optimizer[1]),
-                                           learning_rate=copy.deepcopy(optimizer[2]))
+            optimizer_template.load_state_dict(optimizer)
             grad_avg = Aggregators.compute_average(gradients_copy)
             weights = optimizer_template.fed_optimize(
                 weights=copy.deepcopy(previous_model),
                 delta = grad_avg
                 )
             model_template.update_weights(weights)
-            score = model_template.evaluate_model()[1]
+            score = model_template.quick_evaluate()[1]
             
-            self.partial_psi[iteration][node_id] = final_model_score - score
+            self.partial_psi.record(iteration, node_id, final_model_score - score)
             recorded_values[tuple(sorted(gradients_copy.keys()))] = score
             print(f"Evaluated LOO score of client {node_id}")
         if return_coalitions == True:
             return recorded_values
 
 
-    def calculate_final_result(self) -> tuple[dict[int: dict], dict[int: float]]:
+    def calculate_final_result(self) -> tuple[Partial_Results, dict[int: float]]:
         """Method used to sum up all the partial LOO scores to obtain
         a final LOO score for each client.
         
@@ -121,10 +120,8 @@ class Sample_LOO_Evaluator():
         
         Returns
         -------
-        tuple[dict[int: dict], dict[int: float]]
+        tuple[Partial_Results, dict[int: float]]
         """
         
-        for iteration_results in self.partial_psi.values():
-            for node, value in iteration_results.items():
-                self.psi[node] += np.float64(value)
+        self.psi.update(self.partial_psi.totals())
         return (self.partial_psi, self.psi)
\ No newline at end of file
@@ -13,7 +13,7 @@ from forcha.utils.computations import Aggregators
 def calculate_alpha(
     node_id: int,
     gradients: OrderedDict,
-    optimizer: Optimizers,
+    optimizer: dict,
     previous_model: FederatedModel,
     baseline_score: float,
     model_template: FederatedModel,
@@ -24,22 +24,18 @@ def calculate_alpha(
     recorded_values = {}
     node_gradient = copy.deepcopy(gradients[node_id])
     del gradients[node_id]
-    optimizer_template.set_weights(
-        previous_delta=copy.deepcopy(optimizer[0]),
-        previous_momentum=copy.deepcopy(optimizer[1]),
-        learning_rate=copy.deepcopy(optimizer[2])
-        )    
+    optimizer_template.load_state_dict(optimizer)    
     # Creating 'appended' gradients    
     for phi in range(search_length):
         gradients[(f"{phi + 1}_of_{node_id}")] = copy.deepcopy(node_gradient)
     # Calculating new score form appended gradients
     grad_avg = Aggregators.compute_average(gradients)
     weights = optimizer_template.fed_optimize(
-        weights=copy.deepcopy(previous_model.get_weights()),
+        weights=copy.deepcopy(previous_model),
         delta = grad_avg
         )
     model_template.update_weights(weights)
-    score = model_template.evaluate_model()[1]
+    score = model_template.quick_evaluate()[1]
     recorded_values[tuple(gradients.keys())] = score
     lsaa = baseline_score - score
     
@@ -68,6 +64,7 @@ class Parallel_Alpha_Amplified(Alpha_Amplified):
         None
         """
         super().__init__(nodes, iterations)
+        self.pool = Pool # Factory of the pool of workers (see Parallel_Manager).
     
     
     def evaluate_round(
@@ -76,7 +73,7 @@ class Parallel_Alpha_Amplified(Alpha_Amplified):
         optimizer_template: Optimizers,
         gradients: OrderedDict,
         nodes_in_sample: list,
-        optimizer: Optimizers,
+        optimizer: dict,
         iteration: int,
         search_length: int,
         final_model: OrderedDict,
@@ -99,8 +96,8 @@ class Parallel_Alpha_Amplified(Alpha_Amplified):
             An OrderedDict containing gradients of the sampled nodes.
         nodes_in_sample: list
             A list containing FederatedNodes that participated in the training.
-        previous_optimizer: Optimizers
-            An instance of the forcha.Optimizers class.
+        previous_optimizer: dict
+            State of the optimizer from the previous round (see Optimizers.state_dict).
         iteration: int
             The current iteration.
         search_length: int
@@ -120,10 +117,10 @@ class Parallel_Alpha_Amplified(Alpha_Amplified):
         recorded_values = {}
         
         model_template.update_weights(final_model)
-        final_model_score = model_template.evaluate_model()[1]
+        final_model_score = model_template.quick_evaluate()[1]
         recorded_values[tuple(gradients.keys())] = final_model_score
         
-        with Pool(len(nodes_in_sample)) as pool:
+        with self.pool(len(nodes_in_sample)) as pool:
             results = [pool.apply_async(
                 calculate_alpha, 
                 (node.node_id, 
@@ -139,7 +136,7 @@ class Parallel_Alpha_Amplified(Alpha_Amplified):
             for result in results:
                 node_id, recorded, alpha_score = result.get()
                 recorded_values.update(recorded)
-                self.partial_alpha[iteration][node_id] = alpha_score
+                self.partial_alpha.record(iteration, node_id, alpha_score)
         
         if return_coalitions == True:
             return recorded_values
\ No newline at end of file
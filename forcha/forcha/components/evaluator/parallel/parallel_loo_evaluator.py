@@ -13,7 +13,7 @@ from forcha.utils.computations import Aggregators
 def calculate_psi(
     node_id: int,
     gradients: OrderedDict,
-    optimizer: Optimizers,
+    optimizer: dict,
     previous_model: FederatedModel,
     baseline_score: float,
     model_template: FederatedModel,
@@ -22,18 +22,14 @@ def calculate_psi(
     
     recorded_values = {}
     del gradients[node_id]
-    optimizer_template.set_weights(
-        previous_delta=copy.deepcopy(optimizer[0]),
-        previous_momentum=copy.deepcopy(optimizer[1]),
-        learning_rate=copy.deepcopy(optimizer[2])
-        )
+    optimizer_template.load_state_dict(optimizer)
     grad_avg = Aggregators.compute_average(gradients)
     weights = optimizer_template.fed_optimize(
         weights=copy.deepcopy(previous_model),
         delta = grad_avg
         )
     model_template.update_weights(weights)
-    score = model_template.evaluate_model()[1]
+    score = model_template.quick_evaluate()[1]
     recorded_values[tuple(sorted(gradients.keys()))] = score
     psi = baseline_score - score
     
@@ -62,6 +58,7 @@ class Parallel_Sample_LOO_Evaluator(Sample_LOO_Evaluator):
         None
         """
         super().__init__(nodes, iterations)
+        self.pool = Pool # Factory of the pool of workers (see Parallel_Manager).
     
     
     def evaluate_round(
@@ -70,7 +67,7 @@ class Parallel_Sample_LOO_Evaluator(Sample_LOO_Evaluator):
         optimizer_template: Optimizers,
         gradients: OrderedDict,
         nodes_in_sample: list,
-        optimizer: Optimizers,
+        optimizer: dict,
         iteration: int,
         final_model: OrderedDict,
         previous_model: OrderedDict,
@@ -92,8 +89,8 @@ class Parallel_Sample_LOO_Evaluator(Sample_LOO_Evaluator):
             An OrderedDict containing gradients of the sampled nodes.
         nodes_in_sample: list
             A list containing FederatedNodes that participated in the training.
-        previous_optimizer: Optimizers
-            An instance of the forcha.Optimizers class.
+        previous_optimizer: dict
+            State of the optimizer from the previous round (see Optimizers.state_dict).
         iteration: int
             The current iteration.
         final_model: FederatedModel
@@ -111,10 +108,10 @@ class Parallel_Sample_LOO_Evaluator(Sample_LOO_Evaluator):
         recorded_values = {}
         
         model_template.update_weights(final_model)
-        final_model_score = model_template.evaluate_model()[1]
+        final_model_score = model_template.quick_evaluate()[1]
         recorded_values[tuple(gradients.keys())] = final_model_score
         
-        with Pool(len(nodes_in_sample)) as pool:
+        with self.pool(len(nodes_in_sample)) as pool:
             results = [pool.apply_async(
                 calculate_psi, 
                 (node.node_id, 
@@ -129,7 +126,7 @@ class Parallel_Sample_LOO_Evaluator(Sample_LOO_Evaluator):
             for result in results:
                 node_id, recorded, psi_score = result.get()
                 recorded_values.update(recorded)
-                self.partial_psi[iteration][node_id] = psi_score
+                self.partial_psi.record(iteration, node_id, psi_score)
         
         if return_coalitions == True:
             return recorded_values
\ No newline at end of file
@@ -11,6 +11,7 @@ from forcha.models.federated_model import FederatedModel
 from forcha.components.settings.evaluator_settings import EvaluatorSettings
 from forcha.utils.optimizers import Optimizers
 from forcha.utils.csv_handlers import save_coalitions
+from forcha.utils.profiler import Profiler
 
 
 class Parallel_Manager(Evaluation_Manager):
@@ -22,7 +23,10 @@ class Parallel_Manager(Evaluation_Manager):
         nodes: list[int] = None,
         iterations: int = None,
         full_debug: bool = False,
-        number_of_workers: int = 20
+        number_of_workers: int = 20,
+        pipelined: bool = False,
+        pipeline_depth: int = 1,
+        distributed = None
         ) -> None:
         """Manages the process of evaluation. Creates an instance of Evaluation_Manager 
         object, that controls all the instances that perform evaluation. Evaluation
@@ -49,6 +53,14 @@ class Parallel_Manager(Evaluation_Manager):
             Boolean flag for enabling a full debug mode.
         number_of_workers: int, default to 20
             Number of workers (if any) that will distribute the computations.
+        pipelined: bool, default to False
+            Boolean flag for enabling a pipelined mode (see Evaluation_Manager).
+        pipeline_depth: int, default to 1
+            Maximal number of rounds that can wait for the evaluation in the
+            pipelined mode.
+        distributed: forcha.utils.distributed.Distributed_Backend, default to None
+            If provided, the computations are distributed over the workers of
+            the backend instead of the multiprocessing pool.
         
         Returns
         -------
@@ -68,6 +80,16 @@ class Parallel_Manager(Evaluation_Manager):
         self.optimizer_template = copy.deepcopy(optimizer_template)
         # Boolean flag for a full debug
         self.full_debug = full_debug
+        # Phase-level instrumentation (no-op unless enabled in the settings)
+        self.profiler = Profiler(
+            enabled = getattr(settings, 'profiling', False),
+            node_name = 'evaluation_manager'
+            )
+        # Background executor for the pipelined mode
+        self.init_pipeline(
+            pipelined = pipelined,
+            pipeline_depth = pipeline_depth
+        )
         
         # Sets up a flag for each available method of evaluation.
         self.compiled_flags = []
@@ -111,9 +133,14 @@ class Parallel_Manager(Evaluation_Manager):
                 iterations = iterations
                 )
             self.search_length = settings.line_search_length
+        # Computations distributed over the workers of the distributed backend.
+        if distributed is not None:
+            for name in ['sample_evaluator', 'shapley_evaluator', 'alpha_evaluator']:
+                if hasattr(self, name):
+                    getattr(self, name).pool = distributed.pool
 
         # Sets up the scheduler
-        if settings.scheduler == True:
-            self.scheduler = settings.schedule
-        else:
-            self.scheduler = {flag: [iteration for iteration in range(iterations)] for flag in self.compiled_flags}
\ No newline at end of file
+        self.init_scheduler(
+            settings = settings,
+            iterations = iterations
+        )
\ No newline at end of file
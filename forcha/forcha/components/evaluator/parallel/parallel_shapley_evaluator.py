@@ -2,7 +2,6 @@ import copy
 from multiprocessing import Pool
 from collections import OrderedDict
 from _collections_abc import Generator
-import math
 
 import numpy as np
 
@@ -10,14 +9,14 @@ from forcha.components.evaluator.shapley_evaluator import Sample_Shapley_Evaluat
 from forcha.components.evaluator.shapley_evaluator import select_gradients
 from forcha.models.federated_model import FederatedModel
 from forcha.utils.optimizers import Optimizers
-from forcha.utils.computations import Subsets
+from forcha.utils.computations import Coalition_Index
 from forcha.utils.computations import Aggregators
 
 
 def calculate_coalition_value(
     coalition: list,
     gradients: OrderedDict,
-    optimizer: Optimizers,
+    optimizer: dict,
     previous_model: OrderedDict,
     model_template: FederatedModel,
     optimizer_template: Optimizers,
@@ -28,18 +27,14 @@ def calculate_coalition_value(
             gradients = gradients,
             query = coalition
         )
-        optimizer_template.set_weights(
-            previous_delta=copy.deepcopy(optimizer[0]),
-            previous_momentum=copy.deepcopy(optimizer[1]),
-            learning_rate=copy.deepcopy(optimizer[2])
-        )
+        optimizer_template.load_state_dict(optimizer)
         grad_avg = Aggregators.compute_average(coalitions_gradients)
         weights = optimizer_template.fed_optimize(
             weights=copy.deepcopy(previous_model),
             delta = grad_avg
         )
         model_template.update_weights(weights)
-        score = model_template.evaluate_model()[1]
+        score = model_template.quick_evaluate()[1]
         result[tuple(sorted(coalition))] = score
         
         return result
@@ -93,6 +88,7 @@ class Parallel_Sample_Shapley_Evaluator(Sample_Shapley_Evaluator):
         None
         """
         super().__init__(nodes, iterations)
+        self.pool = Pool # Factory of the pool of workers (see Parallel_Manager).
         self.number_of_workers = number_of_workers
 
     
@@ -102,7 +98,7 @@ class Parallel_Sample_Shapley_Evaluator(Sample_Shapley_Evaluator):
         optimizer_template: Optimizers,
         gradients: OrderedDict,
         nodes_in_sample: list,
-        optimizer: Optimizers,
+        optimizer: dict,
         iteration: int,
         final_model: OrderedDict,
         previous_model: OrderedDict,
@@ -124,8 +120,8 @@ class Parallel_Sample_Shapley_Evaluator(Sample_Shapley_Evaluator):
             An OrderedDict containing gradients of the sampled nodes.
         nodes_in_sample: list
             A list containing FederatedNodes that participated in the training.
-        previous_optimizer: Optimizers
-            An instance of the forcha.Optimizers class.
+        previous_optimizer: dict
+            State of the optimizer from the previous round (see Optimizers.state_dict).
         iteration: int
             The current iteration.
         final_model: FederatedModel
@@ -142,52 +138,38 @@ class Parallel_Sample_Shapley_Evaluator(Sample_Shapley_Evaluator):
         operation_counter = 0
         number_of_operations = 2 ** (len(nodes_in_sample)) - 1
         
-        # Maps every coalition to it's value, implemented to decrease the time complexity.
-        recorded_values = {}        
-        
         # Converting list of FederatedNode objects to the int representing their identiity.
         nodes_in_sample = [node.node_id for node in nodes_in_sample] 
-        # Forming superset of all the possible coalitions.
-        superset = Subsets.form_superset(nodes_in_sample, return_dict=False)
-        if len(superset) < self.number_of_workers:
-            self.number_of_workers = len(superset)
+        # Maps every coalition (encoded as a bitmask) to it's value.
+        coalition_index = Coalition_Index(nodes_in_sample)
+        masks = list(coalition_index.masks())
+        if len(masks) < self.number_of_workers:
+            self.number_of_workers = len(masks)
         chunked = chunker(
-            seq = superset,
+            seq = masks,
             size = self.number_of_workers
         )
         
         for chunk in chunked:
-            with Pool(self.number_of_workers) as pool:
+            with self.pool(self.number_of_workers) as pool:
                 results = [pool.apply_async(
                     calculate_coalition_value,
-                        (coalition,
+                        (coalition_index.coalition(mask),
                         copy.deepcopy(gradients),
                         copy.deepcopy(optimizer),
                         copy.deepcopy(previous_model),
                         model_template,
                         optimizer_template))
-                        for coalition in chunk]
+                        for mask in chunk]
                 for result in results:
-                    coalition = result.get()
-                    recorded_values.update(coalition)
+                    for coalition, score in result.get().items():
+                        coalition_index.record(coalition_index.mask(coalition), score)
             operation_counter += len(chunk)
             print(f"Completed {operation_counter} out of {number_of_operations} operations")
         print("Finished evaluating all of the coalitions. Commencing calculation of individual Shapley values.")
-        for node in nodes_in_sample:
-            shap = 0.0
-            coalitions_of_interest = Subsets.select_subsets(
-                coalitions = superset,
-                searched_node = node
-            )
-            for coalition in coalitions_of_interest:
-                coalition_without_client = tuple(sorted(coalition))
-                coalition_with_client = tuple(sorted(tuple((coalition)) + (node,))) #TODO: Make a more elegant solution...
-                coalition_without_client_score = recorded_values[coalition_without_client]
-                coalition_with_client_score = recorded_values[coalition_with_client]
-                possible_combinations = math.comb((len(nodes_in_sample) - 1), len(coalition_without_client))
-                divisor = 1 / possible_combinations
-                shap += divisor * (coalition_with_client_score - coalition_without_client_score)
-            self.partial_shapley[iteration][node] = shap / len(nodes_in_sample)
+        # Marginal contributions computed with a vectorized mask arithmetic.
+        for node, shap in coalition_index.shapley_values().items():
+            self.partial_shapley.record(iteration, node, shap)
         
         if return_coalitions == True:
-            return recorded_values
\ No newline at end of file
+            return coalition_index.to_dict()
\ No newline at end of file
@@ -0,0 +1,131 @@
+import csv
+
+import numpy as np
+
+
+class Partial_Results():
+    """Partial Results keep the per-round contributions of the nodes in a single
+    preallocated array of shape (iterations, nodes), instead of a nested hash map
+    holding a Python float for every node and every round. The results of
+    a round are exposed as a hash map only when requested (see __getitem__) and
+    the whole table is exported at once (see to_csv)."""
+
+    def __init__(
+        self,
+        nodes: list,
+        iterations: int
+        ) -> None:
+        """Constructor for the Partial Results. All the contributions are
+        initialized to zero.
+
+        Parameters
+        ----------
+        nodes: list
+            A list containing ids of all the nodes engaged in the training.
+        iterations: int
+            A number of training iterations.
+
+        Returns
+        -------
+        None
+        """
+        self.nodes = list(nodes)
+        self.index = {node: position for position, node in enumerate(self.nodes)}
+        self.values = np.zeros((iterations, len(self.nodes)), dtype=np.float64)
+
+
+    def __getitem__(
+        self,
+        iteration: int
+        ) -> dict:
+        """Returns the results of the round.
+
+        Parameters
+        ----------
+        iteration: int
+            The round.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping the nodes' ids to their contributions in the round.
+        """
+        return dict(zip(self.nodes, self.values[iteration]))
+
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+
+    def __eq__(
+        self,
+        other: object
+        ) -> bool:
+        if not isinstance(other, Partial_Results):
+            return NotImplemented
+        return self.nodes == other.nodes and np.array_equal(self.values, other.values)
+
+
+    def record(
+        self,
+        iteration: int,
+        node: int,
+        value: float
+        ) -> None:
+        """Records the contribution of the node in the round.
+
+        Parameters
+        ----------
+        iteration: int
+            The round.
+        node: int
+            Id of the node.
+        value: float
+            The contribution.
+
+        Returns
+        -------
+        None
+        """
+        self.values[iteration, self.index[node]] = value
+
+
+    def totals(self) -> dict:
+        """Returns the contributions of the nodes summed over all the rounds.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            A dictionary mapping the nodes' ids to their total contributions.
+        """
+        return dict(zip(self.nodes, self.values.sum(axis=0)))
+
+
+    def to_csv(
+        self,
+        path: str
+        ) -> None:
+        """Saves the results as a csv file with a column for every node
+        and the last column holding the round. The format is the one of the
+        csv.DictWriter used for the hash maps of the results (the contributions
+        are written by str, so they are preserved exactly).
+
+        Parameters
+        ----------
+        path: str
+            Path to the file.
+
+        Returns
+        -------
+        None
+        """
+        with open(path, 'w+', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(self.nodes + ['iteration'])
+            csv_writer.writerows(
+                [*row, iteration] for iteration, row in enumerate(self.values.tolist())
+                )
@@ -6,9 +6,10 @@ from _collections_abc import Generator
 import numpy as np
 
 from forcha.utils.computations import Aggregators
-from forcha.utils.computations import Subsets
+from forcha.utils.computations import Coalition_Index
 from forcha.models.federated_model import FederatedModel
 from forcha.utils.optimizers import Optimizers
+from forcha.components.evaluator.partial_results import Partial_Results
 
 
 def compare_for_debug(dict1, dict2):
@@ -81,7 +82,7 @@ class Sample_Shapley_Evaluator():
         None
         """
         self.shapley = {node: np.float64(0) for node in nodes} # Hash map containing all the nodes and their respective marginal contribution values.
-        self.partial_shapley = {round:{node: np.float64(0) for node in nodes} for round in range(iterations)} # Hash map containing all the partial psi for each sampled subset.
+        self.partial_shapley = Partial_Results(nodes, iterations) # Array containing all the partial results for each sampled subset (see Partial_Results).
     
 
     def evaluate_round(
@@ -90,7 +91,7 @@ class Sample_Shapley_Evaluator():
         optimizer_template: Optimizers,
         gradients: OrderedDict,
         nodes_in_sample: list,
-        optimizer: Optimizers,
+        optimizer: dict,
         iteration: int,
         final_model: OrderedDict,
         previous_model: OrderedDict,
@@ -112,8 +113,8 @@ class Sample_Shapley_Evaluator():
             An OrderedDict containing gradients of the sampled nodes.
         nodes_in_sample: list
             A list containing FederatedNodes that participated in the training.
-        previous_optimizer: Optimizers
-            An instance of the forcha.Optimizers class.
+        previous_optimizer: dict
+            State of the optimizer from the previous round (see Optimizers.state_dict).
         iteration: int
             The current iteration.
         final_model: FederatedModel
@@ -129,114 +130,37 @@ class Sample_Shapley_Evaluator():
         """
         
         # Operations counter to track the progress of the calculations.
-        operation_counter = 1
         number_of_operations = 2 ** (len(nodes_in_sample)) - 1
 
-        # Maps every coalition to it's value, implemented to decrease the time complexity.
-        recorded_values = {}
-        # recorded_values['zero_vector'] = 1 / len(list(gradients[0].values())[-1]) # value of a random guess, 1/ len(networks_last_layer)
-        
         # Converting list of FederatedNode objects to the int representing their identiity.
         nodes_in_sample = [node.node_id for node in nodes_in_sample] 
-        # Forming superset of all the possible coalitions.
-        superset = Subsets.form_superset(nodes_in_sample, return_dict=True)
-
-        for node in nodes_in_sample:
-            shap = 0.0
-            # Select subsets that do not contain agent i
-            coalitions = Subsets.select_subsets(
-                coalitions = superset, 
-                searched_node = node
-                )
-            
-            for coalition in coalitions.keys():
-                coalition_without_client = tuple(sorted(coalition))
-                coalition_with_client = tuple(sorted(coalition + (node, )))
-                # Evaluating the performance of the model trained without client i
-                # Check if already calculated in another pass
-                if recorded_values.get(coalition_without_client):
-                    coalition_without_client_score = recorded_values[coalition_without_client]
-                # Else calculate the score and add to the registered values.
-                else:
-                    print(f"{operation_counter} of {number_of_operations}: forming and evaluating subset {coalition_without_client}")
-                    coalitions_gradients = select_gradients(
-                        gradients = gradients,
-                        query = coalition_without_client
-                        )
-                    optimizer_template.set_weights(
-                        previous_delta=copy.deepcopy(optimizer[0]),
-                        previous_momentum=copy.deepcopy(optimizer[1]),
-                        learning_rate=copy.deepcopy(optimizer[2])
-                        )
-                    grad_avg = Aggregators.compute_average(coalitions_gradients)
-                    weights = optimizer_template.fed_optimize(
-                        weights=copy.deepcopy(previous_model),
-                        delta = grad_avg
-                        )
-                    model_template.update_weights(weights)
-                    coalition_without_client_score = model_template.evaluate_model()[1]
-                    recorded_values[coalition_without_client] = coalition_without_client_score
-                    operation_counter += 1
-                # Evaluating the performance of the model trained with client i
-                # Check if already calculated in another pass
-                if recorded_values.get(coalition_with_client):
-                    coalition_with_client_score = recorded_values[coalition_with_client]
-                # Else calculate the score and add to the registered values.
-                else:
-                    print(f"{operation_counter} of {number_of_operations}: forming and evaluating subset {coalition_with_client}")
-                    coalitions_gradients = select_gradients(
-                        gradients = gradients, 
-                        query = coalition_with_client
-                        )
-                    optimizer_template.set_weights(
-                        previous_delta=copy.deepcopy(optimizer[0]),
-                        previous_momentum=copy.deepcopy(optimizer[1]),
-                        learning_rate=copy.deepcopy(optimizer[2])
-                        )
-                    grad_avg = Aggregators.compute_average(coalitions_gradients)
-                    weights = optimizer_template.fed_optimize(
-                        weights=copy.deepcopy(previous_model),
-                        delta = grad_avg
-                        )
-                    model_template.update_weights(weights)
-                    coalition_with_client_score = model_template.evaluate_model()[1]
-                    recorded_values[coalition_with_client] = coalition_with_client_score
-                    operation_counter += 1
-                possible_combinations = math.comb((len(nodes_in_sample) - 1), len(coalition_without_client)) # Find the total number of possibilities to choose k things from n items:
-                divisor = 1 / possible_combinations
-                shap += divisor * (coalition_with_client_score - coalition_without_client_score)
-            
-            # # Calculating zero coalition - random guess
-            # coalition_without_client_score = recorded_values['zero_vector']
-            # coalition_with_client = (node, )
-            # if recorded_values.get(coalition_with_client):
-            #     coalition_with_client_score = recorded_values[coalition_with_client]
-            # else:
-            #     print(f"{operation_counter} of {number_of_operations}: forming and evaluating subset {coalition_with_client}")
-            #     coalitions_gradients = select_gradients(
-            #         gradients = gradients, 
-            #         query = coalition_with_client
-            #         )
-            #     optimizer_template.set_weights(
-            #         previous_delta=copy.deepcopy(optimizer[0]),
-            #         previous_momentum=copy.deepcopy(optimizer[1]),
-            #         learning_rate=copy.deepcopy(optimizer[2])
-            #         )
-            #     grad_avg = Aggregators.compute_average(coalitions_gradients)
-            #     weights = optimizer_template.fed_optimize(
-            #         weights=copy.deepcopy(previous_model),
-            #         delta = grad_avg
-            #         )
-            #     model_template.update_weights(weights)
-            #     coalition_with_client_score = model_template.evaluate_model()[1]
-            #     recorded_values[coalition_with_client] = coalition_with_client_score
-            #     operation_counter += 1
-            #     shap += coalition_with_client_score - coalition_without_client_score
-            
-            self.partial_shapley[iteration][node] =  shap / (len(nodes_in_sample))
+        # Maps every coalition (encoded as a bitmask) to it's value.
+        coalition_index = Coalition_Index(nodes_in_sample)
+        # Every non-empty coalition is needed either with or without some node
+        # (a single node has no coalitions to be compared with).
+        if len(nodes_in_sample) > 1:
+            for operation_counter, mask in enumerate(coalition_index.masks(), 1):
+                coalition = coalition_index.coalition(mask)
+                print(f"{operation_counter} of {number_of_operations}: forming and evaluating subset {coalition}")
+                coalitions_gradients = select_gradients(
+                    gradients = gradients,
+                    query = coalition
+                    )
+                optimizer_template.load_state_dict(optimizer)
+                grad_avg = Aggregators.compute_average(coalitions_gradients)
+                weights = optimizer_template.fed_optimize(
+                    weights=copy.deepcopy(previous_model),
+                    delta = grad_avg
+                    )
+                model_template.update_weights(weights)
+                coalition_index.record(mask, model_template.quick_evaluate()[1])
+        
+        # Marginal contributions computed with a vectorized mask arithmetic.
+        for node, shap in coalition_index.shapley_values().items():
+            self.partial_shapley.record(iteration, node, shap)
 
         if return_coalitions == True:
-            return recorded_values
+            return coalition_index.to_dict()
         
 
     # def update_shap_multip(self,
@@ -360,9 +284,7 @@ class Sample_Shapley_Evaluator():
         
         Returns
         -------
-        tuple[dict[int: dict], dict[int: float]]
+        tuple[Partial_Results, dict[int: float]]
         """
-        for iteration_results in self.partial_shapley.values():
-            for node, value in iteration_results.items():
-                self.shapley[node] += np.float64(value)
+        self.shapley.update(self.partial_shapley.totals())
         return (self.partial_shapley, self.shapley)
\ No newline at end of file
@@ -1,8 +1,11 @@
+from collections import OrderedDict
+
 import torch
 from numpy import array
 from numpy.random import default_rng
 from datasets import arrow_dataset
 from forcha.models.federated_model import FederatedModel
+from forcha.models.replica_pool import ReplicaPool
 from forcha.utils.loggers import Loggers
 from forcha.utils.helpers import find_nearest
 from forcha.components.settings.settings import Settings
@@ -18,7 +21,8 @@ class FederatedNode:
                  save_model: bool = False,
                  save_path: str = None,
                  group: int = None,
-                 seed: float | int = 42
+                 seed: float | int = 42,
+                 replica_pool: ReplicaPool = None
                  ) -> None:
         """An abstract object representing a single node in the federated training.
         
@@ -32,6 +36,16 @@ class FederatedNode:
             A group assigned to a device. Important for performing MCFC simulations, default to None.
         seed: float or int, default to 42
             The seed assigned to a particular Random Generator. Important for performing MCFC simulations, default to 42.
+        replica_pool: ReplicaPool, default to None
+            A pool of the network replicas shared by the nodes. If provided, a lazy 
+            node borrows a replica when its model is materialized and returns it
+            when the model is released.
+        
+        If lazy_nodes is enabled in the settings, the FederatedModel is not built
+        upon the initialization. The node keeps only a reference to the network
+        template, its data and its optimizer state, the model is materialized
+        by prepare_model() (e.g. when the node is sampled) and released afterwards.
+        
         Returns
         -------
         None
@@ -50,15 +64,118 @@ class FederatedNode:
         self.test_data = data[1]
         self.save_model = save_model
         self.save_path = save_path
-        self.model = FederatedModel(
-            settings=settings,
-            net = model,
-            local_dataset = data,
-            node_name=self.node_id
-        )
+        self.net = model # Template of the network, copied when the model is materialized.
+        self.optimizer_state = None # Optimizer state preserved between the materializations.
+        self.lazy = getattr(settings, 'lazy_nodes', False)
+        self.replica_pool = replica_pool
+        if not self.lazy:
+            self.prepare_model()
         self.state = 0
             
             
+    def prepare_model(
+        self,
+        weights: OrderedDict = None
+        ) -> FederatedModel:
+        """Materializes the FederatedModel of the node (if it does not exist yet)
+        and loads the passed weights into it.
+        
+        Parameters
+        ----------
+        weights: OrderedDict, default to None
+            Weights loaded into the model (e.g. the broadcasted central model).
+        
+        Returns
+        -------
+        FederatedModel
+        """
+        if self.model is None:
+            self.model = FederatedModel(
+                settings=self.settings,
+                net = self.net,
+                local_dataset = [self.train_data, self.test_data],
+                node_name=self.node_id,
+                replica_pool=self.replica_pool
+            )
+            if self.optimizer_state is not None:
+                self.model.optimizer.load_state_dict(self.optimizer_state)
+        if weights is not None:
+            self.model.update_weights(weights)
+        return self.model
+    
+    
+    def release_model(self) -> None:
+        """Releases the model of a lazy node, preserving only its optimizer state.
+        Has no effect if the lazy_nodes is not enabled in the settings.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+        if self.lazy and self.model is not None:
+            self.optimizer_state = self.model.optimizer.state_dict()
+            self.model.release()
+            self.model = None
+    
+    
+    def __getstate__(self) -> dict:
+        # The pool stays in the process that owns it (see FederatedModel.__getstate__).
+        state = self.__dict__.copy()
+        state['replica_pool'] = None
+        return state
+    
+    
+    def state_dict(self) -> dict:
+        """Returns the state of the node preserved in the checkpoints: the state 
+        of its generator, its (connectivity) state and the state of its local optimizer.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        dict
+        """
+        if self.model is not None:
+            optimizer_state = self.model.optimizer.state_dict()
+        else:
+            optimizer_state = self.optimizer_state
+        return {
+            'generator': self.generator.bit_generator.state,
+            'state': self.state,
+            'optimizer': optimizer_state
+            }
+    
+    
+    def load_state_dict(
+        self,
+        state_dict: dict
+        ) -> None:
+        """Restores the state of the node obtained from the state_dict().
+        
+        Parameters
+        ----------
+        state_dict: dict
+            State of the node.
+        
+        Returns
+        -------
+        None
+        """
+        self.generator.bit_generator.state = state_dict['generator']
+        self.state = state_dict['state']
+        if state_dict['optimizer'] is not None:
+            if self.model is not None:
+                self.model.optimizer.load_state_dict(state_dict['optimizer'])
+            else:
+                self.optimizer_state = state_dict['optimizer']
+    
+    
     def load_transition_matrix(self,
                                transition_matrix: array) -> None:
         """Loads the transition matrix for performing
@@ -128,34 +245,27 @@ class FederatedNode:
             loss_list.append(metrics["loss"])
             accuracy_list.append(metrics["accuracy"])
         if self.save_model:
-            self.model.store_model_on_disk(
-                iteration=iteration, 
-                path=self.save_path
-                )
+            with self.model.profiler.phase('archiving', iteration=iteration):
+                self.model.store_model_on_disk(
+                    iteration=iteration, 
+                    path=self.save_path
+                    )
         
         node_logger.info(f"[ITERATION {iteration} | NODE {self.node_id}] Results of training on node {self.node_id}: {accuracy_list}")
-        if mode == 'weights:':
-            return (
-                self.node_id,
-                self.model.get_weights(),
-                loss_list,
-                accuracy_list
-                )
-        elif mode == 'gradients':
-            return (
-                self.node_id,
-                self.model.get_gradients(),
-                loss_list,
-                accuracy_list
-                )
-        else:
-            node_logger.info(f"[ITERATION {iteration} | NODE {self.node_id}] No mode was provided, returning only model's weights")
-            return (
-                self.node_id,
-                self.model.get_weights(),
-                loss_list,
-                accuracy_list
-                )
+        with self.model.profiler.phase('update_extraction', iteration=iteration):
+            if mode == 'weights:':
+                update = self.model.get_weights()
+            elif mode == 'gradients':
+                update = self.model.get_gradients()
+            else:
+                node_logger.info(f"[ITERATION {iteration} | NODE {self.node_id}] No mode was provided, returning only model's weights")
+                update = self.model.get_weights()
+        return (
+            self.node_id,
+            update,
+            loss_list,
+            accuracy_list
+            )
 
 
     def local_training(self,
@@ -0,0 +1,26 @@
+class RemoteNode:
+    def __init__(self,
+                 node_id: int,
+                 rank: int
+                 ) -> None:
+        """A placeholder of the node hosted by a worker of the distributed backend
+        (see forcha.utils.distributed.Distributed_Backend). The orchestrator keeps
+        only the identity of the node and the rank of its worker - the data,
+        the model and the state of the node live in the process of the worker.
+
+        Parameters
+        ----------
+        node_id: int
+            An int identifier of a node
+        rank: int
+            Rank of the worker hosting the node.
+
+        Returns
+        -------
+        None
+        """
+        self.node_id = node_id # Attribute controlling the ID of the node.
+        self.rank = rank # Rank of the worker hosting the node.
+        self.model = None # The model is materialized only on the worker.
+        self.lazy = False
+        self.state = 0
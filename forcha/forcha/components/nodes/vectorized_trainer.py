@@ -0,0 +1,217 @@
+import copy
+import math
+from collections import OrderedDict
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+from torch.func import functional_call, grad, vmap
+
+from forcha.components.nodes.federated_node import FederatedNode
+from forcha.components.settings.settings import Settings
+from forcha.exceptions.modelexception import ModelException
+from forcha.models.federated_model import FederatedModel
+from forcha.utils.loggers import Loggers
+
+node_logger = Loggers.node_logger()
+
+
+class Vectorized_Trainer:
+    """Vectorized_Trainer simulates the local training of all the sampled nodes
+    in a single process. Parameters of the nodes are stacked along a leading
+    (node) dimension and the local SGD steps of all the nodes are performed
+    together with torch.func.vmap, each node on its own minibatch. Intended for
+    the small networks (e.g. MNIST_MLP or MNIST_Dropout_MLP templates), for
+    which the cost of the per-node training loops and of the processes exceeds
+    the cost of the computations.
+
+    Nodes with smaller datasets run out of batches earlier - their (padded)
+    batches are masked, so they perform exactly as many steps as they would
+    perform in the FederatedModel.train. Only the plain SGD (without the momentum
+    and the weight decay) and networks without buffers are supported.
+    """
+    def __init__(
+        self,
+        net: nn.Module,
+        settings: Settings,
+        nodes: list[FederatedNode]
+        ) -> None:
+        """Converts the training data of all the nodes into (concatenated) tensors.
+
+        Parameters
+        ----------
+        net: nn.Module
+            Template of the network trained by the nodes.
+        settings: Settings
+            Settings of the simulation (optimizer, learning rate, batch size
+            and local epochs).
+        nodes: list[FederatedNode]
+            All the nodes of the network.
+
+        Returns
+        -------
+        None
+        """
+        if settings.optimizer != 'SGD' or getattr(settings, 'momentum', 0) or getattr(settings, 'weight_decay', 0):
+            raise ModelException("Vectorized training supports only the SGD optimizer without the momentum and weight decay.")
+        if len(list(net.buffers())) > 0:
+            raise ModelException("Vectorized training supports only networks without buffers.")
+        if hasattr(settings, 'force_cpu'):
+            self.device = torch.device('cpu')
+        else:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.net = copy.deepcopy(net).to(self.device)
+        self.batch_size = settings.batch_size
+        self.learning_rate = settings.learning_rate
+        self.local_epochs = settings.local_epochs
+        self.generator = torch.Generator().manual_seed(settings.simulation_seed)
+
+        # Training data of all the nodes, concatenated (offset and size of each node).
+        images, labels = [], []
+        self.offsets = {}
+        offset = 0
+        for node in nodes:
+            data = node.train_data.with_transform(FederatedModel.transform_func)[:]
+            images.append(torch.stack(data['image']))
+            labels.append(torch.as_tensor(data['label']))
+            self.offsets[node.node_id] = (offset, len(labels[-1]))
+            offset += len(labels[-1])
+        self.images = torch.cat(images).to(self.device)
+        self.labels = torch.cat(labels).to(self.device)
+
+        self.gradient_step = vmap(
+            grad(self.loss, has_aux=True),
+            randomness = 'different'
+            )
+
+
+    def loss(
+        self,
+        parameters: dict,
+        inputs: torch.Tensor,
+        targets: torch.Tensor,
+        mask: torch.Tensor
+        ) -> tuple[torch.Tensor, tuple[torch.Tensor, torch.Tensor]]:
+        """Loss of a single node on its (padded) minibatch. Padded samples
+        are masked out, so the loss equals the mean loss of the real samples.
+
+        Parameters
+        ----------
+        parameters: dict
+            Parameters of the node.
+        inputs: torch.Tensor
+            Minibatch of the inputs.
+        targets: torch.Tensor
+            Minibatch of the labels.
+        mask: torch.Tensor
+            Mask of the real (not padded) samples.
+
+        Returns
+        -------
+        tuple[torch.Tensor, tuple[torch.Tensor, torch.Tensor]]
+            The loss and (as the auxiliary output) the loss and the outputs.
+        """
+        outputs = functional_call(self.net, parameters, (inputs,))
+        losses = F.cross_entropy(outputs, targets, reduction='none')
+        loss = (losses * mask).sum() / mask.sum().clamp(min=1)
+        return loss, (loss, outputs)
+
+
+    def batch_indices(
+        self,
+        nodes: list[FederatedNode]
+        ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Shuffles the data of each node and splits it into the minibatches.
+
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            Nodes trained in the round.
+
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor]
+            Indices of the samples (in the concatenated data) of the shape
+            [nodes, steps, batch_size] and the mask of the real samples.
+        """
+        sizes = [self.offsets[node.node_id][1] for node in nodes]
+        steps = max(math.ceil(size / self.batch_size) for size in sizes)
+        indices = torch.zeros((len(nodes), steps * self.batch_size), dtype=torch.long)
+        mask = torch.zeros((len(nodes), steps * self.batch_size))
+        for position, node in enumerate(nodes):
+            offset, size = self.offsets[node.node_id]
+            indices[position, :size] = offset + torch.randperm(size, generator=self.generator)
+            mask[position, :size] = 1
+        shape = (len(nodes), steps, self.batch_size)
+        return (indices.view(shape).to(self.device),
+                mask.view(shape).to(self.device))
+
+
+    def train(
+        self,
+        nodes: list[FederatedNode],
+        weights: OrderedDict,
+        iteration: int,
+        mode: str = 'weights'
+        ) -> tuple[dict, dict]:
+        """Trains the nodes (starting from the passed weights) and returns their
+        updates. If the nodes have materialized models, the trained weights are
+        loaded into them (e.g. for the evaluation of the local models).
+
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            Nodes sampled for the current round.
+        weights: OrderedDict
+            Weights of the central model.
+        iteration: int
+            The current iteration.
+        mode: str, default to 'weights'
+            Either 'weights' or 'gradients'.
+
+        Returns
+        -------
+        tuple[dict, dict]
+            Updates (weights or gradients) and training results mapped to the nodes' id.
+        """
+        parameters = {key: tensor.detach().to(self.device).unsqueeze(0).repeat(len(nodes), *[1] * tensor.dim())
+                      for key, tensor in weights.items()}
+        self.net.train()
+
+        for epoch in range(self.local_epochs):
+            indices, mask = self.batch_indices(nodes)
+            loss_sum = torch.zeros(len(nodes), device=self.device)
+            correct = torch.zeros(len(nodes), device=self.device)
+            batches = (mask.sum(dim=2) > 0).sum(dim=1)
+            for step in range(indices.size(1)):
+                inputs = self.images[indices[:, step]]
+                targets = self.labels[indices[:, step]]
+                gradients, (losses, outputs) = self.gradient_step(parameters, inputs, targets, mask[:, step])
+                with torch.no_grad():
+                    for key, gradient in gradients.items():
+                        parameters[key].sub_(gradient, alpha=self.learning_rate)
+                loss_sum += losses
+                correct += ((outputs.argmax(dim=2) == targets) * mask[:, step]).sum(dim=1)
+            sizes = mask.sum(dim=(1, 2))
+            epoch_loss = (loss_sum / batches).tolist()
+            epoch_accuracy = (correct / sizes).tolist()
+            for position, node in enumerate(nodes):
+                node_logger.info(f"[ITERATION {iteration} | EPOCH {epoch} | NODE {node.node_id}] Vectorized training results: loss: {epoch_loss[position]}, accuracy: {epoch_accuracy[position]}")
+
+        updates = {}
+        training_results = {}
+        for position, node in enumerate(nodes):
+            trained = OrderedDict((key, tensor[position].to('cpu', copy=True)) for key, tensor in parameters.items())
+            if mode == 'gradients':
+                updates[node.node_id] = OrderedDict((key, tensor - weights[key].cpu()) for key, tensor in trained.items())
+            else:
+                updates[node.node_id] = trained
+            if node.model is not None:
+                node.model.update_weights(trained)
+            training_results[node.node_id] = {
+                "iteration": iteration,
+                "node_id": node.node_id,
+                "loss": epoch_loss[position],
+                "accuracy": epoch_accuracy[position]
+                }
+        return (updates, training_results)
@@ -1,5 +1,5 @@
 import copy
-from multiprocessing import Pool, set_start_method
+from multiprocessing import set_start_method
 import os
 
 import torch
@@ -9,12 +9,11 @@ from forcha.components.evaluator.evaluation_manager import Evaluation_Manager
 from forcha.components.evaluator.parallel.parallel_manager import Parallel_Manager
 from forcha.components.orchestrator.generic_orchestrator import Orchestrator
 from forcha.utils.optimizers import Optimizers
-from forcha.utils.computations import Aggregators
-from forcha.utils.orchestrations import sample_nodes, train_nodes
+from forcha.utils.computations import Aggregators, Streaming_Aggregator
+from forcha.utils.orchestrations import sample_nodes
 from forcha.components.settings.settings import Settings
 from forcha.utils.debugger import log_gpu_memory
-from forcha.utils.helpers import Helpers
-from forcha.utils.handlers import save_csv_file, save_model_metrics, save_training_metrics
+from forcha.utils.handlers import save_csv_file, compute_model_metrics, save_metrics, save_training_metrics
 
 # Set start method set to spawn to ensure cross-platform compatibility.
 set_start_method("spawn", force=True)
@@ -64,6 +63,13 @@ class Evaluator_Orchestrator(Orchestrator):
             A boolean flag enabling parallelization of certain operations (default to False)
         generator: np.random.default_rng
             A random number generator attached to the Orchestrator.
+        pipelined_evaluation: Bool
+            A boolean flag enabling the pipelined evaluation (default to False).
+            If enabled, the evaluation of round t is performed in the background
+            while the nodes are training in round t + 1.
+        (optional) pipeline_depth: int
+            If pipelined_evaluation is set to True, this will be a number of rounds
+            allowed to wait for the evaluation (default to 1).
             
         Parameters
         ----------
@@ -82,6 +88,13 @@ class Evaluator_Orchestrator(Orchestrator):
             settings, 
             number_of_workers,
             **kwargs)
+        # Pipelined evaluation enabled or disabled
+        if kwargs.get("pipelined_evaluation"):
+            self.pipelined_evaluation = True
+            self.pipeline_depth = kwargs.get("pipeline_depth", 1)
+        else:
+            self.pipelined_evaluation = False
+            self.pipeline_depth = 1
     
 
     def train_protocol(self) -> None:
@@ -104,6 +117,19 @@ class Evaluator_Orchestrator(Orchestrator):
         int
             Returns 0 on the successful completion of the training.
         """
+        return self.run(self.train_protocol_async())
+    
+    
+    async def train_protocol_async(self) -> int:
+        """Coroutine performing the train_protocol (see Orchestrator.run).
+        
+        Parameters
+        ----------
+        
+        Returns
+        -------
+        int
+            Returns 0 on the successful completion of the training."""
         # BEGINING OF TRAINING
         ########################################################
         ########################################################
@@ -127,7 +153,10 @@ class Evaluator_Orchestrator(Orchestrator):
                 nodes = [node.node_id for node in self.network],
                 iterations = self.iterations,
                 full_debug = self.full_debug,
-                number_of_workers = self.number_of_workers)
+                number_of_workers = self.number_of_workers,
+                pipelined = self.pipelined_evaluation,
+                pipeline_depth = self.pipeline_depth,
+                distributed = self.distributed)
         else:
             self.evaluation_manager = Evaluation_Manager(
                 settings = self.settings,
@@ -135,12 +164,20 @@ class Evaluator_Orchestrator(Orchestrator):
                 optimizer_template = self.optimizer,
                 nodes = [node.node_id for node in self.network],
                 iterations = self.iterations,
-                full_debug = self.full_debug
+                full_debug = self.full_debug,
+                pipelined = self.pipelined_evaluation,
+                pipeline_depth = self.pipeline_depth
                 )
         ########################################################
         
+        # Restoring the state of the interrupted run (if resume_from is provided).
+        first_iteration = self.load_checkpoint(
+            optimizer = self.optimizer,
+            evaluation_manager = self.evaluation_manager
+            )
+        
         # TRAINING PHASE ----- FEDOPT WITH EVALUATOR
-        for iteration in range(self.iterations):
+        for iteration in range(first_iteration, self.iterations):
             # BEGINING OF ITERATION
             ########################################################
             ########################################################
@@ -148,61 +185,42 @@ class Evaluator_Orchestrator(Orchestrator):
            
             ########################################################
             # FEDOPT - INIT PHASE
-            gradients = {}
-            training_results = {}       
             # Checking for connectivity
             connected_nodes = [node for node in self.network]
             # Weights dispatched before the training (if activated)
             self.orchestrator_logger.info(f"Iteration {iteration}, dispatching nodes to connected clients.")
-            for node in connected_nodes:
-                node.model.update_weights(self.central_model.get_weights())
+            with self.profiler.phase('broadcast', iteration=iteration):
+                self.broadcast(connected_nodes, self.central_model.get_weights())
             ########################################################
             
             ########################################################
             # FEDOPT EVALUATOR - PRESERVING PHASE
             self.evaluation_manager.preserve_previous_model(previous_model = self.central_model.get_weights())
-            self.evaluation_manager.preserve_previous_optimizer(previous_optimizer = self.optimizer.get_weights())
+            self.evaluation_manager.preserve_previous_optimizer(previous_optimizer = self.optimizer.state_dict())
             ########################################################
             
             ########################################################
             # FEDOPT - SAMPLING PHASE
-            sampled_nodes = sample_nodes(
-                connected_nodes, 
-                sample_size=self.sample_size,
-                generator=self.generator
-                )
+            with self.profiler.phase('sampling', iteration=iteration):
+                sampled_nodes = sample_nodes(
+                    connected_nodes, 
+                    sample_size=self.sample_size,
+                    generator=self.generator
+                    )
             ########################################################
             
             ########################################################
-            # FEDOPT - TRAINING PHASE
-            # FEDOPT OPTION I: BATCH TRAINING
-            if self.batch_job:
-                self.orchestrator_logger.info(f"Entering batched job, size of the batch {self.batch}")
-                for batch in Helpers.chunker(sampled_nodes, size=self.batch):
-                    with Pool(len(list(batch))) as pool:
-                        results = [pool.apply_async(train_nodes, (node, iteration, 'gradients')) for node in batch]
-                        for result in results:
-                            node_id, model_weights, loss_list, accuracy_list = result.get()
-                            gradients[node_id] = copy.deepcopy(model_weights)
-                            training_results[node_id] = {
-                                "iteration": iteration,
-                                "node_id": node_id,
-                                "loss": loss_list[-1], 
-                                "accuracy": accuracy_list[-1]
-                                }
-            # FEDOPT OPTION II: BATCH TRAINING
-            else:
-                with Pool(self.sample_size) as pool:
-                    results = [pool.apply_async(train_nodes, (node, iteration, 'gradients')) for node in sampled_nodes]
-                    for result in results:
-                        node_id, model_weights, loss_list, accuracy_list = result.get()
-                        gradients[node_id] = copy.deepcopy(model_weights)
-                        training_results[node_id] = {
-                            "iteration": iteration,
-                            "node_id": node_id,
-                            "loss": loss_list[-1], 
-                            "accuracy": accuracy_list[-1]
-                            }
+            # FEDOPT - TRAINING PHASE (BATCHED IF BATCH_JOB IS ENABLED)
+            # The evaluators need the updates of all the nodes - they are retained.
+            aggregator = Streaming_Aggregator() if self.streaming_aggregation else None
+            gradients, training_results = await self.in_executor(
+                self.train_sampled_nodes,
+                sampled_nodes = sampled_nodes,
+                iteration = iteration,
+                mode = 'gradients',
+                aggregator = aggregator,
+                keep_updates = True
+                )
             ########################################################
            
             ########################################################
@@ -214,80 +232,103 @@ class Evaluator_Orchestrator(Orchestrator):
             # FEDOPT - TESTING RESULTS BEFORE THE MODEL UPDATE PHASE
             # FEDOPT - SAVING GRADIENTS
             if self.settings.save_gradients:
-                for node, gradient in gradients.items():
-                    torch.save(
-                        gradient, 
-                        os.path.join(
-                            self.settings.nodes_model_path,
-                            f'node_{node}_iteration_{iteration}_gradients.pt'
+                with self.profiler.phase('archiving', iteration=iteration):
+                    for node, gradient in gradients.items():
+                        self.archive(
+                            torch.save,
+                            obj = gradient,
+                            f = os.path.join(
+                                self.settings.nodes_model_path,
+                                f'node_{node}_iteration_{iteration}_gradients.pt'
+                                )
                             )
-                        )
             if self.settings.save_training_metrics:
-                save_training_metrics(
-                    file = training_results,
-                    saving_path = self.settings.results_path,
-                    file_name = "training_metrics.csv"
-                    )
+                with self.profiler.phase('archiving', iteration=iteration):
+                    self.archive(
+                        save_training_metrics,
+                        file = training_results,
+                        saving_path = self.settings.results_path,
+                        file_name = "training_metrics.csv"
+                        )
             # METRICS: TEST RESULTS ON NODES (TRAINED MODEL)
-                for node in sampled_nodes:
-                    save_model_metrics(
+                with self.profiler.phase('evaluation', iteration=iteration):
+                    self.evaluate_nodes(
+                        nodes = sampled_nodes,
                         iteration = iteration,
-                        model = node.model,
-                        logger = self.orchestrator_logger,
-                        saving_path = self.settings.results_path,
+                        weights = self.central_model.get_weights(),
                         file_name = 'local_model_on_nodes.csv'
                         )
+            # Models of the lazy nodes are no longer needed in this round.
+            self.release_nodes(sampled_nodes)
             ########################################################
             
             ########################################################
             # FEDOPT - AGGREGATION AND CENTRAL UPDATE PHASE
-            grad_avg = Aggregators.compute_average(gradients) # AGGREGATING FUNCTION -> CHANGE IF NEEDED
-            updated_weights = self.optimizer.fed_optimize(
-                weights=copy.deepcopy(self.central_model.get_weights()),
-                delta=copy.deepcopy(grad_avg)) 
-            self.central_model.update_weights(copy.deepcopy(updated_weights))
+            # Writes in the background may still read the central model of the previous round.
+            await self.settle_archive()
+            with self.profiler.phase('aggregation', iteration=iteration):
+                if aggregator is not None:
+                    grad_avg = aggregator.average()
+                else:
+                    grad_avg = Aggregators.compute_average(gradients) # AGGREGATING FUNCTION -> CHANGE IF NEEDED
+                updated_weights = self.optimizer.fed_optimize(
+                    weights=copy.deepcopy(self.central_model.get_weights()),
+                    delta=copy.deepcopy(grad_avg)) 
+                self.central_model.update_weights(copy.deepcopy(updated_weights))
             ########################################################
             
             ########################################################
             # FEDOPT EVALUATOR - PRESERVE UPDATED MODEL AND TRACK RESULTS
             self.evaluation_manager.preserve_updated_model(
                 updated_model = copy.deepcopy(self.central_model.get_weights()))
-            # EVALUATOR: TRACK RESULTS
-            self.evaluation_manager.track_results(
-                gradients = grad_copy,
-                nodes_in_sample = sampled_nodes,
-                iteration = iteration)
+            # EVALUATOR: TRACK RESULTS (IN THE BACKGROUND IF PIPELINED)
+            with self.profiler.phase('contribution_evaluation', iteration=iteration):
+                self.evaluation_manager.submit_results(
+                    gradients = grad_copy,
+                    nodes_in_sample = self.contributing_nodes(sampled_nodes, grad_copy),
+                    iteration = iteration)
             ########################################################
             
             ########################################################
             # FEDOPT - UPDATING THE NODES AND SAVE RESULTS
-            for node in connected_nodes:
-                node.model.update_weights(copy.deepcopy(updated_weights))       
+            with self.profiler.phase('broadcast', iteration=iteration):
+                self.broadcast(connected_nodes, updated_weights)
             if self.settings.save_training_metrics:
-                save_model_metrics(
-                    iteration = iteration,
-                    model = self.central_model,
-                    logger = self.orchestrator_logger,
-                    saving_path = self.settings.results_path,
-                    file_name = "global_model_on_orchestrator.csv"
-                )
-                for node in connected_nodes:
-                    save_model_metrics(
-                        iteration = iteration,
-                        model = node.model,
-                        logger = self.orchestrator_logger,
+                with self.profiler.phase('evaluation', iteration=iteration):
+                    self.archive(
+                        save_metrics,
+                        metrics = compute_model_metrics(
+                            iteration = iteration,
+                            model = self.central_model,
+                            logger = self.orchestrator_logger
+                            ),
                         saving_path = self.settings.results_path,
+                        file_name = "global_model_on_orchestrator.csv"
+                    )
+                    self.evaluate_nodes(
+                        nodes = connected_nodes,
+                        iteration = iteration,
+                        weights = updated_weights,
                         file_name = "global_model_on_nodes.csv"
-                )
+                        )
             if self.settings.save_central_model:
-                self.central_model.store_model_on_disk(
-                    iteration=iteration,
-                    path=self.settings.orchestrator_model_path
-                )
+                with self.profiler.phase('archiving', iteration=iteration):
+                    self.archive(
+                        self.central_model.store_model_on_disk,
+                        iteration=iteration,
+                        path=self.settings.orchestrator_model_path
+                    )
             ########################################################
             
             if self.full_debug == True:
                 log_gpu_memory(iteration=iteration)    
+            self.profiler.extend(self.evaluation_manager.pop_profile())
+            self.export_profile(iteration=iteration)
+            self.save_checkpoint(
+                iteration = iteration,
+                optimizer = self.optimizer,
+                evaluation_manager = self.evaluation_manager
+                )
             ########################################################
             ########################################################
             # END OF ITERATION
@@ -295,8 +336,15 @@ class Evaluator_Orchestrator(Orchestrator):
         ########################################################
         # FEDOPT EVALUATOR - PRESERVE FINAL RESULTS
         self.evaluation_manager.finalize_tracking(path=self.settings.results_path)
+        # Records of the rounds evaluated in the background (if pipelined)
+        self.profiler.extend(self.evaluation_manager.pop_profile())
+        self.export_profile(iteration=self.iterations - 1)
         ########################################################
         
         ########################################################
+        # Writes still in the background are completed.
+        await self.settle_archive()
+        # Updates still in flight (in the deadline mode) are discarded.
+        self.close_pool()
         self.orchestrator_logger.critical("Training complete")
         return 0
\ No newline at end of file
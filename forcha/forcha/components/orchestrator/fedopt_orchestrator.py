@@ -1,17 +1,15 @@
 import copy
-from multiprocessing import Pool
 import os
 
 import torch
 
 from forcha.components.orchestrator.generic_orchestrator import Orchestrator
 from forcha.utils.optimizers import Optimizers
-from forcha.utils.computations import Aggregators
-from forcha.utils.orchestrations import sample_nodes, train_nodes
+from forcha.utils.computations import Aggregators, Streaming_Aggregator
+from forcha.utils.orchestrations import sample_nodes
 from forcha.components.settings.settings import Settings
 from forcha.utils.debugger import log_gpu_memory
-from forcha.utils.helpers import Helpers
-from forcha.utils.handlers import save_model_metrics, save_training_metrics
+from forcha.utils.handlers import compute_model_metrics, save_metrics, save_training_metrics
 
 
 # set_start_method set to 'spawn' to ensure compatibility across platforms.
@@ -100,6 +98,19 @@ class Fedopt_Orchestrator(Orchestrator):
         int
             Returns 0 on the successful completion of the training.
         """
+        return self.run(self.train_protocol_async())
+    
+    
+    async def train_protocol_async(self) -> int:
+        """Coroutine performing the train_protocol (see Orchestrator.run).
+        
+        Parameters
+        ----------
+        
+        Returns
+        -------
+        int
+            Returns 0 on the successful completion of the training."""
         # BEGINING OF TRAINING
         ########################################################
         ########################################################
@@ -113,8 +124,13 @@ class Fedopt_Orchestrator(Orchestrator):
             )
         ########################################################
         
+        # Restoring the state of the interrupted run (if resume_from is provided).
+        first_iteration = self.load_checkpoint(
+            optimizer = self.Optimizer
+            )
+        
         # TRAINING PHASE ----- FEDOPT
-        for iteration in range(self.iterations):
+        for iteration in range(first_iteration, self.iterations):
             # BEGINING OF ITERATION
             ########################################################
             ########################################################
@@ -122,127 +138,131 @@ class Fedopt_Orchestrator(Orchestrator):
             
             ########################################################
             # FEDOPT - INIT PHASE
-            gradients = {}
-            training_results = {}
             # Checking for connectivity
             connected_nodes = [node for node in self.network]
             self.orchestrator_logger.info(f"Iteration {iteration}, dispatching nodes to connected clients.")
-            for node in connected_nodes:
-                node.model.update_weights(self.central_model.get_weights())
+            with self.profiler.phase('broadcast', iteration=iteration):
+                self.broadcast(connected_nodes, self.central_model.get_weights())
             ########################################################
 
             ########################################################
             # FEDOPT - SAMPLING PHASE
-            sampled_nodes = sample_nodes(
-                connected_nodes, 
-                sample_size=self.sample_size,
-                generator=self.generator
-                )
+            with self.profiler.phase('sampling', iteration=iteration):
+                sampled_nodes = sample_nodes(
+                    connected_nodes, 
+                    sample_size=self.sample_size,
+                    generator=self.generator
+                    )
             ########################################################
             
             ########################################################
-            # FEDOPT - TRAINING PHASE
-            # FEDOPT OPTION I: BATCH TRAINING
-            if self.batch_job:
-                self.orchestrator_logger.info(f"Entering batched job, size of the batch {self.batch}")
-                for batch in Helpers.chunker(sampled_nodes, size=self.batch):
-                    with Pool(len(list(batch))) as pool:
-                        results = [pool.apply_async(train_nodes, (node, iteration, 'gradients')) for node in batch]
-                        for result in results:
-                            node_id, model_weights, loss_list, accuracy_list = result.get()
-                            gradients[node_id] = copy.deepcopy(model_weights)
-                            training_results[node_id] = {
-                                "iteration": iteration,
-                                "node_id": node_id,
-                                "loss": loss_list[-1], 
-                                "accuracy": accuracy_list[-1]
-                                }
-            # FEDOPT OPTION II: BATCH TRAINING
-            else:
-                with Pool(self.sample_size) as pool:
-                    results = [pool.apply_async(train_nodes, (node, iteration, 'gradients')) for node in sampled_nodes]
-                    for result in results:
-                        node_id, model_weights, loss_list, accuracy_list = result.get()
-                        gradients[node_id] = copy.deepcopy(model_weights)
-                        training_results[node_id] = {
-                            "iteration": iteration,
-                            "node_id": node_id,
-                            "loss": loss_list[-1], 
-                            "accuracy": accuracy_list[-1]
-                            }
+            # FEDOPT - TRAINING PHASE (BATCHED IF BATCH_JOB IS ENABLED)
+            aggregator = Streaming_Aggregator() if self.streaming_aggregation else None
+            gradients, training_results = await self.in_executor(
+                self.train_sampled_nodes,
+                sampled_nodes = sampled_nodes,
+                iteration = iteration,
+                mode = 'gradients',
+                aggregator = aggregator,
+                keep_updates = self.settings.save_gradients
+                )
             ########################################################
             
             ########################################################
             # FEDOPT - TESTING RESULTS BEFORE THE MODEL UPDATE PHASE
             # FEDOPT - SAVING GRADIENTS
             if self.settings.save_gradients:
-                for node, gradient in gradients.items():
-                    torch.save(
-                        gradient, 
-                        os.path.join(
-                            self.settings.nodes_model_path,
-                            f'node_{node}_iteration_{iteration}_gradients.pt'
+                with self.profiler.phase('archiving', iteration=iteration):
+                    for node, gradient in gradients.items():
+                        self.archive(
+                            torch.save,
+                            obj = gradient,
+                            f = os.path.join(
+                                self.settings.nodes_model_path,
+                                f'node_{node}_iteration_{iteration}_gradients.pt'
+                                )
                             )
-                        )
             if self.settings.save_training_metrics:
-                save_training_metrics(
-                    file = training_results,
-                    saving_path = self.settings.results_path,
-                    file_name = "training_metrics.csv"
-                    )
+                with self.profiler.phase('archiving', iteration=iteration):
+                    self.archive(
+                        save_training_metrics,
+                        file = training_results,
+                        saving_path = self.settings.results_path,
+                        file_name = "training_metrics.csv"
+                        )
             # METRICS: TEST RESULTS ON NODES (TRAINED MODEL)
-                for node in sampled_nodes:
-                    save_model_metrics(
+                with self.profiler.phase('evaluation', iteration=iteration):
+                    self.evaluate_nodes(
+                        nodes = sampled_nodes,
                         iteration = iteration,
-                        model = node.model,
-                        logger = self.orchestrator_logger,
-                        saving_path = self.settings.results_path,
+                        weights = self.central_model.get_weights(),
                         file_name = 'local_model_on_nodes.csv'
                         )
+            # Models of the lazy nodes are no longer needed in this round.
+            self.release_nodes(sampled_nodes)
             ########################################################
             
             ########################################################
             # FEDOPT - AGGREGATION AND CENTRAL UPDATE PHASE
-            grad_avg = Aggregators.compute_average(copy.deepcopy(gradients)) # AGGREGATING FUNCTION            
-            updated_weights = self.Optimizer.fed_optimize(
-                weights=copy.deepcopy(self.central_model.get_weights()),
-                delta=copy.deepcopy(grad_avg))
-            self.central_model.update_weights(copy.deepcopy(updated_weights))
+            # Writes in the background may still read the central model of the previous round.
+            await self.settle_archive()
+            with self.profiler.phase('aggregation', iteration=iteration):
+                if aggregator is not None:
+                    grad_avg = aggregator.average()
+                else:
+                    grad_avg = Aggregators.compute_average(copy.deepcopy(gradients)) # AGGREGATING FUNCTION            
+                updated_weights = self.Optimizer.fed_optimize(
+                    weights=copy.deepcopy(self.central_model.get_weights()),
+                    delta=copy.deepcopy(grad_avg))
+                self.central_model.update_weights(copy.deepcopy(updated_weights))
             #######################################################
             
             ########################################################
             # FEDOPT - UPDATING THE NODES AND SAVE RESULTS
-            for node in connected_nodes:
-                node.model.update_weights(copy.deepcopy(updated_weights))
+            with self.profiler.phase('broadcast', iteration=iteration):
+                self.broadcast(connected_nodes, updated_weights)
             if self.settings.save_training_metrics:
-                save_model_metrics(
-                    iteration = iteration,
-                    model = self.central_model,
-                    logger = self.orchestrator_logger,
-                    saving_path = self.settings.results_path,
-                    file_name = "global_model_on_orchestrator.csv"
-                )
-                for node in connected_nodes:
-                    save_model_metrics(
-                        iteration = iteration,
-                        model = node.model,
-                        logger = self.orchestrator_logger,
+                with self.profiler.phase('evaluation', iteration=iteration):
+                    self.archive(
+                        save_metrics,
+                        metrics = compute_model_metrics(
+                            iteration = iteration,
+                            model = self.central_model,
+                            logger = self.orchestrator_logger
+                            ),
                         saving_path = self.settings.results_path,
+                        file_name = "global_model_on_orchestrator.csv"
+                    )
+                    self.evaluate_nodes(
+                        nodes = connected_nodes,
+                        iteration = iteration,
+                        weights = updated_weights,
                         file_name = "global_model_on_nodes.csv"
-                )
+                        )
             if self.settings.save_central_model:
-                self.central_model.store_model_on_disk(
-                    iteration=iteration,
-                    path=self.settings.orchestrator_model_path
-                )
+                with self.profiler.phase('archiving', iteration=iteration):
+                    self.archive(
+                        self.central_model.store_model_on_disk,
+                        iteration=iteration,
+                        path=self.settings.orchestrator_model_path
+                    )
             ########################################################
             
             if self.full_debug == True:
                 log_gpu_memory(iteration=iteration)
+            self.export_profile(iteration=iteration)
+            self.save_checkpoint(
+                iteration = iteration,
+                optimizer = self.Optimizer
+                )
             ########################################################
             ########################################################
             # END OF ITERATION
                             
         ########################################################
+        # Writes still in the background are completed.
+        await self.settle_archive()
+        # Updates still in flight (in the deadline mode) are discarded.
+        self.close_pool()
         self.orchestrator_logger.critical("Training complete")
         return 0
\ No newline at end of file
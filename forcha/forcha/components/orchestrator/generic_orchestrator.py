@@ -1,19 +1,57 @@
+import asyncio
+import contextlib
 import copy
-from multiprocessing import Pool
+import functools
+import math
+import os
+import queue
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
+import torch
 from torch import nn
 import datasets 
 
+from forcha.components.evaluator.evaluation_manager import Evaluation_Manager
 from forcha.components.nodes.federated_node import FederatedNode
+from forcha.components.nodes.remote_node import RemoteNode
+from forcha.components.nodes.vectorized_trainer import Vectorized_Trainer
 from forcha.models.federated_model import FederatedModel
-from forcha.utils.computations import Aggregators
+from forcha.models.replica_pool import ReplicaPool
+from forcha.utils.computations import Aggregators, Streaming_Aggregator
 from forcha.utils.loggers import Loggers
-from forcha.utils.orchestrations import sample_nodes, train_nodes
+from forcha.utils.optimizers import Optimizers
+from forcha.utils.orchestrations import sample_nodes, train_nodes, Cost_Estimator, Memory_Governor, Training_Pool
 from forcha.components.settings.settings import Settings
 from forcha.utils.debugger import log_gpu_memory
+from forcha.utils.distributed import Distributed_Backend
 from forcha.utils.helpers import Helpers
-from forcha.utils.handlers import save_csv_file, save_model_metrics, save_training_metrics
+from forcha.utils.profiler import Profiler
+from forcha.utils.handlers import save_csv_file, compute_model_metrics, save_metrics, save_training_metrics, trim_results, remove_empty_archive
+
+
+def write_checkpoint(
+    checkpoint: dict,
+    path: str
+    ) -> None:
+    """Writes the checkpoint aside and moves it into the place, so an 
+    interruption never leaves a corrupted checkpoint.
+    
+    Parameters
+    ----------
+    checkpoint: dict
+        The state of the run (see Orchestrator.save_checkpoint).
+    path: str
+        Path of the checkpoint.
+    
+    Returns
+    -------
+    None
+    """
+    torch.save(checkpoint, path + '.tmp')
+    os.replace(path + '.tmp', path)
 
 
 # set_start_method set to 'spawn' to ensure compatibility across platforms.
@@ -59,8 +97,64 @@ class Orchestrator():
             to train simultaneously.
         parallelization: Bool
             A boolean flag enabling parallelization of certain operations (default to False)
+        vectorized: Bool
+            A boolean flag enabling the vectorized training of the sampled nodes in
+            the main process (see forcha.components.nodes.vectorized_trainer), default to False.
+        (optional) round_deadline: float
+            If provided, the round is closed after round_deadline seconds and only the
+            updates that arrived before the deadline are aggregated.
+        (optional) round_quota: int
+            If provided, the round is closed as soon as round_quota updates arrive.
+        (optional) late_updates: str
+            Treatment of the updates that missed the deadline (or quota) of their round,
+            either 'drop' (default) or 'carry' - carried into the first round they arrive
+            in, weighted by their staleness.
+        streaming_aggregation: Bool
+            A boolean flag enabling the aggregation of the updates as they arrive,
+            folded in the order of the sample (see forcha.utils.computations.Streaming_Aggregator),
+            default to False.
+        (optional) streaming_window: int
+            Maximal number of the updates waiting for their turn in the streaming aggregation,
+            default to 4. Once exceeded, the earliest waiting update is folded out of turn,
+            so the aggregate of the round depends on the order of the arrivals. 0 folds the
+            updates in the order of their arrival (the lowest memory, not reproducible).
+        (optional) simulated_latency: dict[int, float]
+            Additional latency (in seconds) of the selected nodes, for simulating
+            heterogeneous (straggling) nodes.
+        (optional) checkpoint_interval: int
+            If provided, the state of the run is saved every checkpoint_interval
+            rounds (see save_checkpoint).
+        (optional) resume_from: str
+            Path to a checkpoint (or to the archive containing it), the training
+            is continued from the round following the checkpointed one (see load_checkpoint).
+            Defaults to the resume_from of the Settings, which then reuse the archive of
+            the checkpoint instead of creating a new one.
+        (optional) distributed: forcha.utils.distributed.Distributed_Backend
+            The distributed backend (of rank 0). If provided, the nodes are hosted, trained 
+            and evaluated by the workers of the backend instead of the multiprocessing pool.
+        (optional) memory_budget: float
+            If provided, the memory (in megabytes) that can be used by the training 
+            processes. The number of the nodes training at once is adapted to the peak 
+            memory of the training processes (see forcha.utils.orchestrations.Memory_Governor),
+            the first node of the simulation is trained alone to measure it.
+        (optional) affinity: int
+            If provided, the given number of local worker processes is started (see 
+            Distributed_Backend.spawn_local) and every node is pinned to its home worker, 
+            so the data of the nodes is sent once and only the weights and the updates 
+            cross the processes in the following rounds. The workers are stopped
+            once the protocol is finished.
+        asynchronous: Bool
+            A boolean flag enabling the asynchronous mode of the protocol (see run), in which
+            the training runs in an executor and the metrics, profiles and checkpoints 
+            are written in the background, overlapping with the training (default to False).
         generator: np.random.default_rng
             A random number generator attached to the Orchestrator.
+        profiler: forcha.utils.profiler.Profiler
+            A profiler recording the phases of each round (enabled by
+            passing profiling = True to the Settings).
+        replica_pool: forcha.models.replica_pool.ReplicaPool
+            A pool of the networks borrowed by the lazy nodes (created by
+            prepare_training if lazy_nodes is enabled in the Settings).
         
         Parameters
         ----------
@@ -86,6 +180,7 @@ class Orchestrator():
         if kwargs.get("batch_job"):
             self.batch_job = True
             self.batch = kwargs["batch"]
+            self.cost_estimator = Cost_Estimator() # Predicted training times of the nodes.
         else:
             self.batch_job = False
         # Parallelization enabled or disabled
@@ -93,11 +188,74 @@ class Orchestrator():
             self.parallelization = True
         else:
             self.parallelization = False
-        self.number_of_workers = number_of_workers
+        # Vectorized training enabled or disabled
+        if kwargs.get("vectorized"):
+            self.vectorized = True
+        else:
+            self.vectorized = False
+        self.vectorized_trainer = None
+        # Streaming aggregation enabled or disabled
+        if kwargs.get("streaming_aggregation"):
+            self.streaming_aggregation = True
+        else:
+            self.streaming_aggregation = False
+        self.streaming_window = kwargs.get("streaming_window", 4)
+        if not isinstance(self.streaming_window, int) or self.streaming_window < 0:
+            raise ValueError(f"streaming_window should be a non-negative integer, got {self.streaming_window}.")
+        # Round deadlines (partial participation) enabled or disabled
+        self.round_deadline = kwargs.get("round_deadline")
+        self.round_quota = kwargs.get("round_quota")
+        self.deadline_mode = self.round_deadline is not None or self.round_quota is not None
+        self.late_updates = kwargs.get("late_updates", 'drop')
+        if self.late_updates not in ('drop', 'carry'):
+            raise ValueError(f"late_updates should be either 'drop' or 'carry', got {self.late_updates}.")
+        self.simulated_latency = kwargs.get("simulated_latency", {})
+        self.deadline_pool = None # Pool persisting between the rounds in the deadline mode.
+        self.pending = {} # Nodes still training: node_id -> (result, iteration, dispatch time, base weights).
+        self.arrivals = queue.Queue() # Ids of the nodes that finished training (in the order of arrival).
+        # Checkpointing and resumption of the run
+        self.checkpoint_interval = kwargs.get("checkpoint_interval")
+        self.resume_from = kwargs.get("resume_from", getattr(settings, 'resume_from', None))
+        # Asynchronous protocol (writes overlapping with the training) enabled or disabled
+        if kwargs.get("asynchronous"):
+            self.asynchronous = True
+        else:
+            self.asynchronous = False
+        self.archive_executor = None # Single thread writing the archive (in the asynchronous mode).
+        self.archiving = [] # Writes submitted to the archive executor and not settled yet.
         self.orchestrator_logger = Loggers.orchestrator_logger()
+        # Memory-budgeted concurrency of the training enabled or disabled
+        if kwargs.get("memory_budget"):
+            self.memory_governor = Memory_Governor(
+                budget = kwargs["memory_budget"] * 1024 ** 2,
+                logger = self.orchestrator_logger
+                )
+        else:
+            self.memory_governor = None
+        # Distributed backend (nodes hosted by the workers) enabled or disabled
+        self.distributed = kwargs.get("distributed")
+        self.local_backend = False # The backend was started (and is stopped) by the orchestrator.
+        if kwargs.get("affinity"):
+            if self.distributed is not None:
+                raise ValueError("The node affinity starts its own backend and cannot be combined with the distributed backend.")
+            if self.vectorized or self.deadline_mode:
+                raise ValueError("The distributed backend supports neither the vectorized training nor the round deadlines.")
+            self.distributed = Distributed_Backend.spawn_local(int(kwargs.get("affinity")))
+            self.local_backend = True
+        if self.memory_governor is not None and (self.distributed is not None or self.vectorized or self.deadline_mode):
+            raise ValueError("The memory budget applies only to the training in the multiprocessing pool.")
+        if self.distributed is not None and (self.vectorized or self.deadline_mode):
+            raise ValueError("The distributed backend supports neither the vectorized training nor the round deadlines.")
+        self.number_of_workers = number_of_workers
+        self.replica_pool = None # Pool of the networks borrowed by the lazy nodes.
         
         # Initialization of the generator object    
         self.generator = np.random.default_rng(self.settings.simulation_seed)
+        # Phase-level instrumentation (no-op unless enabled in the settings)
+        self.profiler = Profiler(
+            enabled = getattr(self.settings, 'profiling', False),
+            node_name = 'orchestrator'
+            )
     
     
     def prepare_orchestrator(
@@ -131,16 +289,19 @@ class Orchestrator():
     def prepare_training(
         self,
         nodes_data: list[datasets.arrow_dataset.Dataset,
-                         datasets.arrow_dataset.Dataset]
+                         datasets.arrow_dataset.Dataset] = None
         ) -> None:
         """Prepares all the necessary elements of the training, including nodes and helpers.
         Must be run before the train_protocol method is invoked.
         
         Parameters
         ----------
-        nodes_data: list[datasets.arrow_dataset.Dataset, datasets.arrow_dataset.Dataset] 
+        nodes_data: list[datasets.arrow_dataset.Dataset, datasets.arrow_dataset.Dataset], default to None
             A list containing train set and test set
             wrapped in a hugging face arrow_dataset.Dataset containers.
+            With the distributed backend, the nodes are built one by one and sent
+            to their workers. If None, the workers are expected to build the nodes
+            they host themselves (see Distributed_Backend.hosted_ids).
 
         Returns
         -------
@@ -151,16 +312,922 @@ class Orchestrator():
         self.nodes_number = self.settings.number_of_nodes
         self.sample_size = self.settings.sample_size
         self.nodes_list = [node for node in range(self.nodes_number)]
-        model_list = [copy.deepcopy(self.central_net) for _ in range(self.nodes_number)]
+        # The template is shared - every FederatedModel creates its own copy of the net.
+        # Lazy nodes borrow the net from a pool of the main process holding one replica
+        # per sampled node (the sampled nodes keep their trained models until the local
+        # evaluation). The training workers still unpickle their own copies of the nets.
+        if self.distributed is not None:
+            self.network = self.distribute_nodes(nodes_data)
+            return
+        if getattr(self.settings, 'lazy_nodes', False):
+            self.replica_pool = ReplicaPool(
+                net = self.central_net,
+                size = self.sample_size
+                )
         nodes = [FederatedNode(node_id, 
                                     self.settings,
-                                    model=model,
+                                    model=self.central_net,
                                     data=node_data,
                                     save_model=self.settings.save_nodes_models,
                                     save_path=self.settings.nodes_model_path,
-                                    seed=self.settings.simulation_seed) 
-                      for node_id, model, node_data in zip(self.nodes_list, model_list, nodes_data)]
+                                    seed=self.settings.simulation_seed,
+                                    replica_pool=self.replica_pool) 
+                      for node_id, node_data in zip(self.nodes_list, nodes_data)]
         self.network = nodes
+        if self.vectorized:
+            self.vectorized_trainer = Vectorized_Trainer(
+                net = self.central_net,
+                settings = self.settings,
+                nodes = self.network
+                )
+    
+    
+    def distribute_nodes(
+        self,
+        nodes_data: list = None
+        ) -> list[RemoteNode]:
+        """Sends the nodes to the workers of the distributed backend. The nodes
+        are built and sent one by one, so only a single node is held by the 
+        orchestrator at a time.
+        
+        Parameters
+        ----------
+        nodes_data: list, default to None
+            Data of the nodes (see prepare_training). If None, the nodes are 
+            built by the workers.
+        
+        Returns
+        -------
+        list[RemoteNode]
+            Placeholders of the nodes kept by the orchestrator.
+        """
+        self.distributed.place(self.nodes_number)
+        if nodes_data is not None:
+            for node_id, node_data in zip(self.nodes_list, nodes_data):
+                node = FederatedNode(node_id, 
+                                     self.settings,
+                                     model=self.central_net,
+                                     data=node_data,
+                                     save_model=self.settings.save_nodes_models,
+                                     save_path=self.settings.nodes_model_path,
+                                     seed=self.settings.simulation_seed)
+                self.distributed.submit('host_nodes', ([node],), rank=self.distributed.owner(node_id)).get()
+                del node
+        return [RemoteNode(node_id, self.distributed.owner(node_id)) for node_id in self.nodes_list]
+    
+    
+    def dispatch_training(
+        self,
+        pool,
+        node: FederatedNode | RemoteNode,
+        iteration: int,
+        mode: str,
+        callback,
+        error_callback
+        ):
+        """Submits the training of the node to the pool - either the multiprocessing
+        pool or the pool of the workers of the distributed backend (for the remote nodes).
+        
+        Parameters
+        ----------
+        pool: multiprocessing.Pool | forcha.utils.distributed.Distributed_Pool
+            The pool the training is submitted to.
+        node: FederatedNode | RemoteNode
+            Node to be trained.
+        iteration: int
+            The current iteration.
+        mode: str
+            Mode of the training, either 'weights' or 'gradients'.
+        callback: Callable
+            Called with the results of the training.
+        error_callback: Callable
+            Called with the exception if the training failed.
+        
+        Returns
+        -------
+        AsyncResult
+        """
+        delay = self.simulated_latency.get(node.node_id, 0)
+        if self.distributed is not None:
+            return pool.apply_async(
+                'train_hosted',
+                (node.node_id, iteration, mode, delay),
+                callback = callback,
+                error_callback = error_callback,
+                rank = node.rank
+                )
+        return pool.apply_async(
+            train_nodes, 
+            (node, iteration, mode, delay),
+            callback = callback,
+            error_callback = error_callback
+            )
+    
+    
+    def train_sampled_nodes(
+        self,
+        sampled_nodes: list[FederatedNode],
+        iteration: int,
+        mode: str = 'weights',
+        aggregator: Streaming_Aggregator = None,
+        keep_updates: bool = True
+        ) -> tuple[dict, dict]:
+        """Trains the sampled nodes in the multiprocessing pool, either all at
+        once or (if batch_job is enabled) at most batch nodes at a time and collects 
+        their updates. In the batch job, the nodes are dispatched in the order of
+        their predicted cost, the most expensive first (see Cost_Estimator), and
+        each finished node is immediately replaced by the next one. With the memory
+        budget, the number of the nodes in flight is further limited by the
+        Memory_Governor (and the processes are added as the limit grows).
+        If the vectorized training is enabled, the nodes are trained together 
+        in the main process instead.
+        Each update is stamped on arrival, so the time spent outside of the
+        node (dispatch, serialization and transfer) is recorded by the profiler 
+        as the transport phase.
+        If the aggregator is passed, the updates are folded into it in the order
+        of the sample (so the sum does not depend on the order of the arrivals,
+        an update arriving ahead of its turn waits for the preceding ones) and, 
+        unless keep_updates is set, released immediately afterwards. The waiting
+        updates are held in memory, so at most streaming_window of them wait -
+        beyond that, the earliest of them is folded out of turn (and the round is
+        no longer reproducible).
+        
+        Parameters
+        ----------
+        sampled_nodes: list[FederatedNode]
+            Nodes sampled for the current round.
+        iteration: int
+            The current iteration.
+        mode: str, default to 'weights'
+            Mode of the training passed to the nodes, either 'weights' or 'gradients'.
+        aggregator: Streaming_Aggregator, default to None
+            A running-sum aggregator the updates are folded into.
+        keep_updates: bool, default to True
+            If False (and the aggregator is passed), the updates are not returned.
+        
+        Returns
+        -------
+        tuple[dict, dict]
+            Updates (weights or gradients) and training results mapped to the nodes' id.
+        """
+        if self.vectorized or self.deadline_mode:
+            if self.vectorized:
+                # Lazy nodes are materialized for the time of the round (see release_nodes).
+                for node in sampled_nodes:
+                    if node.model is None:
+                        node.prepare_model()
+                with self.profiler.phase('training', iteration=iteration):
+                    updates, training_results = self.vectorized_trainer.train(
+                        nodes = sampled_nodes,
+                        weights = self.central_model.get_weights(),
+                        iteration = iteration,
+                        mode = mode
+                        )
+            else:
+                updates, training_results = self.train_with_deadline(
+                    sampled_nodes = sampled_nodes,
+                    iteration = iteration,
+                    mode = mode
+                    )
+            # The updates of these paths are complete only at the end of the round.
+            if aggregator is not None:
+                # Folded in the order of the sample, late (carried) updates last.
+                sample = [node.node_id for node in sampled_nodes if node.node_id in updates]
+                for node_id in sample + sorted(set(updates) - set(sample)):
+                    aggregator.fold(updates[node_id])
+                if not keep_updates:
+                    updates = {}
+            return (updates, training_results)
+        
+        updates = {}
+        training_results = {}
+        arrivals = {}
+        dispatched = {}
+        results = {}
+        completed = queue.Queue()
+        peaks = {}
+        if self.batch_job:
+            # At most batch nodes train at once, the most expensive ones are dispatched first
+            # and every finished node frees its slot for the next one (no barriers between batches).
+            self.orchestrator_logger.info(f"Entering batched job, size of the batch {self.batch}")
+            limit = max(min(self.batch, len(sampled_nodes)), 1)
+            pending = self.cost_estimator.order(list(sampled_nodes))
+        else:
+            limit = max(len(sampled_nodes), 1)
+            pending = list(sampled_nodes)
+        nodes = {node.node_id: node for node in sampled_nodes}
+        pools = [] # Opened pools: [pool, number of processes, number of nodes in flight].
+        hosts = {} # Node id -> index of the pool training the node.
+        
+        def arrived(result: tuple) -> None:
+            arrivals[result[0]] = time.perf_counter()
+            peaks[result[0]] = result[5]
+            completed.put(result[0])
+        
+        def dispatch(pool, node: FederatedNode) -> None:
+            # Lazy nodes are materialized for the time of the round (see release_nodes).
+            # Remote nodes are materialized by their workers.
+            if node.model is None and self.distributed is None:
+                node.prepare_model(weights=self.central_model.get_weights())
+            dispatched[node.node_id] = time.perf_counter()
+            results[node.node_id] = self.dispatch_training(
+                pool = pool,
+                node = node,
+                iteration = iteration,
+                mode = mode,
+                callback = arrived,
+                error_callback = lambda error, node_id=node.node_id: completed.put(node_id)
+                )
+        
+        def collect(node_id: int) -> None:
+            node_id, update, loss_list, accuracy_list, profile, _ = results.pop(node_id).get()
+            if aggregator is not None:
+                aggregator.fold(update)
+            if keep_updates or aggregator is None:
+                updates[node_id] = update
+            del update
+            training_results[node_id] = {
+                "iteration": iteration,
+                "node_id": node_id,
+                "loss": loss_list[-1], 
+                "accuracy": accuracy_list[-1]
+                }
+            elapsed = arrivals.get(node_id, time.perf_counter()) - dispatched[node_id]
+            if self.batch_job:
+                self.cost_estimator.record(nodes[node_id], elapsed)
+            # Transport: round-trip time of the node minus its own (recorded) work.
+            node_time = sum(entry['wall_time'] for entry in profile)
+            self.profiler.extend(profile)
+            self.profiler.record(
+                name = 'transport',
+                wall_time = max(elapsed - node_time, 0.0),
+                iteration = iteration,
+                node = node_id
+                )
+        
+        def fill(stack: contextlib.ExitStack) -> None:
+            # Dispatches the pending nodes to the free processes, opening a new pool 
+            # if the memory governor allows more nodes in flight than there are processes.
+            slots = limit if self.memory_governor is None else self.memory_governor.slots(limit)
+            in_flight = sum(entry[2] for entry in pools)
+            wanted = min(slots, in_flight + len(pending))
+            processes = sum(entry[1] for entry in pools)
+            if wanted > processes:
+                size = wanted - processes
+                pools.append([stack.enter_context(self.distributed.pool() if self.distributed is not None else Training_Pool(size)), size, 0])
+            for index, entry in enumerate(pools):
+                while pending and entry[2] < entry[1] and in_flight < wanted:
+                    node = pending.pop(0)
+                    dispatch(entry[0], node)
+                    hosts[node.node_id] = index
+                    entry[2] += 1
+                    in_flight += 1
+        
+        with self.profiler.phase('training', iteration=iteration):
+            with contextlib.ExitStack() as stack:
+                fill(stack)
+                position = {node.node_id: index for index, node in enumerate(sampled_nodes)}
+                waiting = set() # Arrived updates waiting for their turn.
+                streamed = set()
+                turn = 0 # Position (in the sample) of the next update to be streamed.
+                for _ in range(len(sampled_nodes)):
+                    node_id = completed.get()
+                    pools[hosts[node_id]][2] -= 1
+                    if self.memory_governor is not None:
+                        self.memory_governor.record(peaks.get(node_id))
+                    fill(stack)
+                    # Streamed updates are consumed as soon as all the preceding ones (in the sample) arrive,
+                    # or out of turn once too many of them wait.
+                    if aggregator is not None:
+                        waiting.add(node_id)
+                        while waiting:
+                            while sampled_nodes[turn].node_id in streamed:
+                                turn += 1
+                            if sampled_nodes[turn].node_id in waiting:
+                                node_id = sampled_nodes[turn].node_id
+                            elif len(waiting) > self.streaming_window:
+                                node_id = min(waiting, key=position.get)
+                                if self.streaming_window > 0:
+                                    self.orchestrator_logger.warning(f"More than {self.streaming_window} updates wait for their turn, "
+                                                                     f"the update of node {node_id} is folded out of the order of the sample "
+                                                                     f"in iteration {iteration}.")
+                            else:
+                                break
+                            collect(node_id)
+                            waiting.remove(node_id)
+                            streamed.add(node_id)
+                # The others are consumed in the order of the sample.
+                if aggregator is None:
+                    for node in sampled_nodes:
+                        collect(node.node_id)
+        return (updates, training_results)
+
+
+    def train_with_deadline(
+        self,
+        sampled_nodes: list[FederatedNode],
+        iteration: int,
+        mode: str = 'weights'
+        ) -> tuple[dict, dict]:
+        """Trains the sampled nodes in a pool persisting between the rounds and
+        closes the round once the deadline passes or the quota of the updates is
+        met (whichever comes first, but not before at least one update arrives).
+        Nodes that did not deliver their updates keep training in the background
+        and are not broadcasted to until they finish (if sampled again in the 
+        meantime, they are dispatched once they finish). Their late updates are 
+        either dropped or carried into the round they arrive in,
+        weighted by the staleness s = 1 / sqrt(1 + staleness) (as in FedBuff):
+        the carried update is the weighted difference between the trained model
+        and the model the node received, applied to the current central model.
+        The latency and the staleness of each update are added to its training results.
+        Nodes whose training fails are logged and left out of the round.
+        
+        Parameters
+        ----------
+        sampled_nodes: list[FederatedNode]
+            Nodes sampled for the current round.
+        iteration: int
+            The current iteration.
+        mode: str, default to 'weights'
+            Mode of the training passed to the nodes, either 'weights' or 'gradients'.
+        
+        Returns
+        -------
+        tuple[dict, dict]
+            Updates (weights or gradients) and training results mapped to the nodes' id.
+        """
+        if self.deadline_pool is None:
+            self.deadline_pool = Training_Pool(max(self.number_of_workers, 1))
+        updates = {}
+        training_results = {}
+        base_weights = copy.deepcopy(self.central_model.get_weights())
+        
+        def dispatch(node: FederatedNode) -> None:
+            # Lazy nodes are materialized for the time of the round (see release_nodes).
+            if node.model is None:
+                node.prepare_model(weights=base_weights)
+            else:
+                node.model.update_weights(base_weights)
+            self.pending[node.node_id] = (
+                self.deadline_pool.apply_async(
+                    train_nodes,
+                    (node, iteration, mode, self.simulated_latency.get(node.node_id, 0)),
+                    callback = lambda result: self.arrivals.put(result[0]),
+                    error_callback = lambda error, node_id=node.node_id: self.arrivals.put(node_id)
+                    ),
+                iteration,
+                time.perf_counter(),
+                base_weights
+                )
+        
+        with self.profiler.phase('training', iteration=iteration):
+            # Sampled nodes still training join the round once they finish.
+            busy = {}
+            for node in sampled_nodes:
+                if node.node_id in self.pending:
+                    self.orchestrator_logger.info(f"Node {node.node_id} is still training, delaying its dispatch in iteration {iteration}.")
+                    busy[node.node_id] = node
+                else:
+                    dispatch(node)
+            
+            opened = time.perf_counter()
+            quota = self.round_quota if self.round_quota is not None else math.inf
+            while self.pending and len(updates) < quota:
+                timeout = None
+                if self.round_deadline is not None and updates:
+                    timeout = max(self.round_deadline - (time.perf_counter() - opened), 0)
+                try:
+                    node_id = self.arrivals.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if node_id not in self.pending:
+                    continue
+                result, dispatched_iteration, dispatched, base = self.pending.pop(node_id)
+                try:
+                    node_id, update, loss_list, accuracy_list, profile, _ = result.get()
+                except Exception as error:
+                    # The failed node does not contribute, but can be dispatched again in the next rounds.
+                    self.orchestrator_logger.warning(f"Training of node {node_id} dispatched in iteration {dispatched_iteration} failed: {error}")
+                    if node_id in busy:
+                        dispatch(busy.pop(node_id))
+                    else:
+                        self.release_nodes([node for node in self.network if node.node_id == node_id])
+                    continue
+                latency = time.perf_counter() - dispatched
+                staleness = iteration - dispatched_iteration
+                self.profiler.extend(profile)
+                self.profiler.record(name='latency', wall_time=latency, iteration=iteration, node=node_id)
+                if staleness > 0:
+                    if node_id in busy:
+                        dispatch(busy.pop(node_id))
+                    else:
+                        # Late nodes are not a part of the current sample.
+                        self.release_nodes([node for node in self.network if node.node_id == node_id])
+                    if self.late_updates == 'drop':
+                        self.orchestrator_logger.info(f"Dropping the update of node {node_id} from iteration {dispatched_iteration}.")
+                        continue
+                    weight = 1 / math.sqrt(1 + staleness)
+                    if mode == 'gradients':
+                        update = OrderedDict((key, tensor * weight) for key, tensor in update.items())
+                    else:
+                        update = OrderedDict((key, base_weights[key] + (tensor - base[key]) * weight
+                                              if tensor.is_floating_point() else tensor)
+                                             for key, tensor in update.items())
+                # The carried update of a node is replaced by its fresh update.
+                updates[node_id] = update
+                training_results[node_id] = {
+                    "iteration": iteration,
+                    "node_id": node_id,
+                    "loss": loss_list[-1], 
+                    "accuracy": accuracy_list[-1],
+                    "latency": latency,
+                    "staleness": staleness
+                    }
+        self.orchestrator_logger.info(f"Iteration {iteration} closed with {len(updates)} updates, {len(self.pending)} nodes still training.")
+        return (updates, training_results)
+
+
+    def close_pool(self) -> None:
+        """Terminates the pool persisting between the rounds (in the deadline
+        mode), discarding the updates that did not arrive.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+        if self.deadline_pool is not None:
+            self.deadline_pool.terminate()
+            self.deadline_pool.join()
+            self.deadline_pool = None
+        self.pending = {}
+        self.arrivals = queue.Queue()
+
+
+    def contributing_nodes(
+        self,
+        sampled_nodes: list[FederatedNode],
+        updates: dict
+        ) -> list[FederatedNode]:
+        """Returns the nodes whose updates were collected in the round: the sampled 
+        nodes that delivered their updates (in the order of the sample) followed
+        by the nodes whose late updates were carried into the round. Outside of 
+        the deadline mode, these are simply the sampled nodes.
+        
+        Parameters
+        ----------
+        sampled_nodes: list[FederatedNode]
+            Nodes sampled for the current round.
+        updates: dict
+            Updates collected in the round, mapped to the nodes' id.
+        
+        Returns
+        -------
+        list[FederatedNode]
+        """
+        if not self.deadline_mode:
+            return sampled_nodes
+        sampled = [node for node in sampled_nodes if node.node_id in updates]
+        sampled_ids = [node.node_id for node in sampled]
+        return sampled + [node for node in self.network 
+                          if node.node_id in updates and node.node_id not in sampled_ids]
+
+
+    def broadcast(
+        self,
+        nodes: list[FederatedNode],
+        weights: dict
+        ) -> None:
+        """Loads the weights into the models of the nodes. Lazy nodes (without 
+        a materialized model) are skipped, as they receive the weights of the
+        central model when they are prepared for the training or evaluation.
+        
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            Nodes that should receive the weights.
+        weights: dict
+            Weights of the model.
+        
+        Returns
+        -------
+        None
+        """
+        # Remote nodes receive the weights from their workers.
+        if self.distributed is not None:
+            self.distributed.call_workers('broadcast_hosted', (weights,))
+            return
+        for node in nodes:
+            # Nodes still training (in the deadline mode) receive the weights when they finish.
+            if node.model is not None and node.node_id not in self.pending:
+                node.model.update_weights(weights)
+
+
+    def evaluate_nodes(
+        self,
+        nodes: list[FederatedNode],
+        iteration: int,
+        weights: dict,
+        file_name: str
+        ) -> None:
+        """Evaluates the models of the nodes on their local test sets and saves 
+        the metrics. Lazy nodes are materialized with the passed weights for 
+        the time of the evaluation.
+        
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            Nodes that should be evaluated.
+        iteration: int
+            The current iteration.
+        weights: dict
+            Weights loaded into the models of the lazy nodes.
+        file_name: str
+            Name of the file with the metrics.
+        
+        Returns
+        -------
+        None
+        """
+        if self.distributed is not None:
+            # Remote nodes are evaluated by their workers (lazy nodes with the last broadcasted weights).
+            hosted = {}
+            for node in nodes:
+                hosted.setdefault(node.rank, []).append(node.node_id)
+            results = [self.distributed.submit('evaluate_hosted', (node_ids, iteration), rank=rank) 
+                       for rank, node_ids in hosted.items()]
+            metrics = {}
+            for result in results:
+                metrics.update(result.get())
+            for node in nodes:
+                self.archive(
+                    save_metrics,
+                    metrics = metrics[node.node_id],
+                    saving_path = self.settings.results_path,
+                    file_name = file_name
+                    )
+            return
+        for node in nodes:
+            # Models of the nodes still training (in the deadline mode) are not evaluated.
+            if node.node_id in self.pending:
+                continue
+            lazy = node.model is None
+            model = node.prepare_model(weights=weights) if lazy else node.model
+            self.archive(
+                save_metrics,
+                metrics = compute_model_metrics(
+                    iteration = iteration,
+                    model = model,
+                    logger = self.orchestrator_logger
+                    ),
+                saving_path = self.settings.results_path,
+                file_name = file_name
+                )
+            if lazy:
+                self.release_nodes([node])
+
+
+    def release_nodes(
+        self,
+        nodes: list[FederatedNode]
+        ) -> None:
+        """Releases the models of the lazy nodes (has no effect on the other
+        nodes), collecting their profiling records first. The sampled nodes are
+        released after their local evaluation, so the memory held by the models
+        scales with the sample size rather than with the number of nodes.
+        
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            Nodes that should be released.
+        
+        Returns
+        -------
+        None
+        """
+        if self.distributed is not None:
+            hosted = {}
+            for node in nodes:
+                hosted.setdefault(node.rank, []).append(node.node_id)
+            results = [self.distributed.submit('release_hosted', (node_ids,), rank=rank) 
+                       for rank, node_ids in hosted.items()]
+            for result in results:
+                self.profiler.extend(result.get())
+            return
+        for node in nodes:
+            if node.lazy and node.model is not None and node.node_id not in self.pending:
+                self.profiler.extend(node.model.profiler.pop_records())
+                node.release_model()
+
+
+    def export_profile(
+        self,
+        iteration: int
+        ) -> None:
+        """Merges the records of the central model and the nodes' models (kept
+        in the main process) with the records of the orchestrator and exports
+        them to the results directory.
+        
+        Parameters
+        ----------
+        iteration: int
+            The current iteration.
+        
+        Returns
+        -------
+        None
+        """
+        self.profiler.extend(self.central_model.profiler.pop_records())
+        for node in self.network:
+            if node.model is not None:
+                self.profiler.extend(node.model.profiler.pop_records())
+        self.archive(
+            self.profiler.export,
+            iteration = iteration,
+            saving_path = self.settings.results_path,
+            records = self.profiler.pop_records()
+            )
+    
+    
+    def nodes_state(self) -> dict:
+        """Returns the states of all the nodes (see FederatedNode.state_dict), 
+        collected from the workers of the distributed backend for the remote nodes.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        dict
+            States mapped to the nodes' id.
+        """
+        if self.distributed is not None:
+            states = {}
+            for hosted in self.distributed.call_workers('hosted_state').values():
+                states.update(hosted)
+            return states
+        return {node.node_id: node.state_dict() for node in self.network}
+    
+    
+    def save_checkpoint(
+        self,
+        iteration: int,
+        optimizer: Optimizers = None,
+        evaluation_manager: Evaluation_Manager = None
+        ) -> None:
+        """Saves the state of the run after the passed iteration, if it falls on
+        the checkpoint interval: weights of the central model, states of the
+        random generators, states of the nodes (including their local optimizers), 
+        state of the global optimizer, results of the evaluators and the paths 
+        of the archive. The checkpoint is written to the 'checkpoints' directory 
+        of the archive, replacing the previous one. Updates still in flight (in 
+        the deadline mode) are not preserved.
+        
+        Parameters
+        ----------
+        iteration: int
+            The last completed iteration.
+        optimizer: Optimizers, default to None
+            The global optimizer (Fedopt orchestrators).
+        evaluation_manager: Evaluation_Manager, default to None
+            The evaluation manager (Evaluator orchestrator).
+        
+        Returns
+        -------
+        None
+        """
+        if not self.checkpoint_interval or (iteration + 1) % self.checkpoint_interval != 0:
+            return
+        if self.pending:
+            self.orchestrator_logger.warning(f"Updates of the nodes {list(self.pending)} are still in flight and will not be checkpointed.")
+        checkpoint = {
+            'iteration': iteration,
+            'paths': {
+                'orchestrator_model_path': self.settings.orchestrator_model_path,
+                'nodes_model_path': self.settings.nodes_model_path,
+                'results_path': self.settings.results_path
+                },
+            'central_model': self.central_model.get_weights(),
+            'generator': self.generator.bit_generator.state,
+            'torch_generator': torch.get_rng_state(),
+            'vectorized_generator': self.vectorized_trainer.generator.get_state() if self.vectorized_trainer is not None else None,
+            'nodes': self.nodes_state(),
+            'optimizer': optimizer.state_dict() if optimizer is not None else None,
+            'evaluation_manager': evaluation_manager.state_dict() if evaluation_manager is not None else None
+            }
+        directory = os.path.join(os.path.dirname(self.settings.results_path), 'checkpoints')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'checkpoint.pt')
+        # Written in the background (in the asynchronous mode), the state is copied first.
+        if self.asynchronous:
+            checkpoint = copy.deepcopy(checkpoint)
+        self.archive(
+            write_checkpoint,
+            checkpoint = checkpoint,
+            path = path
+            )
+        self.orchestrator_logger.info(f"Iteration {iteration}, checkpoint saved to {path}.")
+    
+    
+    def load_checkpoint(
+        self,
+        optimizer: Optimizers = None,
+        evaluation_manager: Evaluation_Manager = None
+        ) -> int:
+        """Restores the state of the run from the checkpoint passed as resume_from 
+        (see save_checkpoint). The run continues in the archive of the checkpoint - 
+        the rows recorded after the checkpointed iteration are removed from its 
+        results, so the resumed run produces the same results as an uninterrupted one.
+        The archive created by the Settings for the run is removed if it stayed empty.
+        Must be called after the optimizer and the evaluation manager are created.
+        
+        Parameters
+        ----------
+        optimizer: Optimizers, default to None
+            The global optimizer (Fedopt orchestrators).
+        evaluation_manager: Evaluation_Manager, default to None
+            The evaluation manager (Evaluator orchestrator).
+        
+        Returns
+        -------
+        int
+            The first iteration of the resumed run (0 if resume_from is not set).
+        """
+        if self.resume_from is None:
+            return 0
+        path = self.resume_from
+        if os.path.isdir(path):
+            path = os.path.join(path, 'checkpoints', 'checkpoint.pt')
+        checkpoint = torch.load(path, weights_only=False)
+        created_archive = os.path.dirname(self.settings.results_path)
+        for name, value in checkpoint['paths'].items():
+            setattr(self.settings, name, value)
+        # The archive created by the Settings (if resume_from was not passed to them) is not used.
+        if os.path.abspath(created_archive) != os.path.abspath(os.path.dirname(self.settings.results_path)):
+            remove_empty_archive(created_archive)
+        if self.distributed is not None:
+            results = [self.distributed.submit(
+                'load_hosted_state',
+                ({node.node_id: checkpoint['nodes'][node.node_id] for node in self.network if node.rank == rank},
+                 self.settings.nodes_model_path),
+                rank = rank) for rank in self.distributed.workers]
+            for result in results:
+                result.get()
+        else:
+            for node in self.network:
+                node.save_path = self.settings.nodes_model_path
+                node.load_state_dict(checkpoint['nodes'][node.node_id])
+        self.central_model.update_weights(checkpoint['central_model'])
+        self.generator.bit_generator.state = checkpoint['generator']
+        torch.set_rng_state(checkpoint['torch_generator'])
+        if checkpoint['vectorized_generator'] is not None:
+            self.vectorized_trainer.generator.set_state(checkpoint['vectorized_generator'])
+        if optimizer is not None:
+            optimizer.load_state_dict(checkpoint['optimizer'])
+        if evaluation_manager is not None:
+            evaluation_manager.load_state_dict(checkpoint['evaluation_manager'])
+        trim_results(
+            saving_path = self.settings.results_path,
+            iteration = checkpoint['iteration']
+            )
+        self.orchestrator_logger.info(f"Resuming the training from the checkpoint {path} (iteration {checkpoint['iteration']}).")
+        return checkpoint['iteration'] + 1
+    
+    
+    def run(
+        self,
+        protocol
+        ) -> int:
+        """Runs the coroutine of the training protocol in an event loop. If an 
+        event loop is already running in the current thread (e.g. in a notebook), 
+        the protocol is run in a separate thread. The writes submitted in the 
+        background are completed even if the protocol is interrupted.
+        
+        Parameters
+        ----------
+        protocol: Coroutine
+            The coroutine of the protocol (e.g. train_protocol_async()).
+        
+        Returns
+        -------
+        int
+            The value returned by the protocol.
+        """
+        try:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(protocol)
+            with ThreadPoolExecutor(max_workers = 1) as executor:
+                return executor.submit(asyncio.run, protocol).result()
+        finally:
+            self.close_archive()
+            if self.local_backend:
+                self.distributed.shutdown()
+                self.distributed = None
+                self.local_backend = False
+    
+    
+    async def in_executor(
+        self,
+        function,
+        **kwargs
+        ):
+        """Runs the blocking function (e.g. the training of the sampled nodes) in 
+        the default executor of the event loop, so the writes submitted in the
+        background can proceed in the meantime. Outside of the asynchronous 
+        mode, the function is simply called.
+        
+        Parameters
+        ----------
+        function: Callable
+            A blocking function.
+        **kwargs: dict
+            Keyword arguments of the function.
+        
+        Returns
+        -------
+        Any
+            The value returned by the function.
+        """
+        if not self.asynchronous:
+            return function(**kwargs)
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(function, **kwargs)
+            )
+    
+    
+    def archive(
+        self,
+        function,
+        **kwargs
+        ) -> None:
+        """Submits a write to the archive (metrics, models, profiles or checkpoints). 
+        In the asynchronous mode, the writes are performed by a single background 
+        thread in the order of their submission, so the files are identical to 
+        those written synchronously. The arguments must not be modified afterwards,
+        with the exception of the central model (see settle_archive).
+        
+        Parameters
+        ----------
+        function: Callable
+            A function performing the write.
+        **kwargs: dict
+            Keyword arguments of the function.
+        
+        Returns
+        -------
+        None
+        """
+        if not self.asynchronous:
+            function(**kwargs)
+            return
+        if self.archive_executor is None:
+            self.archive_executor = ThreadPoolExecutor(
+                max_workers = 1,
+                thread_name_prefix = 'archive'
+                )
+        self.archiving.append(self.archive_executor.submit(function, **kwargs))
+    
+    
+    async def settle_archive(self) -> None:
+        """Waits for the writes submitted to the archive, re-raising any exception 
+        that occured. Must be awaited before the central model is updated and at 
+        the end of the protocol.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+        archiving, self.archiving = self.archiving, []
+        for future in archiving:
+            await asyncio.wrap_future(future)
+    
+    
+    def close_archive(self) -> None:
+        """Completes the writes submitted to the archive and shuts down its executor.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+        if self.archive_executor is not None:
+            self.archive_executor.shutdown(wait = True)
+            self.archive_executor = None
+        self.archiving = []
     
     
     def update_connectivity(self,
@@ -182,6 +1249,19 @@ class Orchestrator():
         Parameters
         ----------
         
+        Returns
+        -------
+        int
+            Returns 0 on the successful completion of the training."""
+        return self.run(self.train_protocol_async())
+    
+    
+    async def train_protocol_async(self) -> int:
+        """Coroutine performing the train_protocol (see Orchestrator.run).
+        
+        Parameters
+        ----------
+        
         Returns
         -------
         int
@@ -191,8 +1271,11 @@ class Orchestrator():
         ########################################################
         ########################################################
         
+        # Restoring the state of the interrupted run (if resume_from is provided).
+        first_iteration = self.load_checkpoint()
+        
         # TRAINING PHASE ----- FEDAVG
-        for iteration in range(self.iterations):
+        for iteration in range(first_iteration, self.iterations):
             # BEGINING OF ITERATION
             ########################################################
             ########################################################
@@ -200,110 +1283,108 @@ class Orchestrator():
             
             ########################################################
             # FEDAVG - INIT PHASE
-            weights = {}
-            training_results = {}
             # Checking for connectivity
             connected_nodes = [node for node in self.network]
             self.orchestrator_logger.info(f"Iteration {iteration}, dispatching nodes to connected clients.")
-            for node in connected_nodes:
-                node.model.update_weights(copy.deepcopy(self.central_model.get_weights()))
+            with self.profiler.phase('broadcast', iteration=iteration):
+                self.broadcast(connected_nodes, self.central_model.get_weights())
             ########################################################
             
             ########################################################
             # FEDAVG - SAMPLING PHASE
-            sampled_nodes = sample_nodes(
-                nodes = connected_nodes, 
-                sample_size = self.sample_size,
-                generator = self.generator
-                ) # SAMPLING FUNCTION
+            with self.profiler.phase('sampling', iteration=iteration):
+                sampled_nodes = sample_nodes(
+                    nodes = connected_nodes, 
+                    sample_size = self.sample_size,
+                    generator = self.generator
+                    ) # SAMPLING FUNCTION
             ########################################################
             
             ########################################################
-            # FEDAVG - TRAINING PHASE
-            # FEDAVG OPTION I: BATCH TRAINING
-            if self.batch_job:
-                self.orchestrator_logger.info(f"Entering batched job, size of the batch {self.batch}")
-                for batch in Helpers.chunker(sampled_nodes, size=self.batch):
-                    with Pool(len(list(batch))) as pool:
-                        results = [pool.apply_async(train_nodes, (node, iteration, 'weights')) for node in batch]
-                        for result in results:
-                            node_id, model_weights, loss_list, accuracy_list = result.get()
-                            weights[node_id] = model_weights
-                            training_results[node_id] = {
-                                "iteration": iteration,
-                                "node_id": node_id,
-                                "loss": loss_list[-1], 
-                                "accuracy": accuracy_list[-1]
-                                }
-            # FEDAVG OPTION II: BATCH TRAINING
-            else:
-                with Pool(self.sample_size) as pool:
-                    results = [pool.apply_async(train_nodes, (node, iteration)) for node in sampled_nodes]
-                    for result in results:
-                            node_id, model_weights, loss_list, accuracy_list = result.get()
-                            weights[node_id] = model_weights
-                            training_results[node_id] = {
-                                "iteration": iteration,
-                                "node_id": node_id,
-                                "loss": loss_list[-1], 
-                                "accuracy": accuracy_list[-1]
-                                }
+            # FEDAVG - TRAINING PHASE (BATCHED IF BATCH_JOB IS ENABLED)
+            aggregator = Streaming_Aggregator() if self.streaming_aggregation else None
+            weights, training_results = await self.in_executor(
+                self.train_sampled_nodes,
+                sampled_nodes = sampled_nodes,
+                iteration = iteration,
+                mode = 'weights',
+                aggregator = aggregator,
+                keep_updates = False
+                )
             ########################################################
             
             ########################################################
             # FEDAVG - TESTING RESULTS BEFORE THE MODEL UPDATE PHASE
             if self.settings.save_training_metrics:
-                save_training_metrics(
-                    file = training_results,
-                    saving_path = self.settings.results_path,
-                    file_name = "training_metrics.csv"
-                    )
+                with self.profiler.phase('archiving', iteration=iteration):
+                    self.archive(
+                        save_training_metrics,
+                        file = training_results,
+                        saving_path = self.settings.results_path,
+                        file_name = "training_metrics.csv"
+                        )
             # METRICS: TEST RESULTS ON NODES (TRAINED MODEL)
-                for node in sampled_nodes:
-                    save_model_metrics(
+                with self.profiler.phase('evaluation', iteration=iteration):
+                    self.evaluate_nodes(
+                        nodes = sampled_nodes,
                         iteration = iteration,
-                        model = node.model,
-                        logger = self.orchestrator_logger,
-                        saving_path = self.settings.results_path,
+                        weights = self.central_model.get_weights(),
                         file_name = 'local_model_on_nodes.csv'
                         )
+            # Models of the lazy nodes are no longer needed in this round.
+            self.release_nodes(sampled_nodes)
             ########################################################
             
             ########################################################
             # FEDAVG: AGGREGATING AND CENTRAL UPDATE
-            avg = Aggregators.compute_average(copy.deepcopy(weights)) # AGGREGATING FUNCTION
-            self.central_model.update_weights(copy.deepcopy(avg))
+            # Writes in the background may still read the central model of the previous round.
+            await self.settle_archive()
+            with self.profiler.phase('aggregation', iteration=iteration):
+                if aggregator is not None:
+                    avg = aggregator.average()
+                else:
+                    avg = Aggregators.compute_average(copy.deepcopy(weights)) # AGGREGATING FUNCTION
+                self.central_model.update_weights(copy.deepcopy(avg))
             ########################################################
             
             ########################################################
             # FEDAVG - UPDATING THE NODES AND SAVE RESULTS
-            for node in connected_nodes:
-                node.model.update_weights(copy.deepcopy(avg))
-            self.central_model.update_weights(copy.deepcopy(avg))
+            with self.profiler.phase('broadcast', iteration=iteration):
+                self.broadcast(connected_nodes, avg)
+                self.central_model.update_weights(copy.deepcopy(avg))
             if self.settings.save_training_metrics:
-                save_model_metrics(
-                    iteration = iteration,
-                    model = self.central_model,
-                    logger = self.orchestrator_logger,
-                    saving_path = self.settings.results_path,
-                    file_name = "global_model_on_orchestrator.csv"
-                )
-                for node in connected_nodes:
-                    save_model_metrics(
-                        iteration = iteration,
-                        model = node.model,
-                        logger = self.orchestrator_logger,
+                with self.profiler.phase('evaluation', iteration=iteration):
+                    self.archive(
+                        save_metrics,
+                        metrics = compute_model_metrics(
+                            iteration = iteration,
+                            model = self.central_model,
+                            logger = self.orchestrator_logger
+                            ),
                         saving_path = self.settings.results_path,
-                        file_name = "global_model_on_nodes.csv")
+                        file_name = "global_model_on_orchestrator.csv"
+                    )
+                    self.evaluate_nodes(
+                        nodes = connected_nodes,
+                        iteration = iteration,
+                        weights = avg,
+                        file_name = "global_model_on_nodes.csv"
+                        )
             ########################################################
             
             if self.full_debug == True:
                 log_gpu_memory(iteration=iteration)
+            self.export_profile(iteration=iteration)
+            self.save_checkpoint(iteration=iteration)
             ########################################################
             ########################################################
             # END OF ITERATION
                             
         ########################################################
+        # Writes still in the background are completed.
+        await self.settle_archive()
+        # Updates still in flight (in the deadline mode) are discarded.
+        self.close_pool()
         self.orchestrator_logger.critical("Training complete")
         return 0
                         
@@ -26,6 +26,7 @@ class EvaluatorSettings(FedoptSettings):
                  in_sample_shap: bool = False,
                  line_search_length: int = 1,
                  scheduler = None,
+                 evaluation_budget: float = None,
                  root_name : str = os.getcwd(),
                  **kwargs) -> None:
         """Initialization of an instance of the FedoptSettings object. Requires choosing the initialization method.
@@ -74,6 +75,7 @@ class EvaluatorSettings(FedoptSettings):
         self.in_sample_alpha = in_sample_alpha
         self.line_search_length = line_search_length
         self.scheduler = scheduler
+        self.evaluation_budget = evaluation_budget
         self.print_evaluator_template()
 
 
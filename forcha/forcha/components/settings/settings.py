@@ -35,7 +35,11 @@ class Settings():
         -------
         None
         """
-        acceptable_keys_list = ['momentum', 'nesterov', 'force_cpu']
+        acceptable_keys_list = ['momentum', 'nesterov', 'force_cpu', 'profiling',
+                                'num_workers', 'eval_batch_size', 'prefetch_factor',
+                                'persistent_workers', 'pin_memory', 'lazy_nodes',
+                                'fast_training', 'compile_mode', 'foreach', 'fused',
+                                'resume_from']
         self.simulation_seed = simulation_seed
         self.global_epochs = global_epochs
         self.local_epochs = local_epochs
@@ -49,7 +53,8 @@ class Settings():
         self.save_training_metrics = save_training_metrics
 
         self.orchestrator_model_path, self.nodes_model_path, self.results_path = self.form_archive(
-            root_name = root_name
+            root_name = root_name,
+            resume_from = kwargs.get('resume_from')
         )
         for k in kwargs.keys():
             if k in acceptable_keys_list:
@@ -61,16 +66,46 @@ class Settings():
 
     def form_archive(
         self,
-        root_name: str
+        root_name: str,
+        resume_from: str = None
         ):
+        """Creates the archive of the run (directories for the results and the
+        models) in the root_name directory. If resume_from is provided, the run
+        continues in the archive of the checkpoint, and no new archive is created.
+        
+        Parameters
+        ----------
+        root_name: str
+            The directory in which the archive is created.
+        resume_from: str, default to None
+            Path to a checkpoint (or to the archive containing it).
+        
+        Returns
+        -------
+        tuple[str, str, str]
+            Paths of the orchestrator's models, the nodes' models and the results.
+        """
+        if resume_from is not None:
+            if os.path.isdir(resume_from):
+                root_name = resume_from
+            else:
+                # The checkpoint is kept in the 'checkpoints' directory of the archive.
+                root_name = os.path.dirname(os.path.dirname(os.path.abspath(resume_from)))
+            results_path = os.path.join(root_name, 'results')
+            if not os.path.isdir(results_path):
+                raise SettingsObjectException(f"The archive of the checkpoint {resume_from} does not exist.")
+            model_path = os.path.join(root_name, 'models')
+            return (os.path.join(model_path, 'orchestrator'), os.path.join(model_path, 'nodes'), results_path)
+        
         time_tuple = time.localtime()
         time_string = time.strftime("%m_%d_%Y__%H_%M_%S", time_tuple)
-        root_name = os.path.join(root_name, f"archiver_from_{time_string}")
+        archive_name = os.path.join(root_name, f"archiver_from_{time_string}")
         
         counter = 1
-        while os.path.exists(root_name):
-            root_name = os.path.join(os.getcwd(), f"archiver_from_{time_string}_{counter}")
+        while os.path.exists(archive_name):
+            archive_name = os.path.join(root_name, f"archiver_from_{time_string}_{counter}")
             counter += 1
+        root_name = archive_name
         
         # General Directory
         os.mkdir(root_name)
@@ -11,8 +11,11 @@ from torch import nn, optim
 from torchvision import transforms
 from sklearn.metrics import f1_score, recall_score, confusion_matrix, precision_score
 import os
+import multiprocessing
 from forcha.exceptions.modelexception import ModelException
+from forcha.models.replica_pool import ReplicaPool
 from forcha.utils.loggers import Loggers
+from forcha.utils.profiler import Profiler
 from forcha.components.settings.settings import Settings
 
 model_logger = Loggers.model_logger()
@@ -29,7 +32,8 @@ class FederatedModel:
         settings: Settings,
         net: nn.Module,
         local_dataset: list[arrow_dataset.Dataset, arrow_dataset.Dataset] | list[arrow_dataset.Dataset],
-        node_name: int
+        node_name: int,
+        replica_pool: ReplicaPool = None
         ) -> None:
         """Initialize the Federated Model. This model will be attached to a 
         specific client and will wait for further instructions.
@@ -44,6 +48,9 @@ class FederatedModel:
             The local dataset that will be used with this set.
         node_name: int 
             An identifier for the node that uses this container.
+        replica_pool: ReplicaPool, default to None
+            If provided, the net is borrowed from the pool (instead of being
+            copied) and returned to it by the release() method.
         
         Returns
         -------
@@ -55,11 +62,34 @@ class FederatedModel:
         else:
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.cpu = torch.device("cpu")
-        self.initial_model = None
+        self.initial_weights = None # Flat snapshot of the received weights.
+        self.weights_layout = None # Offsets and shapes of the weights in the snapshot.
+        self.initial_buffers = None # Non-floating entries of the received state dict.
         self.optimizer = None  
-        self.net = copy.deepcopy(net) # Do we need to create a deepcopy?
+        self.replica_pool = replica_pool
+        if replica_pool is not None:
+            self.net = replica_pool.acquire()
+        else:
+            self.net = copy.deepcopy(net) # Do we need to create a deepcopy?
         self.settings = settings
         self.node_name = node_name
+        # Fast training: bf16 autocast and channels-last memory format (convolutional nets).
+        self.fast_training = getattr(settings, 'fast_training', False)
+        if self.fast_training:
+            self.net = self.net.to(memory_format=torch.channels_last)
+        self.criterion = nn.CrossEntropyLoss()
+        # Compilation of the forward pass ('compile' or 'script'), performed upon the first call.
+        self.compile_mode = getattr(settings, 'compile_mode', None)
+        if self.compile_mode not in (None, 'compile', 'script'):
+            raise ModelException(f"The compile_mode should be either 'compile' or 'script', got {self.compile_mode}.")
+        self.compiled_net = None
+        self.net_device = None # Device the net was last placed on (see place_model).
+        self.evaluation_buffers = None # Buffers reused by the evaluation engine.
+        # Phase-level instrumentation (no-op unless enabled in the settings)
+        self.profiler = Profiler(
+            enabled = getattr(settings, 'profiling', False),
+            node_name = node_name
+            )
         
         # If both, train and test data were provided
         if len(local_dataset) == 2:
@@ -189,14 +219,14 @@ class FederatedModel:
                 local_dataset[0],
                 batch_size=batch_size,
                 shuffle=True,
-                num_workers=0,
+                **self.loader_options(persistent=True)
             )
 
             testloader = torch.utils.data.DataLoader(
                 local_dataset[1],
-                batch_size=16,
+                batch_size=getattr(self.settings, 'eval_batch_size', 16),
                 shuffle=False,
-                num_workers=0,
+                **self.loader_options()
             )
             #self.print_data_stats(trainloader) #TODO
             return trainloader, testloader
@@ -204,13 +234,107 @@ class FederatedModel:
             local_dataset[0] = local_dataset[0].with_transform(self.transform_func)
             testloader = torch.utils.data.DataLoader(
                 local_dataset[0],
-                batch_size=16,
+                batch_size=getattr(self.settings, 'eval_batch_size', 16),
                 shuffle=False,
-                num_workers=0,
+                **self.loader_options()
             )
             return testloader
 
 
+    def loader_options(
+        self,
+        persistent: bool = False
+        ) -> dict:
+        """Returns the keyword arguments of the DataLoaders, established from the
+        (optional) settings: num_workers, prefetch_factor, persistent_workers
+        and pin_memory. The workers are kept alive between the epochs (persistent_workers,
+        enabled by default) only for the training loader, used by the node in each round.
+        The test loaders are iterated in the main process for every connected node,
+        so their workers are shut down after each evaluation. If num_workers is set to 'auto', the number of workers is 
+        sized from the available cores and the sample size, so the nodes training
+        simultaneously and their loaders do not compete for the same cores. 
+        The nodes are trained in non-daemonic processes (see 
+        forcha.utils.orchestrations.Training_Pool and the workers of the
+        distributed backend), so the options apply there. Daemonic processes
+        (e.g. the workers of a plain multiprocessing.Pool) can not start the 
+        loader's workers, so the data is always loaded in the main process there.
+        
+        Parameters
+        ----------
+        persistent: bool, default to False
+            Whether the loader may keep its workers alive (the training loader).
+        
+        Returns
+        -------
+        dict
+            Keyword arguments passed to torch.utils.data.DataLoader.
+        """
+        num_workers = getattr(self.settings, 'num_workers', 0)
+        if multiprocessing.current_process().daemon:
+            num_workers = 0
+        elif num_workers == 'auto':
+            cores_per_node = (os.cpu_count() or 1) // max(self.settings.sample_size, 1)
+            # One core is left for the training loop itself.
+            num_workers = max(cores_per_node - 1, 0)
+        
+        options = {
+            'num_workers': num_workers,
+            'pin_memory': getattr(self.settings, 'pin_memory', self.device.type == 'cuda')
+            }
+        # Prefetching and persistent workers are only valid with the worker processes.
+        if num_workers > 0:
+            options['persistent_workers'] = persistent and getattr(self.settings, 'persistent_workers', True)
+            if hasattr(self.settings, 'prefetch_factor'):
+                options['prefetch_factor'] = self.settings.prefetch_factor
+        return options
+
+
+    def __getstate__(self) -> dict:
+        # Iterators of the persistent loaders hold the worker processes and can not
+        # be pickled (models travel with the nodes to the pool's workers).
+        state = self.__dict__.copy()
+        # The pool stays in the process that owns it, the receiving process gets its own copy of the borrowed replica.
+        state['replica_pool'] = None
+        # The compiled forward pass is not used in the worker processes (see forward).
+        state['compiled_net'] = None
+        for name in ('trainloader', 'testloader'):
+            loader = state.get(name)
+            if loader is not None and getattr(loader, '_iterator', None) is not None:
+                loader = copy.copy(loader)
+                loader._iterator = None
+                state[name] = loader
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # The loaders were built in the sending process, a daemonic receiver
+        # (e.g. a worker of a plain multiprocessing.Pool) can not start their workers.
+        if multiprocessing.current_process().daemon:
+            for name in ('trainloader', 'testloader'):
+                loader = state.get(name)
+                if loader is not None and loader.num_workers > 0:
+                    loader.num_workers = 0
+
+
+    def release(self) -> None:
+        """Returns the borrowed net to the replica pool. The model can not be
+        used afterwards. Has no effect if the net was not borrowed from a pool.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+        if self.replica_pool is not None and self.net is not None:
+            self.replica_pool.release(self.net)
+            self.net = None
+            self.initial_weights = None
+
+
     def print_model_footprint(self) -> None:
         """Prints all the information about the model..
         Args:
@@ -238,6 +362,91 @@ class FederatedModel:
         # model_logger.info(f"{self.node_name}: Test set size: {num_examples['testset']}")
 
 
+    def forward(
+        self,
+        inputs: torch.Tensor
+        ) -> torch.Tensor:
+        """Performs the forward pass of the network. If the compile_mode is set
+        in the settings, the net is compiled (with torch.compile or torch.jit.script)
+        upon the first call and the compiled version is reused afterwards. As
+        the weights are loaded into the net in place, the compiled version stays
+        valid across the update_weights calls. The time of the first (compiling)
+        call is recorded by the profiler as the compilation phase.
+        Only the models living in the main process (the evaluation path) are
+        compiled. The worker processes (e.g. of the Training_Pool) are started
+        anew every round and receive a fresh copy of the model, so compiling
+        there would be repeated for every node in every round; they run the
+        eager net instead.
+        
+        Parameters
+        ----------
+        inputs: torch.Tensor
+            A batch of inputs, placed on the device of the model.
+        
+        Returns
+        -------
+        torch.Tensor
+        """
+        if self.compile_mode is None or multiprocessing.parent_process() is not None:
+            return self.net(inputs)
+        if self.compiled_net is None:
+            with self.profiler.phase('compilation'):
+                if self.compile_mode == 'compile':
+                    self.compiled_net = torch.compile(self.net)
+                else:
+                    self.compiled_net = torch.jit.script(self.net)
+                self.compiled_net.train(self.net.training)
+                return self.compiled_net(inputs)
+        # Scripted modules keep their own training flags.
+        if self.compiled_net.training != self.net.training:
+            self.compiled_net.train(self.net.training)
+        return self.compiled_net(inputs)
+
+
+    def place_model(
+        self,
+        device: torch.device = None
+        ) -> None:
+        """Places the net on the device (by default, the device of the model),
+        unless it was already placed there.
+        
+        Parameters
+        ----------
+        device: torch.device, default to None
+            Target device, the device of the model if not provided.
+        
+        Returns
+        -------
+        None
+        """
+        device = self.device if device is None else device
+        if self.net_device != device:
+            self.net.to(device)
+            self.net_device = device
+
+
+    def place_inputs(
+        self,
+        inputs: torch.Tensor
+        ) -> torch.Tensor:
+        """Moves the batch of inputs to the device of the model. In the fast 
+        training mode, the batches of images are converted to the channels-last
+        memory format, matching the format of the convolutional layers.
+        
+        Parameters
+        ----------
+        inputs: torch.Tensor
+            A batch of inputs.
+        
+        Returns
+        -------
+        torch.Tensor
+        """
+        if self.fast_training and inputs.dim() == 4:
+            return inputs.to(self.device, memory_format=torch.channels_last)
+        return inputs.to(self.device)
+
+
     def get_weights_list(self) -> list[float]:
         """Get the parameters of the network.
         
@@ -265,15 +474,26 @@ class FederatedModel:
         -------------
             _type_: weights of the network
         """
-        self.net.to(self.cpu) # Dupming weights on cpu.
+        self.place_model(self.cpu) # Dupming weights on cpu.
         return self.net.state_dict()
     
     
-    def get_gradients(self) -> None:
-        """Get the gradients of the network (differences between received and trained model)
+    def get_gradients(
+        self,
+        out: torch.Tensor = None
+        ) -> OrderedDict:
+        """Get the gradients of the network (differences between received and trained model).
+        The difference of the floating point weights is computed in a single operation
+        over the flat snapshot preserved by preserve_initial_model(); the returned
+        tensors are the views into the flat result.
         
         Parameters
         ----------
+        out: torch.Tensor, default to None
+            A flat (shared) buffer the difference is written into, of the size
+            returned by flat_size(). If not provided, a new buffer is allocated.
+            The returned gradients are views into this buffer, so it should not 
+            be reused until they are consumed.
         
         Raises
         -------------
@@ -283,17 +503,64 @@ class FederatedModel:
         -------------
             Oredered_Dict: Gradients of the network.
         """
-        assert self.initial_model != None, "Computing gradients require saving initial model first!"
-        self.net.to(self.cpu) # Dupming weights on cpu.
-        self.initial_model.to(self.cpu)
-        weights_t1 = self.net.state_dict()
-        weights_t2 = self.initial_model.state_dict()
+        assert self.initial_weights is not None, "Computing gradients require saving initial model first!"
+        self.place_model(self.cpu) # Dupming weights on cpu.
+        self.initial_weights = self.initial_weights.to(self.cpu)
+        weights = self.net.state_dict()
+        
+        if out is None:
+            out = torch.empty_like(self.initial_weights)
+        elif out.numel() != self.initial_weights.numel():
+            raise ModelException(f"The output buffer should contain {self.initial_weights.numel()} elements, got {out.numel()}.")
+        torch.cat([weights[key].reshape(-1) for key in self.weights_layout], out=out)
+        out.sub_(self.initial_weights)
+        
+        self.gradients = OrderedDict()
+        for key, tensor in weights.items():
+            if key in self.weights_layout:
+                offset, shape = self.weights_layout[key]
+                self.gradients[key] = out[offset:offset + tensor.numel()].view(shape)
+            else:
+                self.gradients[key] = tensor - self.initial_buffers[key]
+        return self.gradients
+
+
+    def flat_size(self) -> int:
+        """Returns the number of the floating point elements in the state dict
+        of the network (the size of the flat snapshot and of the gradients' buffer).
+        
+        Parameters
+        ----------
+        None
         
-        self.gradients = OrderedDict.fromkeys(weights_t1.keys(), 0)
-        for key in weights_t1:
-            self.gradients[key] =  weights_t1[key] - weights_t2[key]
+        Returns
+        -------
+        int
+        """
+        return sum(tensor.numel() for tensor in self.net.state_dict().values() if tensor.is_floating_point())
 
-        return self.gradients # Try: to provide original weights, no copies
+
+    def initial_state_dict(self) -> OrderedDict:
+        """Returns the preserved initial weights as a state dict (views into the
+        flat snapshot).
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        OrderedDict
+        """
+        assert self.initial_weights is not None, "The initial model was not preserved!"
+        state = OrderedDict()
+        for key, tensor in self.net.state_dict().items():
+            if key in self.weights_layout:
+                offset, shape = self.weights_layout[key]
+                state[key] = self.initial_weights[offset:offset + tensor.numel()].view(shape)
+            else:
+                state[key] = self.initial_buffers[key]
+        return state
 
 
     def update_weights(
@@ -351,16 +618,34 @@ class FederatedModel:
     def preserve_initial_model(self) -> None:
         """Preserve the initial model provided at the
         end of the turn (necessary for computing gradients,
-        when using aggregating methods such as FedOpt).
+        when using aggregating methods such as FedOpt). The floating
+        point weights are copied into a single flat buffer (reused in
+        the following rounds), the remaining entries of the state dict
+        (e.g. integer counters) are cloned.
         
         Parameters
         ----------
         
         Returns
         -------
-            Tuple[float, float]: Loss and accuracy on the training set.
+        None
         """
-        self.initial_model = copy.deepcopy(self.net)
+        weights = self.net.state_dict()
+        floating = [tensor for tensor in weights.values() if tensor.is_floating_point()]
+        self.weights_layout = OrderedDict()
+        offset = 0
+        for key, tensor in weights.items():
+            if tensor.is_floating_point():
+                self.weights_layout[key] = (offset, tensor.shape)
+                offset += tensor.numel()
+        
+        if (self.initial_weights is None or self.initial_weights.numel() != offset
+            or self.initial_weights.device != floating[0].device
+            or self.initial_weights.dtype != floating[0].dtype):
+            self.initial_weights = torch.empty(offset, dtype=floating[0].dtype, device=floating[0].device)
+        torch.cat([tensor.reshape(-1) for tensor in floating], out=self.initial_weights)
+        self.initial_buffers = {key: tensor.clone() for key, tensor in weights.items()
+                                if not tensor.is_floating_point()}
 
 
     def train(
@@ -368,7 +653,9 @@ class FederatedModel:
         iteration: int,
         epoch: int
         ) -> tuple[float, torch.tensor]:
-        """Train the network and computes loss and accuracy.
+        """Train the network and computes loss and accuracy. If fast_training
+        is enabled in the settings, the forward pass and the loss are computed
+        under the bf16 autocast.
         
         Parameters
         ----------
@@ -381,32 +668,34 @@ class FederatedModel:
         -------
         None
         """
-        criterion = nn.CrossEntropyLoss()
         train_loss = 0
         correct = 0
         total = 0
         # Try: to place a net on the device during the training stage
-        self.net.to(self.device)
+        self.place_model()
         self.net.train()
-        for _, dic in enumerate(self.trainloader):
-            inputs = dic['image']
-            targets = dic['label']
-            inputs, targets = inputs.to(self.device), targets.to(self.device)
-            self.net.zero_grad() # Zero grading the network                        
-            # forward pass, backward pass and optimization
-            outputs = self.net(inputs)
-            loss = criterion(outputs, targets)
-            loss.backward()
-            self.optimizer.step()
+        with self.profiler.phase('local_training', iteration=iteration):
+            for _, dic in enumerate(self.trainloader):
+                inputs = dic['image']
+                targets = dic['label']
+                inputs, targets = self.place_inputs(inputs), targets.to(self.device)
+                self.net.zero_grad() # Zero grading the network                        
+                # forward pass, backward pass and optimization
+                with torch.autocast(device_type=self.device.type, dtype=torch.bfloat16, enabled=self.fast_training):
+                    outputs = self.forward(inputs)
+                    loss = self.criterion(outputs, targets)
+                loss.backward()
+                self.optimizer.step()
             
-            train_loss += loss.item()
-            predicted = torch.nn.functional.softmax(outputs, dim=1).argmax(dim=1)
-            total += targets.size(0)
-            correct += predicted.eq(targets).sum().item()
+                train_loss += loss.item()
+                # Softmax preserves the order of the logits, the prediction is their argmax.
+                predicted = outputs.argmax(dim=1)
+                total += targets.size(0)
+                correct += predicted.eq(targets).sum().item()
                     
-            # Emptying the cuda_cache
-            # if torch.cuda.is_available():
-            #     torch.cuda.empty_cache()
+                # Emptying the cuda_cache
+                # if torch.cuda.is_available():
+                #     torch.cuda.empty_cache()
 
         loss = train_loss / len(self.trainloader)
         accuracy = correct / total
@@ -426,37 +715,12 @@ class FederatedModel:
         -------
             Tuple[float, float]: loss and accuracy on the test set.
         """
-        # Try: to place net on device directly during the evaluation stage.
-        self.net.to(self.device)
-        self.net.eval()
-        criterion = nn.CrossEntropyLoss()
-        test_loss = 0
-        correct = 0
-        total = 0
-        y_pred = []
-        y_true = []
-        losses = []
-        
-        with torch.no_grad():
-            for _, dic in enumerate(self.testloader):
-                inputs = dic['image']
-                targets = dic['label']
-                inputs, targets = inputs.to(self.device), targets.to(self.device)
-                output = self.net(inputs)
-                
-                total += targets.size(0)
-                test_loss = criterion(output, targets).item()
-                losses.append(test_loss)
-                pred = torch.nn.functional.softmax(output, dim=1).argmax(dim=1, keepdim=True)
-                correct += pred.eq(targets.view_as(pred)).sum().item()
-                y_pred.append(pred)
-                y_true.append(targets)
-
-        test_loss = np.mean(losses)
-        accuracy = correct / total
+        losses, y_pred, y_true = self.inference()
+        test_loss = np.mean(losses.numpy())
+        accuracy = y_pred.eq(y_true).sum().item() / y_true.numel()
 
-        y_true = [item.item() for sublist in y_true for item in sublist]
-        y_pred = [item.item() for sublist in y_pred for item in sublist]
+        y_true = y_true.numpy()
+        y_pred = y_pred.numpy()
 
         f1score = f1_score(y_true, y_pred, average="macro")
         precision = precision_score(y_true, y_pred, average="macro")
@@ -516,41 +780,79 @@ class FederatedModel:
         -------
             Tuple[float, float]: loss and accuracy on the test set.
         """
-        # Try: to place net on device directly during the evaluation stage.
-        self.net.to(self.device)
-        criterion = nn.CrossEntropyLoss()
-        test_loss = 0
-        correct = 0
-        total = 0
+        losses, predictions, targets = self.inference()
+        test_loss = sum(losses.tolist()) / losses.numel()
+        accuracy = predictions.eq(targets).sum().item() / targets.numel()
         
-        with torch.no_grad():
-            for _, dic in enumerate(self.testloader):
-                inputs = dic['image']
-                targets = dic['label']
-                inputs, targets = inputs.to(self.device), targets.to(self.device)
-                outputs = self.net(inputs)
-                loss = criterion(outputs, targets)
-                
-                test_loss += loss.item()
-                predicted = torch.nn.functional.softmax(outputs, dim=1).argmax(dim=1, keepdim=True)
-                total += targets.size(0)
-                correct += predicted.eq(targets).sum().item()
+        return (
+            test_loss,
+            accuracy
+            )
+
+
+    def inference(self) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Evaluation engine shared by evaluate_model and quick_evaluate. Runs the
+        network (in the evaluation mode) over the local test set under the
+        torch.inference_mode. The results are written into the buffers allocated
+        upon the first call and reused by the following calls (e.g. when the same
+        model evaluates the consecutive coalitions).
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        tuple[torch.Tensor, torch.Tensor, torch.Tensor]
+            Losses of the batches, predicted labels and the true labels (on cpu).
+            The tensors are views into the buffers of the model, overwritten by 
+            the next call.
+        
+        Raises
+        ------
+        ValueError
+            If the local test set is empty.
+        """
+        batches, samples = len(self.testloader), len(self.testloader.dataset)
+        if batches == 0:
+            raise ValueError(f"The test set of the node {self.node_name} is empty, the model can not be evaluated.")
+        self.place_model()
+        self.net.eval()
+        if self.evaluation_buffers is None or self.evaluation_buffers[0].numel() != batches \
+            or self.evaluation_buffers[1].numel() != samples:
+            self.evaluation_buffers = (
+                torch.empty(batches, dtype=torch.float64),
+                torch.empty(samples, dtype=torch.long),
+                torch.empty(samples, dtype=torch.long)
+                )
+        losses, predictions, labels = self.evaluation_buffers
+        
+        offset = 0
+        with torch.inference_mode(), self.profiler.phase('evaluation'):
+            for batch, dic in enumerate(self.testloader):
+                inputs = self.place_inputs(dic['image'])
+                targets = dic['label'].to(self.device)
+                outputs = self.forward(inputs)
+                size = targets.size(0)
+                losses[batch] = self.criterion(outputs, targets).item()
+                # Softmax preserves the order of the logits, the prediction is their argmax.
+                predictions[offset:offset + size] = outputs.argmax(dim=1)
+                labels[offset:offset + size] = targets
+                offset += size
         
-        test_loss = test_loss / len(self.testloader)
-        accuracy = correct / total
-                
         # # Emptying the cuda_cache
         # if torch.cuda.is_available():
         #     torch.cuda.empty_cache()
-
+        
         return (
-            test_loss,
-            accuracy
+            losses[:batch + 1],
+            predictions[:offset],
+            labels[:offset]
             )
 
 
+    @staticmethod
     def transform_func(
-        self,
         data
         ):
         convert_tensor = transforms.ToTensor()
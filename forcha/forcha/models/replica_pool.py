@@ -0,0 +1,125 @@
+import copy
+import threading
+
+from torch import nn
+
+from forcha.exceptions.modelexception import ModelException
+from forcha.utils.loggers import Loggers
+
+model_logger = Loggers.model_logger()
+
+
+class ReplicaPool:
+    """A fixed pool of pre-built replicas of the network template. Instead of
+    building a new nn.Module for every FederatedModel materialized in the main
+    process (e.g. for the local evaluation of the sampled nodes), the models
+    borrow a replica from the pool, load their weights (and optimizer state)
+    into it and return it once they are released. With one replica per sampled
+    node, the memory held by the networks of the main process depends on the
+    sample size rather than on the number of the nodes.
+    The pool is not shared with the worker processes: a model sent to a training
+    worker is pickled together with its own copy of the net, which the worker
+    builds anew (along with the loaders and the optimizer) in every round.
+    """
+    def __init__(
+        self,
+        net: nn.Module,
+        size: int
+        ) -> None:
+        """Builds the replicas of the network template.
+
+        Parameters
+        ----------
+        net: nn.Module
+            Template of the network, the replicas are its deep copies.
+        size: int
+            Number of the replicas (usually, the sample size).
+
+        Returns
+        -------
+        None
+        """
+        self.template = net
+        self.size = max(size, 1)
+        self.replicas = [copy.deepcopy(net) for _ in range(self.size)]
+        self.available = list(self.replicas)
+        self.lock = threading.Lock()
+
+
+    def acquire(self) -> nn.Module:
+        """Borrows a replica from the pool. The replica is reset to the
+        weights of the template, so it is indistinguishable from a fresh copy.
+        If all the replicas are borrowed, the pool is extended by one replica.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        nn.Module
+        """
+        with self.lock:
+            if self.available:
+                replica = self.available.pop()
+            else:
+                model_logger.warning(f"All {self.size} replicas of the pool are in use, extending the pool.")
+                replica = copy.deepcopy(self.template)
+                self.replicas.append(replica)
+                self.size += 1
+        replica.load_state_dict(self.template.state_dict(), strict=True)
+        for parameter in replica.parameters():
+            parameter.grad = None
+        return replica
+
+
+    def release(
+        self,
+        replica: nn.Module
+        ) -> None:
+        """Returns the borrowed replica to the pool.
+
+        Parameters
+        ----------
+        replica: nn.Module
+            Replica obtained from the acquire() method.
+
+        Returns
+        -------
+        None
+        """
+        with self.lock:
+            if not any(replica is owned for owned in self.replicas):
+                raise ModelException("The returned network does not belong to the pool.")
+            if not any(replica is free for free in self.available):
+                self.available.append(replica)
+
+
+    def in_use(self) -> int:
+        """Returns the number of the borrowed replicas.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+        """
+        return self.size - len(self.available)
+
+
+    def __len__(self) -> int:
+        return self.size
+
+
+    def __getstate__(self) -> dict:
+        # The lock can not be pickled.
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -130,7 +130,7 @@ class MNIST_CNN(nn.Module):
         x = self.conv1(x)
         x = self.conv2(x)
         x = self.conv3(x)
-        x = x.view(-1, 64 * 7 * 7) 
+        x = x.reshape(-1, 64 * 7 * 7) 
         x = self.fc1(x)
         x = self.fc2(x)      
         return F.log_softmax(self.fc3(x), dim=1)
@@ -187,7 +187,7 @@ class MNIST_Expanded_CNN(nn.Module):
         x = self.conv1(x)
         x = self.conv2(x)
         x = self.conv3(x)
-        x = x.view(-1, 32 * 28 * 28) 
+        x = x.reshape(-1, 32 * 28 * 28) 
         x = self.fc1(x)
         x = self.fc2(x)
         x = self.fc3(x)      
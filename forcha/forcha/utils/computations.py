@@ -1,7 +1,9 @@
 from collections import OrderedDict
-from typing import Any, Mapping, TypeVar
+from typing import Any, Iterable, Mapping, TypeVar
 import torch
 import itertools
+import math
+import numpy as np
 from torch import Tensor
 
 class Aggregators:
@@ -70,6 +72,58 @@ class Aggregators:
         return distances
     
 
+class Streaming_Aggregator:
+    """Running-sum counterpart of the Aggregators.compute_average. Updates are 
+    folded into a single accumulator as soon as they arrive, so the server does
+    not need to hold the updates of all the sampled nodes at once - only the
+    accumulator (a single copy of the parameters) is kept. The order of the folds
+    changes the average up to the floating-point rounding, so the updates should
+    be folded in a fixed order (e.g. the order of the sample) to reproduce it."""
+    
+    def __init__(self) -> None:
+        self.accumulator = None
+        self.count = 0
+    
+    
+    def fold(
+        self,
+        update: dict
+        ) -> None:
+        """Adds the update to the accumulator. The update itself is not modified,
+        so it can be released (or retained, e.g. for the evaluators) by the caller.
+        
+        Parameters
+        ----------
+        update: dict
+            Weights or gradients of a single node.
+        
+        Returns
+        -------
+        None
+        """
+        if self.accumulator is None:
+            self.accumulator = OrderedDict((key, tensor.clone()) for key, tensor in update.items())
+        else:
+            for key, tensor in update.items():
+                self.accumulator[key] += tensor
+        self.count += 1
+    
+    
+    def average(self) -> OrderedDict:
+        """Returns the average of the folded updates.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        OrderedDict
+        """
+        assert self.count > 0, "Computing the average requires folding at least one update!"
+        return OrderedDict((key, torch.div(tensor, self.count)) for key, tensor in self.accumulator.items())
+
+
 class Subsets:
     """Defines the Subsets class - a set of static methods
     that helps with some set operations."""
@@ -146,3 +200,199 @@ class Subsets:
         if type(coalitions) == list:
             subsets = [nodes for nodes in coalitions if searched_node not in nodes]
         return subsets
+
+
+class Coalition_Index:
+    """Coalition Index encodes every coalition of the elements as an integer
+    bitmask (the i-th bit is set if the i-th element belongs to the coalition)
+    and stores the scores of the coalitions in a dense NumPy array indexed by
+    that mask. Unlike the {tuple: value} supersets, the index does not need to
+    enumerate or sort any tuples and allows to compute the Shapley values with
+    a vectorized mask arithmetic."""
+
+    def __init__(
+        self,
+        elements: list
+        ) -> None:
+        """Initializes the Coalition Index.
+
+        Parameters
+        ----------
+        elements: list
+            A list of elements (e.g. ids of the sampled nodes).
+
+        Returns
+        -------
+        None
+        """
+        self.elements = list(elements)
+        self.size = len(self.elements)
+        self.positions = {element: position for position, element in enumerate(self.elements)}
+        self.scores = np.full(2 ** self.size, np.nan)
+        # Cardinality of every coalition, built bit by bit (popcount of the mask).
+        self.cardinality = np.zeros(2 ** self.size, dtype=np.int64)
+        for position in range(self.size):
+            self.cardinality[1 << position : 1 << (position + 1)] = self.cardinality[: 1 << position] + 1
+        # Masks ordered by the cardinality of the coalitions.
+        self.order = np.argsort(self.cardinality, kind='stable')
+
+
+    def mask(
+        self,
+        coalition: Iterable
+        ) -> int:
+        """Returns the bitmask of the coalition.
+
+        Parameters
+        ----------
+        coalition: Iterable
+            Elements of the coalition.
+
+        Returns
+        -------
+        int
+        """
+        mask = 0
+        for element in coalition:
+            mask |= 1 << self.positions[element]
+        return mask
+
+
+    def coalition(
+        self,
+        mask: int
+        ) -> tuple:
+        """Returns the (sorted) coalition encoded by the bitmask.
+
+        Parameters
+        ----------
+        mask: int
+            Bitmask of the coalition.
+
+        Returns
+        -------
+        tuple
+        """
+        return tuple(sorted(element for position, element in enumerate(self.elements) if mask >> position & 1))
+
+
+    def masks(
+        self,
+        remove_empty: bool = True
+        ) -> np.ndarray:
+        """Returns the bitmasks of all the coalitions, ordered by their cardinality.
+
+        Parameters
+        ----------
+        remove_empty: bool, default to True
+            If True, the empty coalition is omitted.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return self.order[1:] if remove_empty else self.order
+
+
+    def masks_without(
+        self,
+        element: Any,
+        remove_empty: bool = True
+        ) -> np.ndarray:
+        """Returns the bitmasks of all the coalitions that DO NOT CONTAIN the element.
+
+        Parameters
+        ----------
+        element: Any
+            The searched element.
+        remove_empty: bool, default to True
+            If True, the empty coalition is omitted.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        masks = self.masks(remove_empty=remove_empty)
+        return masks[(masks & (1 << self.positions[element])) == 0]
+
+
+    def record(
+        self,
+        mask: int,
+        score: float
+        ) -> None:
+        """Records the score of the coalition.
+
+        Parameters
+        ----------
+        mask: int
+            Bitmask of the coalition.
+        score: float
+            Score of the coalition.
+
+        Returns
+        -------
+        None
+        """
+        self.scores[mask] = score
+
+
+    def is_recorded(
+        self,
+        mask: int
+        ) -> bool:
+        """Checks whether the score of the coalition was already recorded.
+
+        Parameters
+        ----------
+        mask: int
+            Bitmask of the coalition.
+
+        Returns
+        -------
+        bool
+        """
+        return not np.isnan(self.scores[mask])
+
+
+    def shapley_values(
+        self,
+        remove_empty: bool = True
+        ) -> dict[Any, float]:
+        """Computes the Shapley values of all the elements from the recorded scores.
+        The marginal contributions of each element are obtained with a vectorized
+        mask arithmetic: score[S | i] - score[S] for every S not containing i,
+        weighted by 1 / comb(n - 1, |S|).
+
+        Parameters
+        ----------
+        remove_empty: bool, default to True
+            If True, the marginal contribution to the empty coalition is omitted.
+
+        Returns
+        -------
+        dict[Any, float]
+            Shapley values mapped to the elements.
+        """
+        weights = 1 / np.array([math.comb(self.size - 1, size) for size in range(self.size)], dtype=np.float64)
+        values = {}
+        for position, element in enumerate(self.elements):
+            masks = self.masks_without(element, remove_empty=remove_empty)
+            marginals = self.scores[masks | (1 << position)] - self.scores[masks]
+            values[element] = np.sum(weights[self.cardinality[masks]] * marginals) / self.size
+        return values
+
+
+    def to_dict(self) -> dict[tuple, float]:
+        """Returns the recorded scores in a form {coalition: score}.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict[tuple, float]
+        """
+        return {self.coalition(mask): float(self.scores[mask]) for mask in self.masks(remove_empty=False)
+                if self.is_recorded(mask)}
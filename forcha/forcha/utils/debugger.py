@@ -2,26 +2,35 @@ import torch
 import os
 import csv
 
+from forcha.utils.profiler import current_rss, peak_rss
+
 def log_gpu_memory(iteration = int,
                    path: str = None):
     """Debugger function that prints out the device that we train on,
     amout of GPU memory that is currently allocated, and the amoung of 
     GPU memory that is currently cached by CUDA. Save result to a log.
-    If not path is provided, it will save the log in the cwd.
+    If not path is provided, it will save the log in the cwd. On the
+    CPU-only machines, the resident set size and the peak resident set 
+    size of the process are logged instead.
     Parameters
     ----------
-    nodes_data: list[datasets.arrow_dataset.Dataset, datasets.arrow_dataset.Dataset]: 
-        A list containing train set and test set wrapped 
-        in a hugging face arrow_dataset.Dataset containers.
+    iteration: int
+        The current iteration.
+    path: str, default to None
+        Path to the directory in which the log should be saved.
     
     Returns
     -------
-    int
-        Returns 0 on the successful completion of the training.
+    None
     """
-    device_name = torch.cuda.get_device_name(0)
-    mem_aloc = round(torch.cuda.memory_allocated(0)/1024**3,4)
-    mem_cached = round(torch.cuda.memory_reserved(0)/1024**3,4)
+    if torch.cuda.is_available():
+        device_name = torch.cuda.get_device_name(0)
+        mem_aloc = round(torch.cuda.memory_allocated(0)/1024**3,4)
+        mem_cached = round(torch.cuda.memory_reserved(0)/1024**3,4)
+    else:
+        device_name = 'cpu'
+        mem_aloc = round(current_rss()/1024**3,4)
+        mem_cached = round((peak_rss() or 0)/1024**3,4)
     
     print(device_name)
     print('Memory Usage:')
@@ -35,4 +44,3 @@ def log_gpu_memory(iteration = int,
         if iteration == 0:
             writer.writerow(['Iteration', 'Memory Allocated', 'Memory Cached'])
         writer.writerow([iteration, mem_aloc, mem_cached])
-        
@@ -0,0 +1,826 @@
+import bisect
+import hashlib
+import math
+import pickle
+import socket
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from multiprocessing import TimeoutError
+
+import torch
+import torch.distributed as dist
+
+from forcha.components.nodes.federated_node import FederatedNode, node_logger
+from forcha.utils.handlers import compute_model_metrics
+from forcha.utils.orchestrations import train_nodes
+
+HEADER_TAG = 0 # Tag of the messages carrying the size of the payload.
+PAYLOAD_TAG = 1 # Tag of the messages carrying the (pickled) payload.
+
+
+def send_object(
+    obj,
+    dst: int,
+    blocking: bool = True
+    ) -> list:
+    """Sends a picklable object to the process of the passed rank.
+    The object is pickled into a byte tensor preceded by its size.
+
+    Parameters
+    ----------
+    obj: Any
+        A picklable object.
+    dst: int
+        Rank of the receiving process.
+    blocking: bool, default to True
+        If False, the object is sent in the background and the pending
+        requests (together with the buffers they send) are returned.
+
+    Returns
+    -------
+    list
+        Pending requests and their buffers (empty if blocking).
+    """
+    payload = torch.frombuffer(bytearray(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)), dtype=torch.uint8)
+    header = torch.tensor([payload.numel()], dtype=torch.int64)
+    if blocking:
+        dist.send(header, dst=dst, tag=HEADER_TAG)
+        dist.send(payload, dst=dst, tag=PAYLOAD_TAG)
+        return []
+    return [(dist.isend(header, dst=dst, tag=HEADER_TAG), header),
+            (dist.isend(payload, dst=dst, tag=PAYLOAD_TAG), payload)]
+
+
+def recv_object(
+    src: int = None
+    ) -> tuple:
+    """Receives an object sent with send_object.
+
+    Parameters
+    ----------
+    src: int, default to None
+        Rank of the sending process. If None, the object is received from any process.
+
+    Returns
+    -------
+    tuple
+        Rank of the sender and the received object.
+    """
+    header = torch.zeros(1, dtype=torch.int64)
+    sender = dist.recv(header, src=src, tag=HEADER_TAG)
+    payload = torch.empty(int(header.item()), dtype=torch.uint8)
+    dist.recv(payload, src=sender, tag=PAYLOAD_TAG)
+    return (sender, pickle.loads(payload.numpy().tobytes()))
+
+
+def stable_hash(
+    key: str
+    ) -> int:
+    """Returns a hash of the key that (unlike the built-in hash) is the same
+    in every process.
+
+    Parameters
+    ----------
+    key: str
+        The hashed key.
+
+    Returns
+    -------
+    int
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class Hash_Ring():
+    """Consistent hashing of the nodes onto the workers. Every worker is placed
+    on the ring in a number of (virtual) replicas, a node belongs to the first
+    worker found clockwise from its own position. Adding or removing a worker
+    moves only the nodes of that worker, the remaining nodes keep their home."""
+
+    def __init__(
+        self,
+        workers: list[int],
+        replicas: int = 64
+        ) -> None:
+        """Places the workers on the ring.
+
+        Parameters
+        ----------
+        workers: list[int]
+            Ranks of the workers.
+        replicas: int, default to 64
+            Number of the positions of each worker on the ring.
+
+        Returns
+        -------
+        None
+        """
+        self.workers = list(workers)
+        self.positions = sorted((stable_hash(f'worker:{worker}:{replica}'), worker)
+                                for worker in self.workers for replica in range(replicas))
+        self.keys = [position for position, _ in self.positions]
+
+
+    def owner(
+        self,
+        node_id: int
+        ) -> int:
+        """Returns the worker of the node on the ring.
+
+        Parameters
+        ----------
+        node_id: int
+            Id of the node.
+
+        Returns
+        -------
+        int
+        """
+        index = bisect.bisect(self.keys, stable_hash(f'node:{node_id}')) % len(self.keys)
+        return self.positions[index][1]
+
+
+    def place(
+        self,
+        node_ids: list[int],
+        balance: float = 1.25
+        ) -> dict:
+        """Places the nodes on the workers with bounded loads: no worker hosts
+        more than balance times the average number of the nodes. A node whose
+        worker is full belongs to the next worker on the ring with a spare capacity.
+
+        Parameters
+        ----------
+        node_ids: list[int]
+            Ids of all the nodes.
+        balance: float, default to 1.25
+            The bound of the load relative to the average.
+
+        Returns
+        -------
+        dict
+            Workers mapped to the nodes' id.
+        """
+        node_ids = list(node_ids)
+        capacity = max(1, math.ceil(balance * len(node_ids) / len(self.workers)))
+        load = {worker: 0 for worker in self.workers}
+        placement = {}
+        for node_id in node_ids:
+            index = bisect.bisect(self.keys, stable_hash(f'node:{node_id}'))
+            while load[self.positions[index % len(self.positions)][1]] >= capacity:
+                index += 1
+            worker = self.positions[index % len(self.positions)][1]
+            placement[node_id] = worker
+            load[worker] += 1
+        return placement
+
+
+class Distributed_Result():
+    """Result of a task submitted to the Distributed_Backend. Mirrors the
+    interface of the multiprocessing.pool.AsyncResult, so the code dispatching
+    the work to a multiprocessing pool can dispatch it to the workers."""
+
+    def __init__(
+        self,
+        callback = None,
+        error_callback = None
+        ) -> None:
+        self.event = threading.Event()
+        self.callback = callback
+        self.error_callback = error_callback
+        self.success = None
+        self.value = None
+
+
+    def set(
+        self,
+        success: bool,
+        value
+        ) -> None:
+        self.success = success
+        self.value = value
+        if success and self.callback is not None:
+            self.callback(value)
+        if not success and self.error_callback is not None:
+            self.error_callback(value)
+        self.event.set()
+
+
+    def ready(self) -> bool:
+        return self.event.is_set()
+
+
+    def get(
+        self,
+        timeout: float = None
+        ):
+        if not self.event.wait(timeout):
+            raise TimeoutError
+        if not self.success:
+            raise self.value
+        return self.value
+
+
+class Distributed_Pool():
+    """A pool-like view of the workers of the Distributed_Backend. Can replace
+    the multiprocessing.Pool in a with statement - the workers outlive the pool."""
+
+    def __init__(
+        self,
+        backend: 'Distributed_Backend'
+        ) -> None:
+        self.backend = backend
+
+
+    def __enter__(self) -> 'Distributed_Pool':
+        return self
+
+
+    def __exit__(self, *exception) -> bool:
+        return False
+
+
+    def apply_async(
+        self,
+        func,
+        args: tuple = (),
+        callback = None,
+        error_callback = None,
+        rank: int = None
+        ) -> Distributed_Result:
+        return self.backend.submit(
+            function = func,
+            args = args,
+            callback = callback,
+            error_callback = error_callback,
+            rank = rank
+            )
+
+
+class Distributed_Backend():
+    """Distributed Backend spreads the simulation over several processes (and
+    hosts) connected with torch.distributed (gloo, CPU). The process of rank 0
+    runs the orchestrator, the processes of the remaining ranks are workers.
+    Every worker hosts a shard of the nodes (the node of id i is hosted by its
+    home worker returned by owner(i), see Hash_Ring), so the data and the models
+    of the nodes never have to fit into the memory of a single host and only
+    the weights and the updates cross the processes. The workers can also be
+    started as local processes (see spawn_local). The orchestrator submits
+    tasks to the workers - either picklable functions (e.g. evaluation of the
+    coalitions) or names of the methods operating on the hosted nodes
+    (e.g. 'train_hosted'). Results are collected by a background thread
+    in the order of their arrival.
+
+    The workers should call serve() right after the initialization,
+    the orchestrator should call shutdown() once the simulation is finished."""
+
+    def __init__(
+        self,
+        rank: int,
+        world_size: int,
+        init_method: str = 'env://',
+        timeout: float = None
+        ) -> None:
+        """Joins the process group.
+
+        Parameters
+        ----------
+        rank: int
+            Rank of the process, 0 for the orchestrator.
+        world_size: int
+            Number of the processes (the orchestrator and at least one worker).
+        init_method: str, default to 'env://'
+            URL specifying how to initialize the process group, e.g.
+            'tcp://10.1.1.20:23456' (see torch.distributed.init_process_group).
+        timeout: float, default to None
+            Timeout (in seconds) of the operations on the process group.
+
+        Returns
+        -------
+        None
+        """
+        if world_size < 2:
+            raise ValueError(f"The distributed backend requires at least one worker, got world_size = {world_size}.")
+        options = {'timeout': timedelta(seconds=timeout)} if timeout is not None else {}
+        dist.init_process_group(
+            backend = 'gloo',
+            init_method = init_method,
+            rank = rank,
+            world_size = world_size,
+            **options
+            )
+        self.rank = rank
+        self.world_size = world_size
+        self.workers = list(range(1, world_size))
+        self.logger = node_logger
+        # Placement of the nodes on the workers (see place).
+        self.ring = Hash_Ring(self.workers)
+        self.placement = {}
+        self.processes = [] # Local workers started by spawn_local.
+        # Orchestrator: submitted tasks and the thread receiving their results.
+        self.next_task = 0
+        self.tasks = {} # Task id -> Distributed_Result still waiting for the result.
+        self.sends = [] # Requests sent in the background (with their buffers).
+        self.lock = threading.Lock()
+        self.receiver = None
+        # Worker: hosted nodes and the last broadcasted weights.
+        self.nodes = {}
+        self.weights = None
+
+
+    @classmethod
+    def spawn_local(
+        cls,
+        number_of_workers: int,
+        timeout: float = None
+        ) -> 'Distributed_Backend':
+        """Starts the workers as local processes (the home workers of the nodes)
+        and returns the backend of the orchestrator. The workers are stopped by
+        shutdown().
+
+        Parameters
+        ----------
+        number_of_workers: int
+            Number of the local workers.
+        timeout: float, default to None
+            Timeout (in seconds) of the operations on the process group.
+
+        Returns
+        -------
+        Distributed_Backend
+        """
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            init_method = f'tcp://127.0.0.1:{sock.getsockname()[1]}'
+        context = torch.multiprocessing.get_context('spawn')
+        processes = [context.Process(
+            target = serve_local,
+            args = (rank, number_of_workers + 1, init_method, timeout),
+            name = f'forcha_worker_{rank}'
+            ) for rank in range(1, number_of_workers + 1)]
+        for process in processes:
+            process.start()
+        backend = cls(0, number_of_workers + 1, init_method=init_method, timeout=timeout)
+        backend.processes = processes
+        return backend
+
+
+    def owner(
+        self,
+        node_id: int
+        ) -> int:
+        """Returns the rank of the worker hosting the node (its home worker).
+        The placement computed by place() is used; nodes that were not placed
+        are found on the consistent hashing ring.
+
+        Parameters
+        ----------
+        node_id: int
+            Id of the node.
+
+        Returns
+        -------
+        int
+        """
+        if node_id in self.placement:
+            return self.placement[node_id]
+        return self.ring.owner(node_id)
+
+
+    def place(
+        self,
+        number_of_nodes: int
+        ) -> dict:
+        """Places the nodes of the simulation on the workers (see Hash_Ring.place).
+        The placement depends only on the number of the nodes and the workers,
+        so the orchestrator and the workers compute the same one.
+
+        Parameters
+        ----------
+        number_of_nodes: int
+            Number of the nodes in the simulation.
+
+        Returns
+        -------
+        dict
+            Workers mapped to the nodes' id.
+        """
+        self.placement = self.ring.place(range(number_of_nodes))
+        return self.placement
+
+
+    def hosted_ids(
+        self,
+        number_of_nodes: int
+        ) -> list[int]:
+        """Returns the ids of the nodes that should be hosted by this worker.
+
+        Parameters
+        ----------
+        number_of_nodes: int
+            Number of the nodes in the simulation.
+
+        Returns
+        -------
+        list[int]
+        """
+        self.place(number_of_nodes)
+        return [node_id for node_id in range(number_of_nodes) if self.owner(node_id) == self.rank]
+
+
+    def pool(
+        self,
+        processes: int = None
+        ) -> Distributed_Pool:
+        """Returns a pool-like view of the workers (see Distributed_Pool).
+
+        Parameters
+        ----------
+        processes: int, default to None
+            Ignored, the tasks are spread over all the workers. Accepted for
+            the compatibility with the multiprocessing.Pool.
+
+        Returns
+        -------
+        Distributed_Pool
+        """
+        return Distributed_Pool(self)
+
+
+    def submit(
+        self,
+        function,
+        args: tuple = (),
+        callback = None,
+        error_callback = None,
+        rank: int = None
+        ) -> Distributed_Result:
+        """Submits the task to the worker. Tasks submitted to the same worker are
+        executed in the order of their submission.
+
+        Parameters
+        ----------
+        function: Callable | str
+            A picklable function or a name of the method of the worker's backend.
+        args: tuple, default to ()
+            Arguments of the function.
+        callback: Callable, default to None
+            Called with the result once it arrives.
+        error_callback: Callable, default to None
+            Called with the exception if the task failed.
+        rank: int, default to None
+            Rank of the worker. If None, the workers are chosen in turns.
+
+        Returns
+        -------
+        Distributed_Result
+        """
+        with self.lock:
+            task_id = self.next_task
+            self.next_task += 1
+            if rank is None:
+                rank = self.workers[task_id % len(self.workers)]
+            result = Distributed_Result(
+                callback = callback,
+                error_callback = error_callback
+                )
+            self.tasks[task_id] = result
+            # Sends that completed no longer need their buffers.
+            self.sends = [(request, buffer) for request, buffer in self.sends if not request.is_completed()]
+            self.sends.extend(send_object((task_id, function, args), dst=rank, blocking=False))
+        if self.receiver is None:
+            self.receiver = threading.Thread(
+                target = self.receive,
+                name = 'distributed_backend',
+                daemon = True
+                )
+            self.receiver.start()
+        return result
+
+
+    def call_workers(
+        self,
+        function,
+        args: tuple = ()
+        ) -> dict:
+        """Executes the task on every worker and waits for the results.
+
+        Parameters
+        ----------
+        function: Callable | str
+            A picklable function or a name of the method of the worker's backend.
+        args: tuple, default to ()
+            Arguments of the function.
+
+        Returns
+        -------
+        dict
+            Results mapped to the ranks of the workers.
+        """
+        results = {rank: self.submit(function, args, rank=rank) for rank in self.workers}
+        return {rank: result.get() for rank, result in results.items()}
+
+
+    def receive(self) -> None:
+        """Receives the results of the tasks (run by the background thread of
+        the orchestrator) until every worker confirms its shutdown.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        running = len(self.workers)
+        while running > 0:
+            _, (task_id, success, value) = recv_object()
+            if task_id is None:
+                running -= 1
+                continue
+            with self.lock:
+                result = self.tasks.pop(task_id)
+            result.set(success, value)
+
+
+    def serve(
+        self,
+        nodes: list[FederatedNode] = None
+        ) -> None:
+        """Executes the tasks submitted by the orchestrator until the shutdown.
+        Must be called by every worker.
+
+        Parameters
+        ----------
+        nodes: list[FederatedNode], default to None
+            Nodes built by the worker itself (see hosted_ids). The orchestrator
+            can also send the nodes to the workers (see host_nodes).
+
+        Returns
+        -------
+        None
+        """
+        if nodes:
+            self.host_nodes(nodes)
+        while True:
+            _, (task_id, function, args) = recv_object(src=0)
+            if task_id is None:
+                break
+            try:
+                if isinstance(function, str):
+                    value = getattr(self, function)(*args)
+                else:
+                    value = function(*args)
+                message = (task_id, True, value)
+            except Exception as error:
+                try:
+                    pickle.dumps(error)
+                except Exception:
+                    error = RuntimeError(f"{type(error).__name__}: {error}")
+                message = (task_id, False, error)
+            send_object(message, dst=0)
+        # Confirms the shutdown, so the orchestrator stops receiving.
+        send_object((None, True, None), dst=0)
+        dist.destroy_process_group()
+
+
+    def shutdown(self) -> None:
+        """Waits for the submitted tasks, stops the workers and leaves the
+        process group. Must be called by the orchestrator.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        for rank in self.workers:
+            self.sends.extend(send_object((None, None, None), dst=rank, blocking=False))
+        for request, _ in self.sends:
+            request.wait()
+        self.sends = []
+        if self.receiver is None:
+            self.receiver = threading.Thread(target=self.receive, daemon=True)
+            self.receiver.start()
+        self.receiver.join()
+        self.receiver = None
+        dist.destroy_process_group()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+
+    ########################################################
+    # TASKS EXECUTED BY THE WORKERS ON THE HOSTED NODES
+    ########################################################
+    def host_nodes(
+        self,
+        nodes: list[FederatedNode]
+        ) -> list[int]:
+        """Adds the nodes to the nodes hosted by the worker.
+
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            Nodes to be hosted.
+
+        Returns
+        -------
+        list[int]
+            Ids of the added nodes.
+        """
+        for node in nodes:
+            self.nodes[node.node_id] = node
+        return [node.node_id for node in nodes]
+
+
+    def broadcast_hosted(
+        self,
+        weights: OrderedDict
+        ) -> None:
+        """Loads the weights into the models of the hosted nodes. The weights
+        are preserved for the lazy nodes, materialized later.
+
+        Parameters
+        ----------
+        weights: OrderedDict
+            Weights of the model.
+
+        Returns
+        -------
+        None
+        """
+        self.weights = weights
+        for node in self.nodes.values():
+            if node.model is not None:
+                node.model.update_weights(weights)
+
+
+    def train_hosted(
+        self,
+        node_id: int,
+        iteration: int,
+        mode: str = 'weights',
+        delay: float = 0
+        ) -> tuple:
+        """Trains the hosted node (see forcha.utils.orchestrations.train_nodes).
+
+        Parameters
+        ----------
+        node_id: int
+            Id of the node.
+        iteration: int
+            The current iteration.
+        mode: str, default to 'weights'
+            Mode of the training, either 'weights' or 'gradients'.
+        delay: float, default to 0
+            Additional (simulated) latency of the node in seconds.
+
+        Returns
+        -------
+        tuple
+            Results of the training.
+        """
+        node = self.nodes[node_id]
+        if node.model is None:
+            node.prepare_model(weights=self.weights)
+        return train_nodes(node, iteration, mode, delay)
+
+
+    def evaluate_hosted(
+        self,
+        node_ids: list[int],
+        iteration: int
+        ) -> dict:
+        """Evaluates the models of the hosted nodes on their local test sets.
+        Lazy nodes are materialized with the last broadcasted weights for the
+        time of the evaluation.
+
+        Parameters
+        ----------
+        node_ids: list[int]
+            Ids of the nodes.
+        iteration: int
+            The current iteration.
+
+        Returns
+        -------
+        dict
+            Metrics mapped to the nodes' id.
+
+        Raises
+        ------
+        RuntimeError
+            If the model of any of the nodes could not be evaluated. The error is
+            returned to the orchestrator as the failed task, the worker keeps serving.
+        """
+        metrics = {}
+        for node_id in node_ids:
+            node = self.nodes[node_id]
+            lazy = node.model is None
+            model = node.prepare_model(weights=self.weights) if lazy else node.model
+            try:
+                metrics[node_id] = compute_model_metrics(
+                    iteration = iteration,
+                    model = model,
+                    logger = self.logger
+                    )
+            except Exception as error:
+                raise RuntimeError(f"Unable to evaluate the node {node_id} on the worker {self.rank}. {type(error).__name__}: {error}")
+            finally:
+                if lazy:
+                    node.release_model()
+        return metrics
+
+
+    def release_hosted(
+        self,
+        node_ids: list[int]
+        ) -> list[dict]:
+        """Releases the models of the hosted lazy nodes.
+
+        Parameters
+        ----------
+        node_ids: list[int]
+            Ids of the nodes.
+
+        Returns
+        -------
+        list[dict]
+            Profiling records of the released models.
+        """
+        records = []
+        for node_id in node_ids:
+            node = self.nodes[node_id]
+            if node.lazy and node.model is not None:
+                records.extend(node.model.profiler.pop_records())
+                node.release_model()
+        return records
+
+
+    def hosted_state(self) -> dict:
+        """Returns the states of the hosted nodes (see FederatedNode.state_dict).
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            States mapped to the nodes' id.
+        """
+        return {node_id: node.state_dict() for node_id, node in self.nodes.items()}
+
+
+    def load_hosted_state(
+        self,
+        states: dict,
+        save_path: str = None
+        ) -> None:
+        """Restores the states of the hosted nodes.
+
+        Parameters
+        ----------
+        states: dict
+            States mapped to the nodes' id.
+        save_path: str, default to None
+            Path under which the nodes save their models.
+
+        Returns
+        -------
+        None
+        """
+        for node_id, node in self.nodes.items():
+            node.save_path = save_path
+            node.load_state_dict(states[node_id])
+
+
+def serve_local(
+    rank: int,
+    world_size: int,
+    init_method: str,
+    timeout: float = None
+    ) -> None:
+    """Entry point of the local workers (see Distributed_Backend.spawn_local).
+
+    Parameters
+    ----------
+    rank: int
+        Rank of the worker.
+    world_size: int
+        Number of the processes.
+    init_method: str
+        URL of the process group.
+    timeout: float, default to None
+        Timeout (in seconds) of the operations on the process group.
+
+    Returns
+    -------
+    None
+    """
+    Distributed_Backend(rank, world_size, init_method=init_method, timeout=timeout).serve()
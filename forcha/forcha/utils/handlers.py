@@ -1,10 +1,11 @@
 from torch.nn import Module
-from models.federated_model import FederatedModel
+from forcha.models.federated_model import FederatedModel
 import csv
 from typing import Any
 import os
 
 class Handler:
+    @staticmethod
     def log_model_metrics(iteration: int,
                             model: Module | FederatedModel,
                             logger,
@@ -49,13 +50,12 @@ class Handler:
             logger.warning(f"Unable to compute metrics. {e}")
 
 
-    def save_model_metrics(iteration: int,
-                            model: Module | FederatedModel,
-                            logger = None,
-                            saving_path: str = None,
-                            file_name: str = 'metrics.csv',
-                            log_to_screen: bool = False) -> None:
-        """Used to save the model metrics.
+    @staticmethod
+    def compute_model_metrics(iteration: int,
+                              model: Module | FederatedModel,
+                              logger = None,
+                              log_to_screen: bool = False) -> dict:
+        """Used to evaluate the model on its test set and compile the metrics.
 
         Parameters
         ----------
@@ -65,16 +65,12 @@ class Handler:
             Network deposited on the client
         logger: Logger (default to None)
             Logger object that we want to use to handle the logs.
-        saving_path: str (default to None)
-            The saving path of the csv file - if none, the file will be saved in the current working directory.
-        file_name: str
-            A desired file name for the metrics, default to 'metrics.csv'.
         log_to_screen: bool (default to False)
             Boolean flag whether we want to log the results to the screen.
 
         Returns
         -------
-            None"""
+            dict"""
         try:
             (
                 loss,
@@ -101,6 +97,27 @@ class Handler:
                 logger.info(f"Evaluating model after iteration {iteration} on node {model.node_name}. Results: {metrics}")
         except Exception as e:
             logger.warning(f"Unable to compute metrics. {e}")
+        return metrics
+
+
+    @staticmethod
+    def save_metrics(metrics: dict,
+                     saving_path: str = None,
+                     file_name: str = 'metrics.csv') -> None:
+        """Used to append a row of the metrics (see compute_model_metrics) to the csv file.
+
+        Parameters
+        ----------
+        metrics: dict
+            Metrics of the model.
+        saving_path: str (default to None)
+            The saving path of the csv file - if none, the file will be saved in the current working directory.
+        file_name: str
+            A desired file name for the metrics, default to 'metrics.csv'.
+
+        Returns
+        -------
+            None"""
         path = os.path.join(saving_path, file_name)
         with open(path, 'a+', newline='') as saved_file:
                 writer = csv.DictWriter(saved_file, list(metrics.keys()))
@@ -109,6 +126,47 @@ class Handler:
                 writer.writerow(metrics)
 
 
+    @staticmethod
+    def save_model_metrics(iteration: int,
+                            model: Module | FederatedModel,
+                            logger = None,
+                            saving_path: str = None,
+                            file_name: str = 'metrics.csv',
+                            log_to_screen: bool = False) -> None:
+        """Used to save the model metrics.
+
+        Parameters
+        ----------
+        iteration: int
+            Current iteration of the training.
+        model: torch.nn.Module
+            Network deposited on the client
+        logger: Logger (default to None)
+            Logger object that we want to use to handle the logs.
+        saving_path: str (default to None)
+            The saving path of the csv file - if none, the file will be saved in the current working directory.
+        file_name: str
+            A desired file name for the metrics, default to 'metrics.csv'.
+        log_to_screen: bool (default to False)
+            Boolean flag whether we want to log the results to the screen.
+
+        Returns
+        -------
+            None"""
+        metrics = Handler.compute_model_metrics(
+            iteration = iteration,
+            model = model,
+            logger = logger,
+            log_to_screen = log_to_screen
+            )
+        Handler.save_metrics(
+            metrics = metrics,
+            saving_path = saving_path,
+            file_name = file_name
+            )
+
+
+    @staticmethod
     def save_csv_file(
         file,
         saving_path: str = None,
@@ -123,6 +181,7 @@ class Handler:
                 writer.writerow(row)
 
 
+    @staticmethod
     def save_training_metrics(
         file,
         saving_path: str = None,
@@ -138,6 +197,71 @@ class Handler:
                 writer.writerow(row)
 
 
+    @staticmethod
+    def trim_results(
+        saving_path: str,
+        iteration: int
+        ) -> None:
+        """Removes the rows recorded after the passed iteration from all the csv 
+        files in the saving path (identified by their 'iteration' or 'epoch' column).
+        Used when the training is resumed from a checkpoint, so the rounds repeated
+        after the resumption are not recorded twice.
+        
+        Parameters
+        ----------
+        saving_path: str
+            Directory containing the csv files.
+        iteration: int
+            The last iteration whose rows are kept.
+        
+        Returns
+        -------
+        None
+        """
+        for file_name in os.listdir(saving_path):
+            path = os.path.join(saving_path, file_name)
+            if not file_name.endswith('.csv') or os.path.getsize(path) == 0:
+                continue
+            with open(path, 'r', newline='') as csv_file:
+                reader = csv.DictReader(csv_file)
+                field_names = reader.fieldnames
+                rows = list(reader)
+            column = next((name for name in ('iteration', 'epoch') if name in field_names), None)
+            if column is None:
+                continue
+            kept = [row for row in rows if not row[column].isdigit() or int(row[column]) <= iteration]
+            with open(path, 'w', newline='') as csv_file:
+                writer = csv.DictWriter(csv_file, field_names)
+                writer.writeheader()
+                writer.writerows(kept)
+
+
+    @staticmethod
+    def remove_empty_archive(
+        archive_path: str
+        ) -> None:
+        """Removes the archive directory tree if nothing was written into it.
+        Used when the training is resumed from a checkpoint into its own archive,
+        so the archive created by the Settings is not left behind. Only empty
+        directories are removed, the files are never touched.
+        
+        Parameters
+        ----------
+        archive_path: str
+            Root directory of the archive.
+        
+        Returns
+        -------
+        None
+        """
+        if not os.path.isdir(archive_path):
+            return
+        for directory, _, _ in os.walk(archive_path, topdown=False):
+            if not os.listdir(directory):
+                os.rmdir(directory)
+
+
+    @staticmethod
     def execute_local_test(
         file,
         saving_path: str = None,
@@ -145,4 +269,13 @@ class Handler:
         ) -> None:
         pass
 
-        
\ No newline at end of file
+
+# Module-level aliases used by the orchestrators.
+log_model_metrics = Handler.log_model_metrics
+compute_model_metrics = Handler.compute_model_metrics
+save_metrics = Handler.save_metrics
+save_model_metrics = Handler.save_model_metrics
+save_csv_file = Handler.save_csv_file
+save_training_metrics = Handler.save_training_metrics
+trim_results = Handler.trim_results
+remove_empty_archive = Handler.remove_empty_archive
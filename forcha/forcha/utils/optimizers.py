@@ -1,52 +1,332 @@
 from collections import OrderedDict
-from torch import zeros
 from torch import rand
 from forcha.components.settings.evaluator_settings import EvaluatorSettings
 import torch
 import copy
 
+
+def _foreach_copy_(destinations: list, sources: list) -> None:
+    # torch._foreach_copy_ is available since torch 2.1.
+    if getattr(torch, '_foreach_copy_', None) is not None:
+        torch._foreach_copy_(destinations, sources)
+    else:
+        for destination, source in zip(destinations, sources):
+            destination.copy_(source)
+
+
+def _foreach_sign_(tensors: list) -> None:
+    # torch._foreach_sign_ is available since torch 2.1.
+    if getattr(torch, '_foreach_sign_', None) is not None:
+        torch._foreach_sign_(tensors)
+    else:
+        for tensor in tensors:
+            tensor.sign_()
+
+
 class Optimizers():
+    """Server-side (central) optimizers of the Fedopt family. The moments of the
+    optimizer (previous_delta and previous_momentum) are kept in preallocated flat
+    buffers and updated in place with the multi-tensor (torch._foreach_*) kernels,
+    so a step does not allocate any intermediate tensors - only the returned weights.
+    Each moment has two buffers used alternately: a step writes the new moments
+    into the spare buffer and swaps them, so the dictionaries obtained before the
+    step (e.g. with get_weights) still hold the previous values.
+
+    Similarly to the torch.optim, the implementation of the step can be selected
+    with the 'foreach' and 'fused' settings:
+    - fused: all the layers are flattened and each operation of the step is
+    a single kernel over the whole model (independent of the number of layers),
+    - foreach (default): each operation is a single multi-tensor kernel over
+    all the layers,
+    - neither: the layers are updated one by one.
+
+    The state of the optimizer is kept on the device of the weights passed to
+    the steps (it is moved there once if they arrive on another device, see to)
+    and can be saved and restored with the state_dict and load_state_dict methods.
+    """
     def __init__(self,
                  weights: OrderedDict,
-                 settings: EvaluatorSettings) -> None:
-        # Seting up a device for the Optimizer. Please note, that the device must be the same as this
-        # that the nets were placed on. Otherwise, PyTorch will raise an exception trying to combine
-        # data placed on CPU and GPU.
-        self.previous_delta = OrderedDict((key, rand(weights[key].size())) for key in weights.keys())
-        self.previous_momentum = OrderedDict((key, rand(weights[key].size())) for key in weights.keys())
+                 settings: EvaluatorSettings,
+                 device: torch.device = None) -> None:
+        """Initializes the optimizer and allocates its state.
+
+        Parameters
+        ----------
+        weights: OrderedDict
+            Weights of the central model.
+        settings: EvaluatorSettings
+            Settings containing the configuration of the global optimizer.
+        device: torch.device, default to None
+            Device on which the state of the optimizer is initially placed.
+            If None, the device of the passed weights is used.
+
+        Returns
+        -------
+        None
+        """
         self.optimizer = settings.global_optimizer
-        self.learning_rate = torch.tensor(settings.global_learning_rate)
+        # Hyperparameters are plain numbers - scalars do not need to be placed on the device.
+        self.learning_rate = float(settings.global_learning_rate)
+        self.fused = getattr(settings, 'fused', False)
+        self.foreach = getattr(settings, 'foreach', True)
 
         # Selecting a proper centralised optimizer and placing all the tensors on the same device.
         if self.optimizer == 'Simple':
             pass
         elif self.optimizer == "FedAdagard":
-            self.b1 = torch.tensor(settings.b1)
-            self.tau = torch.tensor(settings.tau)
+            self.b1 = float(settings.b1)
+            self.tau = float(settings.tau)
         elif self.optimizer == "FedYogi" or self.optimizer == "FedAdam":
-            self.b1 = torch.tensor(settings.b1)
-            self.b2 = torch.tensor(settings.b2)
-            self.tau = torch.tensor(settings.tau)
+            self.b1 = float(settings.b1)
+            self.b2 = float(settings.b2)
+            self.tau = float(settings.tau)
         else:
             raise "Wrong optimizer's name was provided. Unable to retrieve parameters!"
-    
-    
+
+        # Layout of the flat buffers: offset and shape of each layer.
+        if device is None:
+            device = next(iter(weights.values())).device
+        self.device = torch.device(device)
+        self.dtype = torch.get_default_dtype()
+        self.layout = OrderedDict()
+        offset = 0
+        for key, tensor in weights.items():
+            self.layout[key] = (offset, tensor.size())
+            offset += tensor.numel()
+        self.size = offset
+        self.delta_buffers = [torch.empty(self.size, dtype=self.dtype, device=self.device) for _ in range(2)]
+        self.momentum_buffers = [torch.empty(self.size, dtype=self.dtype, device=self.device) for _ in range(2)]
+        self.delta_views = [self.views(buffer) for buffer in self.delta_buffers]
+        self.momentum_views = [self.views(buffer) for buffer in self.momentum_buffers]
+        # FedYogi requires an additional scratch buffer.
+        self.scratch = [torch.empty(self.size, dtype=self.dtype, device=self.device)
+                        for _ in range(2 if self.optimizer == 'FedYogi' else 1)]
+        self.scratch_views = [self.views(buffer) for buffer in self.scratch]
+        if self.fused:
+            self.flat_weights = torch.empty(self.size, dtype=self.dtype, device=self.device)
+            self.flat_delta = torch.empty(self.size, dtype=self.dtype, device=self.device)
+        self.current = 0
+        self.previous_delta = self.delta_views[self.current]
+        self.previous_momentum = self.momentum_views[self.current]
+        # The moments are initialized randomly, layer by layer (on CPU, so the values do not depend on the device).
+        for key in weights.keys():
+            self.previous_delta[key].copy_(rand(weights[key].size()))
+        for key in weights.keys():
+            self.previous_momentum[key].copy_(rand(weights[key].size()))
+
+
+    def views(self,
+              buffer: torch.Tensor) -> OrderedDict:
+        """Returns the layers of the flat buffer (as views of the buffer).
+
+        Parameters
+        ----------
+        buffer: torch.Tensor
+            Flat buffer of the size of the model.
+
+        Returns
+        -------
+        OrderedDict
+        """
+        return OrderedDict((key, buffer[offset: offset + shape.numel()].view(shape))
+                           for key, (offset, shape) in self.layout.items())
+
+
+    def state_dict(self) -> dict:
+        """Returns the state of the optimizer. The moments are copies (independent
+        of the buffers of the optimizer), so the state can be stored or
+        passed to the other processes as it is.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            Name of the optimizer, learning rate, previous delta and previous momentum.
+        """
+        # Independent copies - the views of the buffers would carry (and pickle) the whole buffers.
+        return {
+            'optimizer': self.optimizer,
+            'learning_rate': self.learning_rate,
+            'previous_delta': OrderedDict((key, tensor.clone()) for key, tensor in self.previous_delta.items()),
+            'previous_momentum': OrderedDict((key, tensor.clone()) for key, tensor in self.previous_momentum.items())
+            }
+
+
+    def load_state_dict(self,
+                        state_dict: dict) -> None:
+        """Restores the state of the optimizer. The moments are copied into
+        the buffers of the optimizer (and onto its device), so the passed
+        state is neither modified nor shared.
+
+        Parameters
+        ----------
+        state_dict: dict
+            State obtained from the Optimizers.state_dict().
+
+        Returns
+        -------
+        None
+        """
+        if state_dict['optimizer'] != self.optimizer:
+            raise ValueError(f"The state of the {state_dict['optimizer']} can not be loaded into the {self.optimizer} optimizer.")
+        if list(state_dict['previous_delta']) != list(self.layout) or list(state_dict['previous_momentum']) != list(self.layout):
+            raise ValueError("The layers of the loaded state do not match the layers of the optimizer.")
+        _foreach_copy_(list(self.previous_delta.values()), list(state_dict['previous_delta'].values()))
+        _foreach_copy_(list(self.previous_momentum.values()), list(state_dict['previous_momentum'].values()))
+        self.learning_rate = float(state_dict['learning_rate'])
+
+
     def get_weights(self):
-        previous_delta = self.previous_delta
-        previous_momentum = self.previous_momentum
-        learning_rate = self.learning_rate
-        return previous_delta, previous_momentum, learning_rate
-    
-    
+        # Tuple form of the state_dict.
+        state = self.state_dict()
+        return state['previous_delta'], state['previous_momentum'], state['learning_rate']
+
+
     def set_weights(self,
                     previous_delta,
                     previous_momentum,
                     learning_rate):
-        self.previous_delta = previous_delta
-        self.previous_momentum = previous_momentum
-        self.learning_rate = learning_rate
-        
-        
+        self.load_state_dict({
+            'optimizer': self.optimizer,
+            'learning_rate': learning_rate,
+            'previous_delta': previous_delta,
+            'previous_momentum': previous_momentum
+            })
+
+
+    def __getstate__(self) -> dict:
+        # The views are rebuilt from the buffers - pickled separately, each would carry the whole buffer.
+        state = self.__dict__.copy()
+        for key in ['delta_views', 'momentum_views', 'scratch_views', 'previous_delta', 'previous_momentum']:
+            del state[key]
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # Tensors passed to the worker processes arrive in the shared memory - the
+        # buffers are updated in place, so each copy of the optimizer needs its own.
+        for name in ['delta_buffers', 'momentum_buffers', 'scratch']:
+            self.__dict__[name] = [buffer.clone() if buffer.is_shared() else buffer
+                                   for buffer in self.__dict__[name]]
+        if self.fused:
+            self.flat_weights = self.flat_weights.clone() if self.flat_weights.is_shared() else self.flat_weights
+            self.flat_delta = self.flat_delta.clone() if self.flat_delta.is_shared() else self.flat_delta
+        self.delta_views = [self.views(buffer) for buffer in self.delta_buffers]
+        self.momentum_views = [self.views(buffer) for buffer in self.momentum_buffers]
+        self.scratch_views = [self.views(buffer) for buffer in self.scratch]
+        self.previous_delta = self.delta_views[self.current]
+        self.previous_momentum = self.momentum_views[self.current]
+
+
+    def to(self,
+           device: torch.device) -> None:
+        """Moves the state of the optimizer (the buffers of the moments and the
+        scratch buffers) to the device.
+
+        Parameters
+        ----------
+        device: torch.device
+            The target device.
+
+        Returns
+        -------
+        None
+        """
+        device = torch.device(device)
+        if device == self.device:
+            return
+        self.device = device
+        self.delta_buffers = [buffer.to(device) for buffer in self.delta_buffers]
+        self.momentum_buffers = [buffer.to(device) for buffer in self.momentum_buffers]
+        self.scratch = [buffer.to(device) for buffer in self.scratch]
+        if self.fused:
+            self.flat_weights = self.flat_weights.to(device)
+            self.flat_delta = self.flat_delta.to(device)
+        self.delta_views = [self.views(buffer) for buffer in self.delta_buffers]
+        self.momentum_views = [self.views(buffer) for buffer in self.momentum_buffers]
+        self.scratch_views = [self.views(buffer) for buffer in self.scratch]
+        self.previous_delta = self.delta_views[self.current]
+        self.previous_momentum = self.momentum_views[self.current]
+
+
+    def tensor_groups(self,
+                      weights: OrderedDict,
+                      delta: OrderedDict) -> list[tuple[list, ...]]:
+        """Arranges the tensors of the step into the groups processed by the
+        multi-tensor kernels: a single group of the flat tensors (fused), a single
+        group of all the layers (foreach) or a group per layer.
+
+        Parameters
+        ----------
+        weights: OrderedDict
+            Weights of the central model.
+        delta: OrderedDict
+            Aggregated update (pseudo-gradient).
+
+        Returns
+        -------
+        list[tuple[list, ...]]
+            Groups of the lists: weights, delta, previous delta, previous momentum,
+            current delta, current momentum and the scratch buffers.
+        """
+        # The state follows the weights (e.g. the CPU copies returned by get_weights),
+        # so the steps do not copy the tensors between the devices.
+        self.to(next(iter(weights.values())).device)
+        spare = 1 - self.current
+        if self.fused:
+            torch.cat([weights[key].reshape(-1).to(device=self.device, dtype=self.dtype) for key in self.layout], out=self.flat_weights)
+            torch.cat([delta[key].reshape(-1).to(device=self.device, dtype=self.dtype) for key in self.layout], out=self.flat_delta)
+            return [([self.flat_weights], [self.flat_delta],
+                     [self.delta_buffers[self.current]], [self.momentum_buffers[self.current]],
+                     [self.delta_buffers[spare]], [self.momentum_buffers[spare]],
+                     *[[buffer] for buffer in self.scratch])]
+        group = ([weights[key].to(device=self.device, dtype=self.dtype) for key in self.layout],
+                 [delta[key].to(device=self.device, dtype=self.dtype) for key in self.layout],
+                 list(self.delta_views[self.current].values()), list(self.momentum_views[self.current].values()),
+                 list(self.delta_views[spare].values()), list(self.momentum_views[spare].values()),
+                 *[list(views.values()) for views in self.scratch_views])
+        if self.foreach:
+            return [group]
+        return [tuple([tensors[position]] for tensors in group) for position in range(len(self.layout))]
+
+
+    def adaptive_step(self,
+                      groups: list[tuple[list, ...]],
+                      tau: float,
+                      learning_rate: float) -> OrderedDict:
+        """Concludes the step of the adaptive optimizers - computes the new weights
+        (w + lr * delta / (sqrt(momentum) + tau)) and swaps the buffers of the moments.
+
+        Parameters
+        ----------
+        groups: list[tuple[list, ...]]
+            Groups returned by the tensor_groups, with the current moments computed.
+        tau: float
+        learning_rate: float
+
+        Returns
+        -------
+        OrderedDict
+            Updated weights.
+        """
+        updated = []
+        for W, _, _, _, D, M, S, *_ in groups:
+            _foreach_copy_(S, M)
+            torch._foreach_sqrt_(S)
+            torch._foreach_add_(S, tau)
+            updated.extend(torch._foreach_addcdiv(W, D, S, value=learning_rate))
+        self.current = 1 - self.current
+        self.previous_delta = self.delta_views[self.current]
+        self.previous_momentum = self.momentum_views[self.current]
+        if self.fused:
+            return self.views(updated[0])
+        return OrderedDict(zip(self.layout.keys(), updated))
+
+
     def fed_optimize(self,
                      weights: OrderedDict,
                      delta: OrderedDict) -> OrderedDict:
@@ -86,36 +366,27 @@ class Optimizers():
                      delta: OrderedDict,
                      learning_rate: float):
         """Adds gradients to the central weights, concluding one round of Federated Training."""
-        updated_weights = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
+        updated_weights = OrderedDict()
         for key in weights:
             updated_weights[key] = weights[key] + (learning_rate * delta[key])
         return updated_weights
-    
+
 
     def FedAdagard(self,
                    weights: OrderedDict,
                    delta: OrderedDict,
-                   b1: float, 
+                   b1: float,
                    tau: float,
                    learning_rate: float) -> OrderedDict:
-        # Defining the current delta.
-        current_delta = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-        current_momentum = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-        updated_weights = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-
-        for row_key in current_delta.keys():
-            current_delta[row_key] = b1 * self.previous_delta[row_key] + (1 - b1) * delta[row_key]
-        
-        for row_key in current_momentum.keys():
-            current_momentum[row_key] = self.previous_momentum[row_key] + (current_delta[row_key] ** 2)
-
-        for row_key in updated_weights.keys():
-            updated_weights[row_key] = weights[row_key] + (learning_rate * (current_delta[row_key] / (torch.sqrt(current_momentum[row_key]) + tau)))
-        
-        self.previous_delta = current_delta
-        self.previous_momentum = current_momentum
-
-        return updated_weights
+        groups = self.tensor_groups(weights, delta)
+        for _, G, previous_D, previous_M, D, M, *_ in groups:
+            # delta = b1 * previous_delta + (1 - b1) * delta
+            _foreach_copy_(D, G)
+            torch._foreach_lerp_(D, previous_D, b1)
+            # momentum = previous_momentum + delta ** 2
+            _foreach_copy_(M, previous_M)
+            torch._foreach_addcmul_(M, D, D)
+        return self.adaptive_step(groups, tau=tau, learning_rate=learning_rate)
 
 
     def FedYogi(self,
@@ -125,26 +396,23 @@ class Optimizers():
                 b2: float,
                 tau: float,
                 learning_rate: float):
-        # Defining the current delta.
-        current_delta = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-        current_momentum = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-        updated_weights = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-
-        for row_key in current_delta.keys():
-            current_delta[row_key] = b1 * self.previous_delta[row_key] + (1 - b1) * delta[row_key]
-        
-        for row_key in current_momentum.keys():
-            current_momentum[row_key] = self.previous_momentum[row_key] - ((1 - b2) * (current_delta[row_key] ** 2) * torch.sign((self.previous_momentum[row_key] - (current_delta[row_key] ** 2))))
-
-        for row_key in updated_weights.keys():
-            updated_weights[row_key] = weights[row_key] + learning_rate * (current_delta[row_key] / (torch.sqrt(current_momentum[row_key]) + tau))
-        
-        self.previous_delta = current_delta
-        self.previous_momentum = current_momentum
-        
-        return updated_weights
+        groups = self.tensor_groups(weights, delta)
+        for _, G, previous_D, previous_M, D, M, S, T in groups:
+            # delta = b1 * previous_delta + (1 - b1) * delta
+            _foreach_copy_(D, G)
+            torch._foreach_lerp_(D, previous_D, b1)
+            # momentum = previous_momentum - (1 - b2) * delta ** 2 * sign(previous_momentum - delta ** 2)
+            _foreach_copy_(S, D)
+            torch._foreach_mul_(S, D)
+            _foreach_copy_(T, previous_M)
+            torch._foreach_sub_(T, S)
+            _foreach_sign_(T)
+            torch._foreach_mul_(T, S)
+            _foreach_copy_(M, previous_M)
+            torch._foreach_add_(M, T, alpha=-(1 - b2))
+        return self.adaptive_step(groups, tau=tau, learning_rate=learning_rate)
+
 
-    
     def FedAdam(self,
                 weights: OrderedDict,
                 delta: OrderedDict,
@@ -152,21 +420,13 @@ class Optimizers():
                 b2: float,
                 tau: float,
                 learning_rate: float):
-        # Defining the current delta.
-        current_delta = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-        current_momentum = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-        updated_weights = OrderedDict((key, zeros(weights[key].size())) for key in weights.keys())
-
-        for row_key in current_delta.keys():
-            current_delta[row_key] = b1 * self.previous_delta[row_key] + (1 - b1) * delta[row_key]
-        
-        for row_key in current_momentum.keys():
-            current_momentum[row_key] = (b2 * self.previous_momentum[row_key]) + ((1 - b2) * (current_delta[row_key] ** 2))
-
-        for row_key in updated_weights.keys():
-            updated_weights[row_key] = weights[row_key] + (learning_rate * (current_delta[row_key] / (torch.sqrt(current_momentum[row_key]) + tau)))
-        
-        self.previous_delta = current_delta
-        self.previous_momentum = current_momentum
-        
-        return updated_weights
\ No newline at end of file
+        groups = self.tensor_groups(weights, delta)
+        for _, G, previous_D, previous_M, D, M, *_ in groups:
+            # delta = b1 * previous_delta + (1 - b1) * delta
+            _foreach_copy_(D, G)
+            torch._foreach_lerp_(D, previous_D, b1)
+            # momentum = b2 * previous_momentum + (1 - b2) * delta ** 2
+            _foreach_copy_(M, previous_M)
+            torch._foreach_mul_(M, b2)
+            torch._foreach_addcmul_(M, D, D, value=1 - b2)
+        return self.adaptive_step(groups, tau=tau, learning_rate=learning_rate)
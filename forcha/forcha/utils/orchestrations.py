@@ -3,7 +3,13 @@ from forcha.components.nodes.federated_node import FederatedNode
 import numpy as np
 import datasets
 from logging import Logger
+import math
+import multiprocessing
+import multiprocessing.pool
 import random
+import time
+
+from forcha.utils.profiler import peak_rss
 
 
 def prepare_nodes(node: FederatedNode, 
@@ -116,10 +122,52 @@ def sample_weighted_nodes(nodes: list[FederatedNode],
         return sample
 
 
+class Nondaemonic_Process(multiprocessing.Process):
+    """A process that is never daemonic, so it can start its own children 
+    (e.g. the workers of the DataLoaders)."""
+
+    @property
+    def daemon(self) -> bool:
+        return False
+
+    @daemon.setter
+    def daemon(self, value: bool) -> None:
+        pass
+
+
+class Training_Pool(multiprocessing.pool.Pool):
+    """Multiprocessing pool training the nodes. Unlike the workers of the 
+    multiprocessing.Pool, its workers are not daemonic, so the nodes can load
+    their data with the worker processes of the DataLoaders (see 
+    FederatedModel.loader_options). The workers are terminated together with 
+    the pool (on exiting its context or by terminate())."""
+
+    def __init__(
+        self,
+        processes: int = None,
+        *args,
+        **kwargs
+        ) -> None:
+        """Starts the workers of the pool with the current start method.
+
+        Parameters
+        ----------
+        processes: int, default to None
+            Number of the workers (see multiprocessing.pool.Pool).
+
+        Returns
+        -------
+        None
+        """
+        context = type('Nondaemonic_Context', (type(multiprocessing.get_context()),), {'Process': Nondaemonic_Process})()
+        super().__init__(processes, *args, context = context, **kwargs)
+
+
 def train_nodes(
     node: FederatedNode,
     iteration: int,
-    mode: str = 'weights') -> tuple[int, List[float]]:
+    mode: str = 'weights',
+    delay: float = 0) -> tuple[int, List[float]]:
     """Used to command the node to start the local training.
     Invokes .train_local_model method and returns the results.
     Parameters
@@ -130,10 +178,209 @@ def train_nodes(
         Mode of the training. 
         Mode = 'weights': Node will return model's weights.
         Mode = 'gradients': Node will return model's gradients.
+    delay: float, default to 0
+        Additional (simulated) latency of the node in seconds.
     Returns
     -------
-    tuple(node_id: str, weights)"""
+    tuple(node_id: str, weights, loss_list, accuracy_list, profile, peak_memory), where profile
+    is a list of records collected by the node's profiler (empty if disabled) and
+    peak_memory is the peak resident set size of the training process in bytes
+    (None if it can not be established)."""
+    if delay > 0:
+        time.sleep(delay)
     node_id, weights, loss_list, accuracy_list = node.train_local_model(
         mode = mode,
         iteration=iteration)
-    return (node_id, weights, loss_list, accuracy_list)
\ No newline at end of file
+    return (node_id, weights, loss_list, accuracy_list, node.model.profiler.pop_records(), peak_rss(children=True))
+
+class Cost_Estimator():
+    """Cost Estimator predicts the training time of the nodes, so the nodes of 
+    the round can be dispatched longest-processing-time-first (LPT). The cost
+    of a node is the size of its training set times its rate (seconds per 
+    training sample), a moving average of the rates measured in the past rounds.
+    Nodes that were never measured are given the average rate of the measured
+    nodes (or, if none was measured yet, the cost is simply the size of their
+    training set)."""
+
+    def __init__(
+        self,
+        smoothing: float = 0.5
+        ) -> None:
+        """Constructor for the Cost Estimator.
+
+        Parameters
+        ----------
+        smoothing: float, default to 0.5
+            A weight of the last measurement in the moving average of the rate.
+
+        Returns
+        -------
+        None
+        """
+        self.smoothing = smoothing
+        self.rates = {} # Node id -> moving average of the seconds per training sample.
+
+
+    @staticmethod
+    def samples(
+        node: FederatedNode
+        ) -> int:
+        """Returns the size of the training set of the node (1 if the data
+        is not held by the orchestrator, e.g. for the remote nodes).
+
+        Parameters
+        ----------
+        node: FederatedNode
+            The node.
+
+        Returns
+        -------
+        int
+        """
+        data = getattr(node, 'train_data', None)
+        return max(len(data), 1) if data is not None else 1
+
+
+    def estimate(
+        self,
+        node: FederatedNode
+        ) -> float:
+        """Returns the predicted cost of the training of the node.
+
+        Parameters
+        ----------
+        node: FederatedNode
+            The node.
+
+        Returns
+        -------
+        float
+        """
+        if node.node_id in self.rates:
+            rate = self.rates[node.node_id]
+        elif self.rates:
+            rate = float(np.mean(list(self.rates.values())))
+        else:
+            rate = 1.
+        return rate * self.samples(node)
+
+
+    def record(
+        self,
+        node: FederatedNode,
+        elapsed: float
+        ) -> None:
+        """Records the measured training time of the node.
+
+        Parameters
+        ----------
+        node: FederatedNode
+            The trained node.
+        elapsed: float
+            The time (in seconds) between the dispatch of the node and the arrival of its update.
+
+        Returns
+        -------
+        None
+        """
+        rate = elapsed / self.samples(node)
+        if node.node_id in self.rates:
+            rate = self.smoothing * rate + (1 - self.smoothing) * self.rates[node.node_id]
+        self.rates[node.node_id] = rate
+
+
+    def order(
+        self,
+        nodes: list[FederatedNode]
+        ) -> list[FederatedNode]:
+        """Returns the nodes sorted by their predicted cost, the most expensive
+        first (ties keep the order of the sample).
+
+        Parameters
+        ----------
+        nodes: list[FederatedNode]
+            The nodes to be trained.
+
+        Returns
+        -------
+        list[FederatedNode]
+        """
+        return sorted(nodes, key = lambda node: -self.estimate(node))
+
+
+class Memory_Governor():
+    """Memory Governor limits the number of the nodes training at once, so the
+    training processes fit into the memory budget. Every trained node reports 
+    the peak resident set size of its process (with the workers of its DataLoaders),
+    the number of the concurrent training tasks is the budget divided by the largest
+    reported peak. Until the first measurement arrives, only a single (probing) task
+    is allowed. If the memory can not be measured (e.g. on Windows), the budget
+    is not enforced."""
+
+    def __init__(
+        self,
+        budget: float,
+        logger: Logger = None
+        ) -> None:
+        """Constructor for the Memory Governor.
+
+        Parameters
+        ----------
+        budget: float
+            The memory (in bytes) that can be used by the training processes.
+        logger: Logger, default to None
+            Logger warning that the budget can not be enforced.
+
+        Returns
+        -------
+        None
+        """
+        if budget <= 0:
+            raise ValueError(f"The memory budget must be positive, got {budget}.")
+        self.budget = budget
+        self.logger = logger
+        self.peak = None # The largest peak memory (in bytes) of a training process.
+        self.measurable = True # False once a process could not measure its memory.
+
+
+    def record(
+        self,
+        peak: int | None
+        ) -> None:
+        """Records the peak memory reported by a training process.
+
+        Parameters
+        ----------
+        peak: int | None
+            The peak resident set size (in bytes), None if it was not established.
+
+        Returns
+        -------
+        None
+        """
+        if peak:
+            self.peak = max(self.peak or 0, peak)
+        elif self.measurable and self.peak is None:
+            self.measurable = False
+            if self.logger is not None:
+                self.logger.warning("The memory of the training processes can not be measured, the memory budget is not enforced.")
+
+
+    def slots(
+        self,
+        limit: int
+        ) -> int:
+        """Returns the number of the training tasks that can run at once.
+
+        Parameters
+        ----------
+        limit: int
+            The upper bound of the concurrency (e.g. the number of the sampled nodes).
+
+        Returns
+        -------
+        int
+        """
+        if self.peak is None:
+            return 1 if self.measurable else max(limit, 1)
+        return max(1, min(limit, math.floor(self.budget / self.peak)))
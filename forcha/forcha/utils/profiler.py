@@ -0,0 +1,344 @@
+import csv
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+try:
+    import resource
+except ImportError: # Not available on Windows.
+    resource = None
+
+
+def current_rss() -> int:
+    """Returns the resident set size (in bytes) of the current process.
+    Reads /proc/self/statm where available and falls back to the peak
+    resident set size otherwise.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    int
+        Resident set size in bytes (0 if it can not be established).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        peak = peak_rss()
+        return peak if peak is not None else 0
+
+
+def children_rss() -> int:
+    """Returns the total resident set size (in bytes) of the live child processes
+    of the current process (e.g. the workers of the DataLoaders). Reads the /proc
+    file system, returns 0 where it is not available.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    int
+    """
+    total = 0
+    parent = os.getpid()
+    try:
+        processes = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return 0
+    for process in processes:
+        try:
+            with open(f'/proc/{process}/stat', 'r') as stat:
+                # The name of the process (in parentheses) may contain spaces.
+                fields = stat.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) != parent:
+                continue
+            with open(f'/proc/{process}/statm', 'r') as statm:
+                total += int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+def peak_rss(
+    children: bool = False
+    ) -> int | None:
+    """Returns the peak resident set size (in bytes) of the current process.
+
+    Parameters
+    ----------
+    children: bool, default to False
+        If True, the memory of the child processes (e.g. the workers of the
+        DataLoaders) is added: the current size of the live children and the peak
+        of the largest terminated one. The result is an upper estimate of the
+        peak memory of the process with its children.
+
+    Returns
+    -------
+    int | None
+        Peak resident set size in bytes or None if it can not be established.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    unit = 1 if sys.platform == 'darwin' else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    if children:
+        peak += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit + children_rss()
+    return peak
+
+
+def tensor_memory() -> int:
+    """Returns the amount of memory (in bytes) currently allocated by the
+    tensors on the CUDA device. Returns 0 on the CPU-only machines.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    int
+    """
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda.memory_allocated()
+    return 0
+
+
+class Profiler():
+    """Profiler records the wall-clock time and the memory counters of the
+    phases of the simulation (broadcast, sampling, local training, transport,
+    aggregation, evaluation and archiving). Each object of the simulation
+    (orchestrator, model, evaluation manager) holds its own profiler, the
+    records are then merged by the orchestrator and exported once per round.
+    A disabled profiler is a no-op, so the phases can be always declared."""
+
+    field_names = [
+        'iteration',
+        'node',
+        'phase',
+        'wall_time',
+        'rss',
+        'rss_delta',
+        'peak_rss',
+        'tensor_memory'
+        ]
+
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        node_name: int | str = None
+        ) -> None:
+        """Initializes the Profiler.
+
+        Parameters
+        ----------
+        enabled: bool, default to False
+            If False, the profiler will not record anything.
+        node_name: int | str, default to None
+            An identifier of the object that owns the profiler.
+
+        Returns
+        -------
+        None
+        """
+        self.enabled = enabled
+        self.node_name = node_name
+        self.records = []
+        self.lock = threading.Lock()
+
+
+    def __getstate__(self) -> dict:
+        # Locks can not be pickled (profilers travel with the nodes to the workers).
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+
+    def __setstate__(
+        self,
+        state: dict
+        ) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def phase(
+        self,
+        name: str,
+        iteration: int = None,
+        node: int | str = None
+        ):
+        """Context manager measuring a single phase of the simulation.
+
+        Parameters
+        ----------
+        name: str
+            Name of the phase, e.g. 'local_training'.
+        iteration: int, default to None
+            The current iteration (if known).
+        node: int | str, default to None
+            An identifier of the node that the phase concerns. If None,
+            the owner of the profiler is used.
+
+        Returns
+        -------
+        None
+        """
+        if not self.enabled:
+            yield
+            return
+        rss_start = current_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            rss_end = current_rss()
+            self.record(
+                name = name,
+                wall_time = wall_time,
+                iteration = iteration,
+                node = node,
+                rss = rss_end,
+                rss_delta = rss_end - rss_start
+                )
+
+
+    def record(
+        self,
+        name: str,
+        wall_time: float,
+        iteration: int = None,
+        node: int | str = None,
+        rss: int = None,
+        rss_delta: int = 0
+        ) -> None:
+        """Records a measurement taken outside of the Profiler.phase() context,
+        e.g. the transport time derived by the orchestrator.
+
+        Parameters
+        ----------
+        name: str
+            Name of the phase.
+        wall_time: float
+            Duration of the phase in seconds.
+        iteration: int, default to None
+            The current iteration (if known).
+        node: int | str, default to None
+            An identifier of the node that the phase concerns.
+        rss: int, default to None
+            Resident set size at the end of the phase. Measured if None.
+        rss_delta: int, default to 0
+            Change of the resident set size during the phase.
+
+        Returns
+        -------
+        None
+        """
+        if not self.enabled:
+            return
+        entry = {
+            'iteration': iteration,
+            'node': node if node is not None else self.node_name,
+            'phase': name,
+            'wall_time': wall_time,
+            'rss': rss if rss is not None else current_rss(),
+            'rss_delta': rss_delta,
+            'peak_rss': peak_rss(),
+            'tensor_memory': tensor_memory()
+            }
+        with self.lock:
+            self.records.append(entry)
+
+
+    def extend(
+        self,
+        records: list[dict]
+        ) -> None:
+        """Merges the records collected by other profiler (e.g. on the node).
+
+        Parameters
+        ----------
+        records: list[dict]
+            Records returned by Profiler.pop_records().
+
+        Returns
+        -------
+        None
+        """
+        if not self.enabled or not records:
+            return
+        with self.lock:
+            self.records.extend(records)
+
+
+    def pop_records(self) -> list[dict]:
+        """Returns all the collected records and clears the profiler.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        list[dict]
+        """
+        with self.lock:
+            records = self.records
+            self.records = []
+        return records
+
+
+    def export(
+        self,
+        iteration: int,
+        saving_path: str,
+        file_name: str = 'phase_profile.csv',
+        records: list[dict] = None
+        ) -> None:
+        """Appends all the collected records to a csv file and clears the
+        profiler. Records without an iteration are assigned to the passed one.
+
+        Parameters
+        ----------
+        iteration: int
+            The current iteration.
+        saving_path: str
+            Path to the directory in which the file should be saved.
+        file_name: str, default to 'phase_profile.csv'
+            Name of the file.
+        records: list[dict], default to None
+            Records to be exported instead of the collected ones (e.g. popped
+            before the export was submitted to the background).
+
+        Returns
+        -------
+        None
+        """
+        if not self.enabled:
+            return
+        if records is None:
+            records = self.pop_records()
+        if not records:
+            return
+        path = os.path.join(saving_path, file_name)
+        with open(path, 'a+', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, self.field_names)
+            if os.path.getsize(path) == 0:
+                writer.writeheader()
+            for entry in records:
+                if entry['iteration'] is None:
+                    entry['iteration'] = iteration
+                writer.writerow(entry)
@@ -0,0 +1,344 @@
+"""Reproducible benchmark suite for the federated training and the contribution
+evaluation. Each scenario (FedAvg, FedOpt and each of the evaluators) is run on
+synthetic, MNIST-shaped data, on CPU, across the requested numbers of nodes and
+sample sizes. Every run is performed in a fresh process, so the reported peak
+memory is not inflated by the previous runs.
+
+Usage (from the directory containing the forcha package):
+    python -m tests.benchmarks.benchmark --output benchmark.json
+    python -m tests.benchmarks.benchmark --baseline tests/benchmarks/baseline.json
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import torch
+
+from forcha.components.orchestrator.evaluator_orchestrator import Evaluator_Orchestrator
+from forcha.components.orchestrator.fedopt_orchestrator import Fedopt_Orchestrator
+from forcha.components.orchestrator.generic_orchestrator import Orchestrator
+from forcha.components.settings.evaluator_settings import EvaluatorSettings
+from forcha.components.settings.fedopt_settings import FedoptSettings
+from forcha.components.settings.settings import Settings
+from forcha.models.templates import mnist
+from forcha.utils.profiler import peak_rss
+from tests.benchmarks.data_generation import generate_nodes_data
+
+try:
+    import resource
+except ImportError: # Not available on Windows.
+    resource = None
+
+
+# Each scenario defines the orchestrator, settings object and (optionally)
+# additional settings and keyword arguments passed to the orchestrator.
+SCENARIOS = {
+    'fedavg': {'orchestrator': Orchestrator, 'settings': Settings},
+    'fedopt': {'orchestrator': Fedopt_Orchestrator, 'settings': FedoptSettings},
+    # Lazy nodes borrowing their networks from the replica pool.
+    'fedavg_lazy': {'orchestrator': Orchestrator, 'settings': Settings, 'options': {'lazy_nodes': True}},
+    # All the sampled nodes trained together in the main process (MLP templates).
+    'fedavg_vectorized': {'orchestrator': Orchestrator, 'settings': Settings, 'kwargs': {'vectorized': True}},
+    # Updates folded into a running sum as they arrive (see Streaming_Aggregator).
+    'fedavg_streaming': {'orchestrator': Orchestrator, 'settings': Settings, 'kwargs': {'streaming_aggregation': True}},
+    'loo': {
+        'orchestrator': Evaluator_Orchestrator,
+        'settings': EvaluatorSettings,
+        'options': {'in_sample_loo': True, 'in_sample_alpha': False, 'in_sample_shap': False}
+        },
+    'alpha': {
+        'orchestrator': Evaluator_Orchestrator,
+        'settings': EvaluatorSettings,
+        'options': {'in_sample_loo': False, 'in_sample_alpha': True, 'in_sample_shap': False}
+        },
+    'shapley': {
+        'orchestrator': Evaluator_Orchestrator,
+        'settings': EvaluatorSettings,
+        'options': {'in_sample_loo': False, 'in_sample_alpha': False, 'in_sample_shap': True}
+        },
+    'parallel_shapley': {
+        'orchestrator': Evaluator_Orchestrator,
+        'settings': EvaluatorSettings,
+        'options': {'in_sample_loo': False, 'in_sample_alpha': False, 'in_sample_shap': True},
+        'kwargs': {'parallelization': True}
+        }
+    }
+# Phases recorded by the evaluation managers.
+EVALUATION_PHASES = ('evaluation_loo', 'evaluation_shap', 'evaluation_alpha')
+# Metrics compared against the baseline and the direction of the improvement.
+COMPARED_METRICS = {
+    'rounds_per_second': 'higher',
+    'evaluator_seconds_per_round': 'lower',
+    'peak_rss_mb': 'lower'
+    }
+
+
+def read_profile(
+    results_path: str
+    ) -> list[dict]:
+    """Reads the phase profile exported by the orchestrator.
+
+    Parameters
+    ----------
+    results_path: str
+        Path to the results directory of the simulation.
+
+    Returns
+    -------
+    list[dict]
+    """
+    path = os.path.join(results_path, 'phase_profile.csv')
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', newline='') as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def run_scenario(
+    scenario: str,
+    number_of_nodes: int,
+    sample_size: int,
+    samples_per_node: int,
+    rounds: int,
+    model: str,
+    number_of_workers: int,
+    seed: int
+    ) -> dict:
+    """Runs a single simulation and returns its measurements. Should be called
+    in a fresh process (see measure_scenario).
+
+    Parameters
+    ----------
+    scenario: str
+        Name of the scenario (key of the SCENARIOS dictionary).
+    number_of_nodes: int
+        Number of the nodes in the federation.
+    sample_size: int
+        Number of the nodes sampled in each round.
+    samples_per_node: int
+        Number of the training samples on each node.
+    rounds: int
+        Number of the global epochs.
+    model: str
+        Name of the template from forcha.models.templates.mnist.
+    number_of_workers: int
+        Number of the workers passed to the orchestrator.
+    seed: int
+        Seed of the simulation and of the data generation.
+
+    Returns
+    -------
+    dict
+    """
+    definition = SCENARIOS[scenario]
+    orchestrator_data, nodes_data = generate_nodes_data(
+        number_of_nodes = number_of_nodes,
+        samples_per_node = samples_per_node,
+        seed = seed
+        )
+    with tempfile.TemporaryDirectory() as root_name:
+        settings = definition['settings'](
+            simulation_seed = seed,
+            global_epochs = rounds,
+            local_epochs = 1,
+            number_of_nodes = number_of_nodes,
+            sample_size = sample_size,
+            optimizer = 'SGD',
+            save_training_metrics = False,
+            root_name = root_name,
+            force_cpu = True,
+            profiling = True,
+            **definition.get('options', {})
+            )
+        orchestrator = definition['orchestrator'](
+            settings = settings,
+            number_of_workers = number_of_workers,
+            **definition.get('kwargs', {})
+            )
+        orchestrator.prepare_orchestrator(
+            model = getattr(mnist, model)(),
+            validation_data = orchestrator_data
+            )
+        orchestrator.prepare_training(nodes_data=nodes_data)
+        start = time.perf_counter()
+        orchestrator.train_protocol()
+        wall_time = time.perf_counter() - start
+        profile = read_profile(settings.results_path)
+
+    evaluation_time = sum(float(entry['wall_time']) for entry in profile if entry['phase'] in EVALUATION_PHASES)
+    training_time = sum(float(entry['wall_time']) for entry in profile if entry['phase'] == 'training')
+    peak_worker_rss = None
+    if resource is not None:
+        peak_worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak_worker_rss = peak_worker_rss if sys.platform == 'darwin' else peak_worker_rss * 1024
+    peak = peak_rss()
+    return {
+        'scenario': scenario,
+        'number_of_nodes': number_of_nodes,
+        'sample_size': sample_size,
+        'samples_per_node': samples_per_node,
+        'rounds': rounds,
+        'model': model,
+        'wall_time': wall_time,
+        'rounds_per_second': rounds / wall_time,
+        'training_seconds_per_round': training_time / rounds,
+        'evaluator_seconds_per_round': evaluation_time / rounds,
+        'peak_rss_mb': peak / 2 ** 20 if peak is not None else None,
+        'peak_worker_rss_mb': peak_worker_rss / 2 ** 20 if peak_worker_rss is not None else None
+        }
+
+
+def _scenario_process(
+    queue: multiprocessing.Queue,
+    configuration: dict
+    ) -> None:
+    queue.put(run_scenario(**configuration))
+
+
+def measure_scenario(
+    configuration: dict
+    ) -> dict:
+    """Runs run_scenario in a fresh (spawned) process and returns its results.
+
+    Parameters
+    ----------
+    configuration: dict
+        Keyword arguments of run_scenario.
+
+    Returns
+    -------
+    dict
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_scenario_process, args=(queue, configuration))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def result_key(
+    result: dict
+    ) -> tuple:
+    return (result['scenario'], result['number_of_nodes'], result['sample_size'],
+            result['samples_per_node'], result['rounds'], result['model'])
+
+
+def compare_results(
+    results: list[dict],
+    baseline: list[dict],
+    tolerance: float
+    ) -> list[str]:
+    """Compares the results with the baseline, prints the relative changes
+    and returns a list of the detected regressions.
+
+    Parameters
+    ----------
+    results: list[dict]
+        Results of the current run.
+    baseline: list[dict]
+        Results stored in the baseline file.
+    tolerance: float
+        Relative change tolerated before a change is reported as a regression.
+
+    Returns
+    -------
+    list[str]
+        Descriptions of the regressions.
+    """
+    baseline = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline.get(result_key(result))
+        if reference is None:
+            print(f"{result_key(result)}: no baseline entry")
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            current, previous = result.get(metric), reference.get(metric)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            print(f"{result_key(result)} {metric}: {previous:.4f} -> {current:.4f} ({change:+.1%})")
+            if (direction == 'higher' and change < -tolerance) or (direction == 'lower' and change > tolerance):
+                regressions.append(f"{result_key(result)} {metric} {change:+.1%}")
+    return regressions
+
+
+def parse_arguments(arguments: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--nodes', nargs='+', type=int, default=[3, 5], help='Numbers of the nodes.')
+    parser.add_argument('--sample-sizes', nargs='+', type=int, default=[3, 5],
+                        help='Numbers of the nodes sampled in each round (capped at the number of nodes).')
+    parser.add_argument('--samples-per-node', nargs='+', type=int, default=[128])
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--model', default='MNIST_MLP', help='Template from forcha.models.templates.mnist.')
+    parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 8))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='Path to the JSON file with the results.')
+    parser.add_argument('--baseline', default=None, help='Path to the JSON baseline to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str] = None) -> int:
+    arguments = parse_arguments(arguments)
+    configurations = []
+    for scenario in arguments.scenarios:
+        for number_of_nodes in arguments.nodes:
+            sample_sizes = sorted({min(size, number_of_nodes) for size in arguments.sample_sizes})
+            for sample_size in sample_sizes:
+                for samples_per_node in arguments.samples_per_node:
+                    configurations.append({
+                        'scenario': scenario,
+                        'number_of_nodes': number_of_nodes,
+                        'sample_size': sample_size,
+                        'samples_per_node': samples_per_node,
+                        'rounds': arguments.rounds,
+                        'model': arguments.model,
+                        'number_of_workers': arguments.workers,
+                        'seed': arguments.seed
+                        })
+
+    results = []
+    for configuration in configurations:
+        result = measure_scenario(configuration)
+        print(json.dumps(result))
+        results.append(result)
+
+    report = {
+        'metadata': {
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'torch_threads': torch.get_num_threads(),
+            'arguments': {key: value for key, value in vars(arguments).items()
+                          if key not in ('output', 'baseline', 'tolerance')}
+            },
+        'results': results
+        }
+    if arguments.output:
+        with open(arguments.output, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, 'r') as json_file:
+            baseline = json.load(json_file)
+        regressions = compare_results(results, baseline['results'], arguments.tolerance)
+        if regressions:
+            print("Regressions detected:\n" + "\n".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
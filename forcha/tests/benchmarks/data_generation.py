@@ -0,0 +1,84 @@
+"""Generates synthetic, MNIST-shaped datasets for the benchmark suite. Unlike the
+end-to-end scripts, the benchmarks do not depend on any pre-generated (pickled)
+datasets - everything is generated locally from a seed."""
+import datasets
+import numpy as np
+
+
+def generate_dataset(
+    size: int,
+    seed: int,
+    image_shape: tuple[int, int] = (28, 28),
+    number_of_classes: int = 10,
+    noise: float = 0.5
+    ) -> datasets.arrow_dataset.Dataset:
+    """Generates a single synthetic dataset. Each class is represented by a fixed
+    random prototype (shared across seeds), each sample is a noised copy of its
+    class prototype, so the data remains learnable.
+    
+    Parameters
+    ----------
+    size: int
+        Number of samples in the dataset.
+    seed: int
+        Seed of the generator.
+    image_shape: tuple[int, int], default to (28, 28)
+        Shape of a single (grayscale) image.
+    number_of_classes: int, default to 10
+        Number of the classes.
+    noise: float, default to 0.5
+        Standard deviation of the noise added to the prototypes.
+    
+    Returns
+    -------
+    datasets.arrow_dataset.Dataset
+        A dataset with 'image' and 'label' columns.
+    """
+    prototypes = np.random.default_rng(0).uniform(0, 1, (number_of_classes, *image_shape))
+    generator = np.random.default_rng(seed)
+    labels = generator.integers(0, number_of_classes, size)
+    images = prototypes[labels] + generator.normal(0, noise, (size, *image_shape))
+    images = (np.clip(images, 0, 1) * 255).astype(np.uint8)
+    features = datasets.Features({
+        'image': datasets.Image(),
+        'label': datasets.ClassLabel(num_classes=number_of_classes)
+        })
+    return datasets.Dataset.from_dict(
+        {'image': list(images), 'label': labels.tolist()},
+        features = features
+        )
+
+
+def generate_nodes_data(
+    number_of_nodes: int,
+    samples_per_node: int,
+    local_test_size: float = 0.3,
+    seed: int = 42
+    ) -> list[datasets.arrow_dataset.Dataset, list]:
+    """Generates the data for the orchestrator and for all the nodes, in the same
+    format as the dataset pointers used by the end-to-end scripts.
+    
+    Parameters
+    ----------
+    number_of_nodes: int
+        Number of the nodes.
+    samples_per_node: int
+        Number of the training samples of each node.
+    local_test_size: float, default to 0.3
+        Size of the local test set (relative to the training set).
+    seed: int, default to 42
+        Seed of the generation.
+    
+    Returns
+    -------
+    list[datasets.arrow_dataset.Dataset, list]
+        Orchestrator's validation dataset and the list of [train, test] datasets of the nodes.
+    """
+    test_size = max(int(samples_per_node * local_test_size), 1)
+    orchestrator_data = generate_dataset(size=samples_per_node, seed=seed)
+    nodes_data = [
+        [generate_dataset(size=samples_per_node, seed=seed + 1 + 2 * node),
+         generate_dataset(size=test_size, seed=seed + 2 + 2 * node)]
+        for node in range(number_of_nodes)
+        ]
+    return [orchestrator_data, nodes_data]
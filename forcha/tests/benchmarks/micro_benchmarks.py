@@ -0,0 +1,380 @@
+"""Micro-benchmarks of the primitives used in the inner loops of the evaluators:
+Aggregators.compute_average, Optimizers.fed_optimize (all four optimizers),
+Subsets.form_superset, Subsets.select_subsets and their Coalition_Index
+counterparts, as well as an epoch of the local training (in the default and
+in the fast training mode) and the evaluation of a model with the compiled
+forward pass (reporting the compilation overhead and the speedup). The tensor primitives are measured over the
+parameters of the MNIST_Expanded_CNN and CifarNet templates, the subset
+primitives over the sample sizes up to 16. Besides the time, each
+benchmark reports the allocations: the peak of the Python heap (tracemalloc)
+and the memory allocated by the tensors (torch.profiler).
+
+Usage (from the directory containing the forcha package):
+    python -m tests.benchmarks.micro_benchmarks --output micro.json
+    python -m tests.benchmarks.micro_benchmarks --baseline micro_baseline.json
+"""
+import argparse
+import copy
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+import torch
+from torch.profiler import profile, ProfilerActivity
+
+from forcha.components.settings.evaluator_settings import EvaluatorSettings
+from forcha.components.settings.settings import Settings
+from forcha.models.federated_model import FederatedModel
+from forcha.models.templates.cifar10 import CifarNet
+from forcha.models.templates.mnist import MNIST_Expanded_CNN
+from forcha.utils.computations import Aggregators, Coalition_Index, Subsets
+from forcha.utils.optimizers import Optimizers
+from tests.benchmarks.data_generation import generate_dataset
+
+
+TEMPLATES = {
+    'MNIST_Expanded_CNN': MNIST_Expanded_CNN,
+    'CifarNet': CifarNet
+    }
+# Shapes of the (synthetic) images accepted by the templates.
+IMAGE_SHAPES = {
+    'MNIST_Expanded_CNN': (28, 28),
+    'CifarNet': (32, 32, 3)
+    }
+OPTIMIZERS = ('Simple', 'FedAdagard', 'FedYogi', 'FedAdam')
+# Metrics compared against the baseline (all of them should be lower).
+COMPARED_METRICS = ('median_seconds', 'python_peak_bytes', 'tensor_allocated_bytes')
+
+
+def measure(
+    name: str,
+    function: Callable,
+    setup: Callable[[], tuple],
+    repeats: int
+    ) -> dict:
+    """Measures a single primitive. The setup is called before every call of
+    the function (outside of the measurement), as some primitives modify
+    their arguments in place.
+
+    Parameters
+    ----------
+    name: str
+        Name of the benchmark.
+    function: Callable
+        Measured function.
+    setup: Callable[[], tuple]
+        Returns the positional arguments of the function.
+    repeats: int
+        Number of the timed calls.
+
+    Returns
+    -------
+    dict
+    """
+    timings = []
+    for _ in range(repeats):
+        arguments = setup()
+        start = time.perf_counter()
+        function(*arguments)
+        timings.append(time.perf_counter() - start)
+
+    # Allocations are measured in separate calls, as tracing slows the calls down.
+    arguments = setup()
+    tracemalloc.start()
+    function(*arguments)
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    arguments = setup()
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as profiler:
+        function(*arguments)
+    allocations = [event.self_cpu_memory_usage for event in profiler.events()
+                   if event.self_cpu_memory_usage > 0]
+    return {
+        'benchmark': name,
+        'repeats': repeats,
+        'median_seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'python_peak_bytes': python_peak,
+        'tensor_allocated_bytes': sum(allocations),
+        'tensor_allocations': len(allocations)
+        }
+
+
+def random_updates(
+    weights: dict,
+    number_of_updates: int,
+    generator: torch.Generator
+    ) -> dict[int, dict]:
+    return {node: {key: torch.rand(tensor.size(), generator=generator) for key, tensor in weights.items()}
+            for node in range(number_of_updates)}
+
+
+def aggregation_benchmarks(
+    templates: list[str],
+    sample_sizes: list[int],
+    repeats: int
+    ) -> list[dict]:
+    results = []
+    generator = torch.Generator().manual_seed(42)
+    for template in templates:
+        weights = TEMPLATES[template]().state_dict()
+        for sample_size in sample_sizes:
+            updates = random_updates(weights, sample_size, generator)
+            result = measure(
+                name = f"compute_average[{template},{sample_size}]",
+                function = Aggregators.compute_average,
+                setup = lambda: (copy.deepcopy(updates),),
+                repeats = repeats
+                )
+            result['parameters'] = sum(tensor.numel() for tensor in weights.values())
+            results.append(result)
+    return results
+
+
+def optimizer_benchmarks(
+    templates: list[str],
+    repeats: int,
+    root_name: str
+    ) -> list[dict]:
+    results = []
+    generator = torch.Generator().manual_seed(42)
+    for optimizer_name in OPTIMIZERS:
+        settings = EvaluatorSettings(
+            global_optimizer = optimizer_name,
+            global_learning_rate = 0.5,
+            b1 = 0.9,
+            b2 = 0.99,
+            tau = 1e-3,
+            root_name = root_name
+            )
+        for template in templates:
+            weights = TEMPLATES[template]().state_dict()
+            delta = random_updates(weights, 1, generator)[0]
+            optimizer = Optimizers(weights=weights, settings=settings)
+            result = measure(
+                name = f"fed_optimize[{optimizer_name},{template}]",
+                function = optimizer.fed_optimize,
+                setup = lambda: (weights, delta),
+                repeats = repeats
+                )
+            result['parameters'] = sum(tensor.numel() for tensor in weights.values())
+            results.append(result)
+    return results
+
+
+def training_benchmarks(
+    templates: list[str],
+    repeats: int,
+    root_name: str,
+    samples: int = 256
+    ) -> list[dict]:
+    results = []
+    for template in templates:
+        for fast_training in (False, True):
+            torch.manual_seed(42)
+            settings = Settings(
+                optimizer = 'SGD',
+                sample_size = 1,
+                root_name = root_name,
+                force_cpu = True,
+                fast_training = fast_training
+                )
+            model = FederatedModel(
+                settings = settings,
+                net = TEMPLATES[template](),
+                local_dataset = [generate_dataset(samples, seed=1, image_shape=IMAGE_SHAPES[template]),
+                                 generate_dataset(samples // 4, seed=2, image_shape=IMAGE_SHAPES[template])],
+                node_name = 0
+                )
+            result = measure(
+                name = f"train_epoch[{template},{'fast' if fast_training else 'default'}]",
+                function = model.train,
+                setup = lambda: (0, 0),
+                repeats = repeats
+                )
+            result['samples'] = samples
+            results.append(result)
+    return results
+
+
+def compilation_benchmarks(
+    templates: list[str],
+    compile_modes: list[str],
+    repeats: int,
+    root_name: str,
+    samples: int = 256
+    ) -> list[dict]:
+    results = []
+    for template in templates:
+        reference = None
+        for compile_mode in [None] + compile_modes:
+            torch.manual_seed(42)
+            settings = Settings(
+                optimizer = 'SGD',
+                root_name = root_name,
+                force_cpu = True,
+                compile_mode = compile_mode
+                )
+            model = FederatedModel(
+                settings = settings,
+                net = TEMPLATES[template](),
+                local_dataset = [generate_dataset(samples, seed=2, image_shape=IMAGE_SHAPES[template])],
+                node_name = 0
+                )
+            # The first call compiles the forward pass.
+            start = time.perf_counter()
+            model.quick_evaluate()
+            first_call = time.perf_counter() - start
+            result = measure(
+                name = f"quick_evaluate[{template},{compile_mode or 'eager'}]",
+                function = model.quick_evaluate,
+                setup = lambda: (),
+                repeats = repeats
+                )
+            result['first_call_seconds'] = first_call
+            result['compilation_overhead_seconds'] = max(first_call - result['median_seconds'], 0.0)
+            if reference is None:
+                reference = result['median_seconds']
+            result['speedup'] = reference / result['median_seconds']
+            results.append(result)
+    return results
+
+
+def subset_benchmarks(
+    sample_sizes: list[int],
+    repeats: int
+    ) -> list[dict]:
+    results = []
+    for sample_size in sample_sizes:
+        elements = list(range(sample_size))
+        results.append(measure(
+            name = f"form_superset[{sample_size}]",
+            function = Subsets.form_superset,
+            setup = lambda: (elements,),
+            repeats = repeats
+            ))
+        superset = Subsets.form_superset(elements)
+        # The evaluators select the subsets without the node, for each node in the sample.
+        results.append(measure(
+            name = f"select_subsets[{sample_size}]",
+            function = lambda coalitions: [Subsets.select_subsets(coalitions, node) for node in elements],
+            setup = lambda: (superset,),
+            repeats = repeats
+            ))
+        # The same operations on the bitmask-based coalition index.
+        index = Coalition_Index(elements)
+        index.scores[:] = np.random.default_rng(42).uniform(size=index.scores.size)
+        results.append(measure(
+            name = f"coalition_index_masks_without[{sample_size}]",
+            function = lambda coalition_index: [coalition_index.masks_without(node) for node in elements],
+            setup = lambda: (index,),
+            repeats = repeats
+            ))
+        results.append(measure(
+            name = f"coalition_index_shapley_values[{sample_size}]",
+            function = Coalition_Index.shapley_values,
+            setup = lambda: (index,),
+            repeats = repeats
+            ))
+    return results
+
+
+def compare_results(
+    results: list[dict],
+    baseline: list[dict],
+    tolerance: float
+    ) -> list[str]:
+    """Compares the results with the baseline, prints the relative changes
+    and returns a list of the detected regressions.
+
+    Parameters
+    ----------
+    results: list[dict]
+        Results of the current run.
+    baseline: list[dict]
+        Results stored in the baseline file.
+    tolerance: float
+        Relative change tolerated before a change is reported as a regression.
+
+    Returns
+    -------
+    list[str]
+        Descriptions of the regressions.
+    """
+    baseline = {result['benchmark']: result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline.get(result['benchmark'])
+        if reference is None:
+            print(f"{result['benchmark']}: no baseline entry")
+            continue
+        for metric in COMPARED_METRICS:
+            current, previous = result[metric], reference[metric]
+            if not previous:
+                continue
+            change = (current - previous) / previous
+            print(f"{result['benchmark']} {metric}: {previous} -> {current} ({change:+.1%})")
+            if change > tolerance:
+                regressions.append(f"{result['benchmark']} {metric} {change:+.1%}")
+    return regressions
+
+
+def parse_arguments(arguments: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', nargs='+', default=list(TEMPLATES), choices=list(TEMPLATES))
+    parser.add_argument('--sample-sizes', nargs='+', type=int, default=[2, 4, 8, 12, 16])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--compile-modes', nargs='*', default=['script', 'compile'], choices=['script', 'compile'],
+                        help='Compilation modes benchmarked against the eager evaluation.')
+    parser.add_argument('--output', default=None, help='Path to the JSON file with the results.')
+    parser.add_argument('--baseline', default=None, help='Path to the JSON baseline to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str] = None) -> int:
+    arguments = parse_arguments(arguments)
+    with tempfile.TemporaryDirectory() as root_name:
+        results = (aggregation_benchmarks(arguments.templates, arguments.sample_sizes, arguments.repeats)
+                   + optimizer_benchmarks(arguments.templates, arguments.repeats, root_name)
+                   + training_benchmarks(arguments.templates, arguments.repeats, root_name)
+                   + compilation_benchmarks(arguments.templates, arguments.compile_modes, arguments.repeats, root_name)
+                   + subset_benchmarks(arguments.sample_sizes, arguments.repeats))
+    for result in results:
+        print(json.dumps(result))
+
+    report = {
+        'metadata': {
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'torch_threads': torch.get_num_threads(),
+            'arguments': {key: value for key, value in vars(arguments).items()
+                          if key not in ('output', 'baseline', 'tolerance')}
+            },
+        'results': results
+        }
+    if arguments.output:
+        with open(arguments.output, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, 'r') as json_file:
+            baseline = json.load(json_file)
+        regressions = compare_results(results, baseline['results'], arguments.tolerance)
+        if regressions:
+            print("Regressions detected:\n" + "\n".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
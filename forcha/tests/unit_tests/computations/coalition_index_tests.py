@@ -0,0 +1,44 @@
+from forcha.utils.computations import Coalition_Index, Subsets
+import unittest
+import math
+
+import numpy as np
+
+
+class TestCoalitionIndexClass(unittest.TestCase):
+
+
+    def test_masks(self):
+        index = Coalition_Index([7, 3, 5])
+        self.assertEqual(index.mask((3, 5)), 0b110)
+        self.assertEqual(index.coalition(0b101), (5, 7))
+        superset = Subsets.form_superset([7, 3, 5], return_dict=True)
+        self.assertEqual(
+            sorted(index.coalition(mask) for mask in index.masks()),
+            sorted(tuple(sorted(coalition)) for coalition in superset))
+        self.assertEqual(
+            sorted(index.coalition(mask) for mask in index.masks_without(3)),
+            sorted(tuple(sorted(coalition)) for coalition in Subsets.select_subsets(superset, 3)))
+
+
+    def test_shapley_values(self):
+        generator = np.random.default_rng(42)
+        nodes = [4, 0, 9, 2, 6]
+        index = Coalition_Index(nodes)
+        scores = {}
+        for coalition in Subsets.form_superset(nodes, return_dict=True):
+            scores[tuple(sorted(coalition))] = generator.uniform()
+            index.record(index.mask(coalition), scores[tuple(sorted(coalition))])
+        
+        values = index.shapley_values()
+        for node in nodes:
+            shap = 0.0
+            for coalition in Subsets.select_subsets(scores, node):
+                with_node = tuple(sorted(coalition + (node, )))
+                shap += (scores[with_node] - scores[coalition]) / math.comb(len(nodes) - 1, len(coalition))
+            self.assertAlmostEqual(values[node], shap / len(nodes))
+        self.assertEqual(index.to_dict(), scores)
+
+
+if __name__ == '__main__':
+    unittest.main()
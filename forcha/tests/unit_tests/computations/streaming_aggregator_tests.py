@@ -0,0 +1,51 @@
+from forcha.utils.computations import Aggregators, Streaming_Aggregator
+from collections import OrderedDict
+import copy
+import unittest
+
+import torch
+
+
+class TestStreamingAggregatorClass(unittest.TestCase):
+
+
+    def test_average(self):
+        generator = torch.Generator().manual_seed(42)
+        updates = {node: OrderedDict([
+            ('weight', torch.randn((4, 3), generator=generator)),
+            ('bias', torch.randn(3, generator=generator))]) for node in range(5)}
+        reference = Aggregators.compute_average(copy.deepcopy(updates))
+
+        aggregator = Streaming_Aggregator()
+        # The order of the folds changes the average only up to the rounding.
+        for node in [3, 0, 4, 1, 2]:
+            aggregator.fold(updates[node])
+        average = aggregator.average()
+        self.assertEqual(list(average), list(reference))
+        for key in reference:
+            self.assertTrue(torch.allclose(average[key], reference[key], atol=1e-6))
+        # The folded updates are not modified.
+        self.assertFalse(torch.equal(updates[3]['weight'], aggregator.accumulator['weight']))
+
+
+    def test_fixed_order(self):
+        generator = torch.Generator().manual_seed(0)
+        updates = [OrderedDict([('weight', torch.randn(1000, generator=generator) * 10 ** exponent)])
+                   for exponent in range(-4, 5)]
+        averages = []
+        for _ in range(2):
+            aggregator = Streaming_Aggregator()
+            for update in updates:
+                aggregator.fold(update)
+            averages.append(aggregator.average())
+        # Folded in the same order, the average is reproduced exactly.
+        self.assertTrue(torch.equal(averages[0]['weight'], averages[1]['weight']))
+
+
+    def test_empty(self):
+        with self.assertRaises(AssertionError):
+            Streaming_Aggregator().average()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+from forcha.utils.distributed import Distributed_Backend, Hash_Ring
+import operator
+import socket
+import unittest
+
+import torch
+import torch.multiprocessing as mp
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Broken_Model:
+    node_name = 100
+
+    def evaluate_model(self):
+        raise ValueError("The test set is empty.")
+
+
+class Broken_Node:
+    node_id = 100
+    model = Broken_Model()
+
+
+def run(rank, world_size, port):
+    backend = Distributed_Backend(rank, world_size, init_method=f'tcp://127.0.0.1:{port}')
+    if rank != 0:
+        backend.serve()
+        return
+    # Functions are spread over the workers, the results keep their order.
+    with backend.pool() as pool:
+        results = [pool.apply_async(operator.mul, (number, number)) for number in range(10)]
+        assert [result.get() for result in results] == [number * number for number in range(10)]
+    # Tensors are sent in both directions.
+    result = backend.submit(torch.add, (torch.ones(3), torch.ones(3)), rank=2).get()
+    assert torch.equal(result, torch.full((3,), 2.))
+    # Methods of the workers are executed on their own backends.
+    # The workers and the orchestrator agree on the home workers of the nodes.
+    placement = backend.place(5)
+    hosted = backend.call_workers('hosted_ids', (5,))
+    assert hosted == {rank: [node for node in range(5) if placement[node] == rank] for rank in (1, 2)}
+    # Exceptions are re-raised by the orchestrator and passed to the error callback.
+    errors = []
+    result = backend.submit(operator.truediv, (1, 0), error_callback=errors.append)
+    try:
+        result.get()
+        raise AssertionError("The exception was not propagated.")
+    except ZeroDivisionError:
+        pass
+    assert isinstance(errors[0], ZeroDivisionError)
+    # A failed evaluation of a hosted node is reported, the worker keeps serving.
+    backend.submit('host_nodes', ([Broken_Node()],), rank=1).get()
+    try:
+        backend.submit('evaluate_hosted', ([100], 0), rank=1).get()
+        raise AssertionError("The failed evaluation was not reported.")
+    except RuntimeError as error:
+        assert 'node 100' in str(error)
+    assert backend.submit(operator.add, (1, 1), rank=1).get() == 2
+    backend.shutdown()
+
+
+class TestDistributedBackendClass(unittest.TestCase):
+
+
+    def test_tasks(self):
+        mp.spawn(run, args=(3, free_port()), nprocs=3)
+
+
+    def test_spawn_local(self):
+        backend = Distributed_Backend.spawn_local(2)
+        self.assertEqual(len(backend.processes), 2)
+        with backend.pool() as pool:
+            results = [pool.apply_async(operator.add, (number, 1)) for number in range(4)]
+            self.assertEqual([result.get() for result in results], [1, 2, 3, 4])
+        backend.shutdown()
+        self.assertEqual(backend.processes, [])
+
+
+    def test_hash_ring(self):
+        ring = Hash_Ring([1, 2, 3])
+        placement = ring.place(range(30))
+        # Loads are bounded by 1.25 times the average.
+        for worker in (1, 2, 3):
+            self.assertLessEqual(list(placement.values()).count(worker), 13)
+        self.assertEqual(placement, Hash_Ring([1, 2, 3]).place(range(30)))
+        # Adding a worker moves only the nodes taken over by the new worker.
+        extended = Hash_Ring([1, 2, 3, 4])
+        for node in range(100):
+            if extended.owner(node) != 4:
+                self.assertEqual(extended.owner(node), ring.owner(node))
+
+
+    def test_world_size(self):
+        with self.assertRaises(ValueError):
+            Distributed_Backend(0, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+from forcha.components.evaluator.adaptive_scheduler import Adaptive_Scheduler, ranking_distance
+import unittest
+
+import numpy as np
+
+
+class TestAdaptiveSchedulerClass(unittest.TestCase):
+
+
+    def test_ranking_distance(self):
+        self.assertEqual(ranking_distance(np.array([1., 2., 3.]), np.array([10., 20., 30.])), 0.)
+        self.assertEqual(ranking_distance(np.array([1., 2., 3.]), np.array([3., 2., 1.])), 1.)
+        self.assertAlmostEqual(ranking_distance(np.array([1., 2., 3.]), np.array([2., 1., 3.])), 1 / 3)
+        # Only the pairs involving the passed nodes: (0, 1), (0, 2) and (1, 2) for the node 1.
+        self.assertAlmostEqual(ranking_distance(np.array([1., 2., 3., 4.]), np.array([2., 1., 3., 4.]), np.array([0])), 1 / 3)
+        self.assertAlmostEqual(ranking_distance(np.array([1., 2., 3., 4.]), np.array([2., 1., 3., 4.]), np.array([0, 1])), 1 / 5)
+
+
+    def test_budget(self):
+        scheduler = Adaptive_Scheduler(
+            methods = ['in_sample_loo', 'in_sample_shap'],
+            nodes = [0, 1, 2],
+            iterations = 10,
+            budget = 20.
+        )
+        # Unmeasured methods are run first.
+        self.assertEqual(scheduler.select(0), ['in_sample_loo', 'in_sample_shap'])
+        scheduler.record('in_sample_loo', 0, 0.5, {0: 1., 1: 2., 2: 3.})
+        scheduler.record('in_sample_shap', 0, 3., {0: 1., 1: 2., 2: 3.})
+        # The expensive method waits until the paced budget allows it.
+        self.assertEqual(scheduler.select(1), ['in_sample_loo'])
+        spent = 3.5
+        for iteration in range(1, 10):
+            for method in scheduler.select(iteration):
+                cost = 0.5 if method == 'in_sample_loo' else 3.
+                scheduler.record(method, iteration, cost, {0: 1., 1: 2., 2: 3.})
+                spent += cost
+        self.assertLessEqual(spent, 20.)
+        self.assertEqual(scheduler.spent, spent)
+
+
+    def test_stable_rankings(self):
+        scheduler = Adaptive_Scheduler(
+            methods = ['in_sample_loo'],
+            nodes = [0, 1, 2],
+            iterations = 20,
+            budget = 100.
+        )
+        evaluated = []
+        for iteration in range(20):
+            for method in scheduler.select(iteration):
+                scheduler.record(method, iteration, 0.1, {0: 1., 1: 2., 2: 3.})
+                evaluated.append(iteration)
+        # The ranking never changes after the first round, so the evaluations are backed off.
+        self.assertEqual(evaluated, [0, 1, 3, 7, 15])
+        # A change of the ranking resets the back-off.
+        scheduler = Adaptive_Scheduler(
+            methods = ['in_sample_loo'],
+            nodes = [0, 1, 2],
+            iterations = 20,
+            budget = 100.
+        )
+        scheduler.record('in_sample_loo', 0, 0.1, {0: 1., 1: 2., 2: 3.})
+        scheduler.record('in_sample_loo', 1, 0.1, {0: 1., 1: 2., 2: 3.})
+        self.assertEqual(scheduler.next_due['in_sample_loo'], 3)
+        scheduler.record('in_sample_loo', 3, 0.1, {0: 10., 1: 0., 2: 0.})
+        self.assertEqual(scheduler.next_due['in_sample_loo'], 4)
+
+
+
+    def test_small_sample(self):
+        # Two of the thousand nodes are evaluated and move by 400 places in the ranking.
+        nodes = list(range(1000))
+        scheduler = Adaptive_Scheduler(
+            methods = ['in_sample_loo'],
+            nodes = nodes,
+            iterations = 20,
+            budget = 100.
+        )
+        scheduler.record('in_sample_loo', 0, 0.1, {node: float(node) for node in nodes})
+        change = scheduler.record('in_sample_loo', 1, 0.1, {500: 400., 501: -400.})
+        # Over the whole population, less than 0.2% of the pairs change their order.
+        self.assertGreater(change, scheduler.tolerance)
+        self.assertEqual(scheduler.next_due['in_sample_loo'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
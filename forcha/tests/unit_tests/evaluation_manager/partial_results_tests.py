@@ -0,0 +1,66 @@
+from forcha.components.evaluator.partial_results import Partial_Results
+import csv
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+
+class TestPartialResultsClass(unittest.TestCase):
+
+
+    def test_record(self):
+        results = Partial_Results(nodes=[0, 1, 2], iterations=3)
+        self.assertEqual(results.values.shape, (3, 3))
+        results.record(1, 2, 0.5)
+        results.record(2, 2, 0.25)
+        results.record(2, 0, -1.)
+        self.assertEqual(results[0], {0: 0., 1: 0., 2: 0.})
+        self.assertEqual(results[1], {0: 0., 1: 0., 2: 0.5})
+        self.assertEqual(results.totals(), {0: -1., 1: 0., 2: 0.75})
+        copy = Partial_Results(nodes=[0, 1, 2], iterations=3)
+        self.assertNotEqual(results, copy)
+        copy.values = results.values.copy()
+        self.assertEqual(results, copy)
+
+
+    def test_to_csv(self):
+        results = Partial_Results(nodes=[0, 1], iterations=2)
+        results.record(1, 0, 0.1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'partial_loo.csv')
+            results.to_csv(path)
+            with open(path, newline='') as csv_file:
+                rows = list(csv.DictReader(csv_file))
+        self.assertEqual(list(rows[0].keys()), ['0', '1', 'iteration'])
+        self.assertEqual([row['iteration'] for row in rows], ['0', '1'])
+        self.assertEqual(float(rows[1]['0']), 0.1)
+        self.assertTrue(np.array_equal([[float(row['0']), float(row['1'])] for row in rows], results.values))
+
+
+
+    def test_csv_format(self):
+        # The file is the same as the one written row by row from the hash maps.
+        generator = np.random.default_rng(0)
+        results = Partial_Results(nodes=[3, 1, 2], iterations=4)
+        for iteration in range(4):
+            for node in [3, 1, 2]:
+                results.record(iteration, node, generator.normal() * 10. ** generator.integers(-6, 6))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'partial_loo.csv')
+            results.to_csv(path)
+            expected_path = os.path.join(directory, 'expected.csv')
+            with open(expected_path, 'w+', newline='') as csv_file:
+                csv_writer = csv.DictWriter(csv_file, fieldnames=[3, 1, 2, 'iteration'])
+                csv_writer.writeheader()
+                for iteration in range(4):
+                    row = {node: np.float64(value) for node, value in results[iteration].items()}
+                    row['iteration'] = iteration
+                    csv_writer.writerow(row)
+            with open(path, 'rb') as recorded, open(expected_path, 'rb') as expected:
+                self.assertEqual(recorded.read(), expected.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
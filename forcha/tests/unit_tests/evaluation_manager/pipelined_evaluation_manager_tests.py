@@ -0,0 +1,86 @@
+from forcha.components.evaluator.evaluation_manager import Evaluation_Manager
+from forcha.components.settings.evaluator_settings import EvaluatorSettings
+from forcha.components.nodes.federated_node import FederatedNode
+from forcha.models.federated_model import FederatedModel
+from forcha.utils.optimizers import Optimizers
+from forcha.utils.computations import Aggregators
+from forcha.models.templates.mnist import MNIST_MLP
+import unittest
+import datasets
+
+import numpy as np
+import copy
+
+
+def synthetic_dataset(size: int, seed: int) -> datasets.arrow_dataset.Dataset:
+    generator = np.random.default_rng(seed)
+    features = datasets.Features({'image': datasets.Image(), 'label': datasets.ClassLabel(num_classes=10)})
+    return datasets.Dataset.from_dict(
+        {'image': list(generator.integers(0, 255, (size, 28, 28), dtype=np.uint8)),
+         'label': generator.integers(0, 10, size).tolist()},
+        features=features)
+
+
+class TestPipelinedEvaluatorClass(unittest.TestCase):
+
+
+    def test_pipelined_results(self):
+        settings = EvaluatorSettings(
+            optimizer='SGD',
+            in_sample_loo=True,
+            in_sample_shap=True,
+            in_sample_alpha=True,
+            force_cpu=True)
+        net = MNIST_MLP()
+        nodes = [FederatedNode(
+            node_id = node_id,
+            settings = settings,
+            model = net,
+            data = [synthetic_dataset(16, node_id), synthetic_dataset(8, 10 + node_id)]
+            ) for node_id in range(3)]
+        central_model = FederatedModel(
+            settings = settings,
+            net = net,
+            local_dataset = [synthetic_dataset(16, 99)],
+            node_name = 'orchestrator')
+        optimizer = Optimizers(
+            weights = central_model.get_weights(),
+            settings = settings)
+
+        managers = [Evaluation_Manager(
+            settings = settings,
+            model_template = central_model,
+            optimizer_template = optimizer,
+            nodes = [0, 1, 2],
+            iterations = 2,
+            pipelined = pipelined) for pipelined in (False, True)]
+
+        for iteration in range(2):
+            previous_model = copy.deepcopy(central_model.get_weights())
+            previous_optimizer = optimizer.state_dict()
+            gradients = {}
+            for node in nodes:
+                node.model.update_weights(previous_model)
+                node_id, gradient, _, _ = node.train_local_model(iteration=iteration, mode='gradients')
+                gradients[node_id] = gradient
+            grad_avg = Aggregators.compute_average(copy.deepcopy(gradients))
+            updated_model = optimizer.fed_optimize(weights=copy.deepcopy(previous_model), delta=grad_avg)
+            central_model.update_weights(updated_model)
+            for manager in managers:
+                manager.preserve_previous_model(previous_model=previous_model)
+                manager.preserve_previous_optimizer(previous_optimizer=previous_optimizer)
+                manager.preserve_updated_model(updated_model=updated_model)
+                manager.submit_results(
+                    gradients=copy.deepcopy(gradients),
+                    nodes_in_sample=nodes,
+                    iteration=iteration)
+
+        managers[1].wait_for_results()
+        self.assertEqual(managers[1].pending_results, [])
+        self.assertEqual(managers[0].shapley_evaluator.partial_shapley, managers[1].shapley_evaluator.partial_shapley)
+        self.assertEqual(managers[0].sample_evaluator.partial_psi, managers[1].sample_evaluator.partial_psi)
+        self.assertEqual(managers[0].alpha_evaluator.partial_alpha, managers[1].alpha_evaluator.partial_alpha)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from forcha.models.federated_model import FederatedModel
+from forcha.components.settings.settings import Settings
+from forcha.models.templates.mnist import MNIST_MLP
+from forcha.utils.orchestrations import Training_Pool
+import tempfile
+import unittest
+import datasets
+import torch
+
+import numpy as np
+
+
+def synthetic_dataset(size: int, seed: int) -> datasets.arrow_dataset.Dataset:
+    generator = np.random.default_rng(seed)
+    features = datasets.Features({'image': datasets.Image(), 'label': datasets.ClassLabel(num_classes=10)})
+    return datasets.Dataset.from_dict(
+        {'image': list(generator.integers(0, 255, (size, 28, 28), dtype=np.uint8)),
+         'label': generator.integers(0, 10, size).tolist()},
+        features=features)
+
+
+def forward_in_worker(model: FederatedModel, inputs: torch.Tensor) -> tuple:
+    outputs = model.forward(inputs)
+    return model.compiled_net is None, outputs.detach()
+
+
+class TestCompilation(unittest.TestCase):
+
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        settings = Settings(root_name=self.directory.name,
+                            batch_size=4,
+                            force_cpu=True,
+                            compile_mode='script')
+        self.model = FederatedModel(settings=settings,
+                                    net=MNIST_MLP(),
+                                    local_dataset=[synthetic_dataset(16, 0), synthetic_dataset(8, 1)],
+                                    node_name=0)
+        self.inputs = torch.rand(4, 1, 28, 28)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_main_process(self):
+        self.model.net.eval()
+        outputs = self.model.forward(self.inputs)
+        self.assertIsInstance(self.model.compiled_net, torch.jit.ScriptModule)
+        self.assertTrue(torch.allclose(outputs, self.model.net(self.inputs)))
+        # The compiled net is reused by the next calls.
+        compiled_net = self.model.compiled_net
+        self.model.forward(self.inputs)
+        self.assertIs(self.model.compiled_net, compiled_net)
+
+
+    def test_worker_process(self):
+        self.model.net.eval()
+        with Training_Pool(1) as pool:
+            not_compiled, outputs = pool.apply(forward_in_worker, (self.model, self.inputs))
+        # The workers are started anew every round, so they run the eager net.
+        self.assertTrue(not_compiled)
+        self.assertTrue(torch.allclose(outputs, self.model.net(self.inputs)))
+
+
+if __name__ == '__main__':
+    unittest.main()
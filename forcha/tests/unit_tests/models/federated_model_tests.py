@@ -2,11 +2,23 @@ from forcha.models.federated_model import FederatedModel
 from forcha.components.settings.settings import Settings
 import unittest
 from datasets import load_dataset
-from forcha.models.templates.mnist import MNIST_Expanded_CNN
+from forcha.models.templates.mnist import MNIST_Expanded_CNN, MNIST_MLP
 import copy
+import datasets
+import tempfile
 import numpy as np
+import torch
 from collections import OrderedDict
 
+
+def synthetic_dataset(size: int, seed: int) -> datasets.arrow_dataset.Dataset:
+    generator = np.random.default_rng(seed)
+    features = datasets.Features({'image': datasets.Image(), 'label': datasets.ClassLabel(num_classes=10)})
+    return datasets.Dataset.from_dict(
+        {'image': list(generator.integers(0, 255, (size, 28, 28), dtype=np.uint8)),
+         'label': generator.integers(0, 10, size).tolist()},
+        features=features)
+
 class TestSettingsClass(unittest.TestCase):
     
     
@@ -74,7 +86,7 @@ class TestSettingsClass(unittest.TestCase):
         for i in range(2):
             test_model.train(iteration=i, epoch=0)
         trained_weights = test_model.get_weights()
-        preserved_initial_weights = test_model.initial_model.state_dict()
+        preserved_initial_weights = test_model.initial_state_dict()
         for k in initial_weights.keys():
             self.assertTrue(np.allclose(initial_weights[k], preserved_initial_weights[k]))
             self.assertFalse(np.allclose(initial_weights[k], trained_weights[k]))
@@ -96,6 +108,13 @@ class TestSettingsClass(unittest.TestCase):
             self.assertFalse(np.allclose(initial_weights[k], trained_weights[k]))
             self.assertFalse(np.allclose(preserved_initial_weights[k], trained_weights[k]))
         
+        # Checks if the gradients are written into the provided buffer
+        buffer = torch.zeros(test_model.flat_size())
+        buffered_gradients = test_model.get_gradients(out=buffer)
+        for key in obtained_gradients.keys():
+            self.assertTrue(np.allclose(buffered_gradients[key], obtained_gradients[key]))
+            self.assertEqual(buffered_gradients[key].untyped_storage().data_ptr(), buffer.untyped_storage().data_ptr())
+        
         
     def test_footprint(self):
         train_dataset = load_dataset("mnist", split="train")
@@ -108,6 +127,64 @@ class TestSettingsClass(unittest.TestCase):
                                     local_dataset=data,
                                     node_name=0)
         _ = test_model.print_model_footprint()
+    
+    
+    def test_loader_options(self):
+        train_dataset = load_dataset("mnist", split="train[:256]")
+        test_dataset = load_dataset('mnist', split="test[:128]")
+        data = [train_dataset, test_dataset]
+        settings = Settings(sample_size=1,
+                            num_workers=2,
+                            eval_batch_size=64,
+                            prefetch_factor=4)
+        net = MNIST_Expanded_CNN()
+        test_model = FederatedModel(settings=settings,
+                                    net = net,
+                                    local_dataset=data,
+                                    node_name=0)
+        self.assertEqual(test_model.trainloader.num_workers, 2)
+        self.assertEqual(test_model.testloader.batch_size, 64)
+        self.assertEqual(test_model.testloader.prefetch_factor, 4)
+        # Only the training loader keeps its workers alive.
+        self.assertTrue(test_model.trainloader.persistent_workers)
+        self.assertFalse(test_model.testloader.persistent_workers)
+        test_model.train(iteration=0, epoch=0)
+        first_results = test_model.evaluate_model()
+        # Persistent loaders must not prevent copying the model.
+        copied_model = copy.deepcopy(test_model)
+        self.assertEqual(first_results[1], copied_model.evaluate_model()[1])
+    
+    
+    def test_quick_evaluate(self):
+        train_dataset = load_dataset("mnist", split="train[:256]")
+        test_dataset = load_dataset('mnist', split="test[:100]")
+        data = [train_dataset, test_dataset]
+        settings = Settings()
+        net = MNIST_Expanded_CNN()
+        test_model = FederatedModel(settings=settings,
+                                    net = net,
+                                    local_dataset=data,
+                                    node_name=0)
+        test_model.train(iteration=0, epoch=0)
+        quick_results = test_model.quick_evaluate()
+        # The evaluation is performed in the evaluation mode (dropout disabled).
+        self.assertFalse(test_model.net.training)
+        self.assertTrue(0 <= quick_results[1] <= 1)
+        self.assertEqual(quick_results[1], test_model.evaluate_model()[1])
+        self.assertAlmostEqual(quick_results[0], test_model.evaluate_model()[0])
+    
+    
+    def test_empty_test_set(self):
+        with tempfile.TemporaryDirectory() as root_name:
+            settings = Settings(root_name=root_name, batch_size=4, force_cpu=True)
+            test_model = FederatedModel(settings=settings,
+                                        net = MNIST_MLP(),
+                                        local_dataset=[synthetic_dataset(8, 0), synthetic_dataset(0, 1)],
+                                        node_name=0)
+            with self.assertRaises(ValueError):
+                test_model.quick_evaluate()
+            with self.assertRaises(ValueError):
+                test_model.evaluate_model()
 
 
 if __name__ == '__main__':
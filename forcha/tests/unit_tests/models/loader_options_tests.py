@@ -0,0 +1,74 @@
+from forcha.models.federated_model import FederatedModel
+from forcha.components.settings.settings import Settings
+from forcha.models.templates.mnist import MNIST_MLP
+from forcha.utils.orchestrations import Training_Pool
+import multiprocessing
+import tempfile
+import unittest
+import datasets
+
+import numpy as np
+
+
+def synthetic_dataset(size: int, seed: int) -> datasets.arrow_dataset.Dataset:
+    generator = np.random.default_rng(seed)
+    features = datasets.Features({'image': datasets.Image(), 'label': datasets.ClassLabel(num_classes=10)})
+    return datasets.Dataset.from_dict(
+        {'image': list(generator.integers(0, 255, (size, 28, 28), dtype=np.uint8)),
+         'label': generator.integers(0, 10, size).tolist()},
+        features=features)
+
+
+def applied_options(model: FederatedModel) -> tuple:
+    # Settings of the loader as seen (and used) inside the worker.
+    loader = model.trainloader
+    batches = sum(1 for _ in loader)
+    return (multiprocessing.current_process().daemon, model.loader_options(persistent=True),
+            loader.num_workers, loader.prefetch_factor, loader.persistent_workers, batches,
+            model.testloader.persistent_workers)
+
+
+class TestLoaderOptions(unittest.TestCase):
+
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        settings = Settings(root_name=self.directory.name,
+                            batch_size=4,
+                            force_cpu=True,
+                            num_workers=2,
+                            prefetch_factor=4,
+                            persistent_workers=True)
+        self.model = FederatedModel(settings=settings,
+                                    net=MNIST_MLP(),
+                                    local_dataset=[synthetic_dataset(16, 0), synthetic_dataset(8, 1)],
+                                    node_name=0)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_training_pool(self):
+        with Training_Pool(1) as pool:
+            daemon, options, num_workers, prefetch_factor, persistent_workers, batches, persistent_test = pool.apply(applied_options, (self.model,))
+        self.assertFalse(daemon)
+        self.assertEqual(options, {'num_workers': 2, 'pin_memory': False, 'persistent_workers': True, 'prefetch_factor': 4})
+        self.assertEqual((num_workers, prefetch_factor, persistent_workers), (2, 4, True))
+        self.assertEqual(batches, 4)
+        # The test loader does not keep its workers alive.
+        self.assertFalse(persistent_test)
+
+
+    def test_daemonic_pool(self):
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            daemon, options, num_workers, _, _, batches, _ = pool.apply(applied_options, (self.model,))
+        # The loader's workers can not be started, the data is loaded in the worker itself.
+        self.assertTrue(daemon)
+        self.assertEqual(options['num_workers'], 0)
+        self.assertEqual(num_workers, 0)
+        self.assertEqual(batches, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
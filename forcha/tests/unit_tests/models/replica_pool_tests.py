@@ -0,0 +1,60 @@
+import pickle
+import unittest
+
+import torch
+
+from forcha.exceptions.modelexception import ModelException
+from forcha.models.replica_pool import ReplicaPool
+from forcha.models.templates.mnist import MNIST_MLP
+
+
+class TestReplicaPool(unittest.TestCase):
+
+
+    def test_acquire_release(self):
+        net = MNIST_MLP()
+        pool = ReplicaPool(net=net, size=2)
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertIsNot(first, net)
+        self.assertEqual(pool.in_use(), 2)
+
+        pool.release(first)
+        self.assertEqual(pool.in_use(), 1)
+        # The released replica is reused by the next borrower.
+        self.assertIs(pool.acquire(), first)
+
+
+    def test_reset_on_acquire(self):
+        net = MNIST_MLP()
+        pool = ReplicaPool(net=net, size=1)
+        replica = pool.acquire()
+        with torch.no_grad():
+            for parameter in replica.parameters():
+                parameter.add_(1.0)
+        pool.release(replica)
+
+        replica = pool.acquire()
+        for key, tensor in replica.state_dict().items():
+            self.assertTrue(torch.equal(tensor, net.state_dict()[key]))
+
+
+    def test_extension(self):
+        pool = ReplicaPool(net=MNIST_MLP(), size=1)
+        pool.acquire()
+        pool.acquire()
+        self.assertEqual(len(pool), 2)
+        with self.assertRaises(ModelException):
+            pool.release(MNIST_MLP())
+
+
+    def test_pickling(self):
+        pool = ReplicaPool(net=MNIST_MLP(), size=1)
+        restored = pickle.loads(pickle.dumps(pool))
+        self.assertEqual(len(restored), 1)
+        restored.release(restored.acquire())
+
+
+if __name__ == "__main__":
+    unittest.main()
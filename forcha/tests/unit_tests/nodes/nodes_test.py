@@ -45,6 +45,28 @@ class TestSettingsClass(unittest.TestCase):
         results = test_node.train_local_model(iteration=0,
                                         mode='gradients')
         self.assertIsNotNone(results)
+    
+    
+    def test_lazy_node(self):
+        train_dataset = load_dataset("mnist", split="train[:256]")
+        test_dataset = load_dataset('mnist', split="test[:128]")
+        data = [train_dataset, test_dataset]
+        settings = Settings(lazy_nodes=True)
+        net = MNIST_Expanded_CNN()
+
+        test_node = FederatedNode(node_id=2,
+                                  settings=settings,
+                                  model=net,
+                                  data=data)
+        self.assertIsNone(test_node.model)
+        model = test_node.prepare_model(weights=net.state_dict())
+        self.assertIs(model, test_node.model)
+        results = test_node.train_local_model(iteration=0,
+                                        mode='gradients')
+        self.assertIsNotNone(results)
+        test_node.release_model()
+        self.assertIsNone(test_node.model)
+        self.assertIsNotNone(test_node.optimizer_state)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,73 @@
+import copy
+import tempfile
+import unittest
+
+import datasets
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from forcha.components.nodes.federated_node import FederatedNode
+from forcha.components.nodes.vectorized_trainer import Vectorized_Trainer
+from forcha.components.settings.settings import Settings
+from forcha.exceptions.modelexception import ModelException
+from forcha.models.federated_model import FederatedModel
+from forcha.models.templates.mnist import MNIST_CNN, MNIST_MLP
+
+
+def synthetic_dataset(size: int, seed: int) -> datasets.arrow_dataset.Dataset:
+    generator = np.random.default_rng(seed)
+    features = datasets.Features({'image': datasets.Image(), 'label': datasets.ClassLabel(num_classes=10)})
+    return datasets.Dataset.from_dict(
+        {'image': list(generator.integers(0, 255, (size, 28, 28), dtype=np.uint8)),
+         'label': generator.integers(0, 10, size).tolist()},
+        features=features)
+
+
+class TestVectorizedTrainer(unittest.TestCase):
+
+
+    def prepare_nodes(self, settings, net, sizes):
+        return [FederatedNode(node_id=node_id,
+                              settings=settings,
+                              model=net,
+                              data=[synthetic_dataset(size, seed=node_id), synthetic_dataset(8, seed=100 + node_id)])
+                for node_id, size in enumerate(sizes)]
+
+
+    def test_full_batch_step(self):
+        # With a batch larger than any of the datasets, every node performs a single
+        # full-batch step, so the results do not depend on the order of the samples.
+        with tempfile.TemporaryDirectory() as root_name:
+            settings = Settings(optimizer='SGD', batch_size=64, local_epochs=1,
+                                learning_rate=0.1, force_cpu=True, root_name=root_name)
+            net = MNIST_MLP()
+            nodes = self.prepare_nodes(settings, net, sizes=[16, 40, 64])
+            trainer = Vectorized_Trainer(net=net, settings=settings, nodes=nodes)
+            weights = copy.deepcopy(net.state_dict())
+            updates, results = trainer.train(nodes=nodes, weights=weights, iteration=0, mode='gradients')
+
+            for node in nodes:
+                data = node.train_data.with_transform(FederatedModel.transform_func)[:]
+                reference = copy.deepcopy(net)
+                loss = F.cross_entropy(reference(torch.stack(data['image'])), torch.as_tensor(data['label']))
+                loss.backward()
+                for key, parameter in reference.named_parameters():
+                    self.assertTrue(torch.allclose(updates[node.node_id][key], -0.1 * parameter.grad, atol=1e-6))
+                self.assertAlmostEqual(results[node.node_id]['loss'], loss.item(), places=5)
+                # The trained weights are loaded into the node's model.
+                trained = node.model.get_weights()
+                for key in weights:
+                    self.assertTrue(torch.allclose(trained[key], weights[key] + updates[node.node_id][key], atol=1e-6))
+
+
+    def test_unsupported(self):
+        with tempfile.TemporaryDirectory() as root_name:
+            settings = Settings(optimizer='Adam', force_cpu=True, root_name=root_name)
+            nodes = self.prepare_nodes(settings, MNIST_CNN(), sizes=[8])
+            with self.assertRaises(ModelException):
+                Vectorized_Trainer(net=MNIST_CNN(), settings=settings, nodes=nodes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
+import contextlib
 import unittest
+from unittest import mock
 import numpy as np
+import torch
 from collections import OrderedDict
-from torch import rand, zeros
+from torch import allclose, rand, sign, sqrt, zeros
 from forcha.utils.optimizers import Optimizers
 from forcha.components.settings.fedopt_settings import FedoptSettings
 import copy
@@ -271,6 +274,112 @@ class TestSettingsClass(unittest.TestCase):
             self.assertFalse((optimizer.previous_momentum[key] == last_delta[key]).all())
 
 
+    def test_implementations(self):
+        # The fused, foreach and per-layer steps follow the reference formulas.
+        layers = ['l1', 'l2', 'l3', 'l4', 'lout']
+        for global_optimizer in ['FedAdagard', 'FedYogi', 'FedAdam']:
+            for options in [{'fused': True}, {'foreach': True}, {'foreach': False}]:
+                settings = FedoptSettings(global_optimizer=global_optimizer,
+                                          global_learning_rate=0.5,
+                                          b1=0.4,
+                                          b2=0.6,
+                                          tau=0.3,
+                                          **options)
+                weights = OrderedDict((key, rand(3, 4)) for key in layers)
+                optimizer = Optimizers(weights=weights, settings=settings)
+                for _ in range(3):
+                    delta = OrderedDict((key, rand(3, 4) - 0.5) for key in layers)
+                    previous_delta = copy.deepcopy(optimizer.previous_delta)
+                    previous_momentum = copy.deepcopy(optimizer.previous_momentum)
+                    new_weights = optimizer.fed_optimize(weights=weights, delta=delta)
+                    for key in layers:
+                        current_delta = 0.4 * previous_delta[key] + 0.6 * delta[key]
+                        if global_optimizer == 'FedAdagard':
+                            current_momentum = previous_momentum[key] + current_delta ** 2
+                        elif global_optimizer == 'FedYogi':
+                            current_momentum = previous_momentum[key] - 0.4 * current_delta ** 2 * sign(previous_momentum[key] - current_delta ** 2)
+                        else:
+                            current_momentum = 0.6 * previous_momentum[key] + 0.4 * current_delta ** 2
+                        expected = weights[key] + 0.5 * current_delta / (sqrt(current_momentum) + 0.3)
+                        self.assertTrue(allclose(optimizer.previous_delta[key], current_delta, atol=1e-6))
+                        self.assertTrue(allclose(optimizer.previous_momentum[key], current_momentum, atol=1e-6))
+                        self.assertTrue(allclose(new_weights[key], expected, atol=1e-6))
+                    weights = new_weights
+
+
+    def test_without_foreach_copy(self):
+        # torch 2.0 does not provide the _foreach_copy_ and _foreach_sign_ kernels.
+        layers = ['l1', 'l2', 'l3', 'l4', 'lout']
+        weights = OrderedDict((key, rand(3, 4)) for key in layers)
+        deltas = [OrderedDict((key, rand(3, 4) - 0.5) for key in layers) for _ in range(3)]
+        for global_optimizer in ['FedAdagard', 'FedYogi', 'FedAdam']:
+            settings = FedoptSettings(global_optimizer=global_optimizer, b1=0.4, b2=0.6, tau=0.3)
+            initial_state = Optimizers(weights=weights, settings=settings).state_dict()
+            results = []
+            for patched in [False, True]:
+                kernels = mock.patch.multiple(torch, _foreach_copy_=None, _foreach_sign_=None)
+                with kernels if patched else contextlib.nullcontext():
+                    optimizer = Optimizers(weights=weights, settings=settings)
+                    optimizer.load_state_dict(initial_state)
+                    for delta in deltas:
+                        new_weights = optimizer.fed_optimize(weights=weights, delta=delta)
+                results.append((new_weights, optimizer.previous_momentum))
+            for key in layers:
+                self.assertTrue(allclose(results[0][0][key], results[1][0][key]))
+                self.assertTrue(allclose(results[0][1][key], results[1][1][key]))
+
+
+    def test_state_dict(self):
+        settings = FedoptSettings(global_optimizer='FedAdam',
+                                  b1=0.4,
+                                  b2=0.6,
+                                  tau=0.3)
+        layers = ['l1', 'l2', 'l3', 'l4', 'lout']
+        weights = OrderedDict((key, rand(3, 4)) for key in layers)
+        delta = OrderedDict((key, rand(3, 4)) for key in layers)
+        optimizer = Optimizers(weights=weights, settings=settings, device='cpu')
+        state = optimizer.state_dict()
+        expected = optimizer.fed_optimize(weights=weights, delta=delta)
+        # The saved state is independent of the buffers of the optimizer.
+        self.assertFalse(allclose(state['previous_delta']['l1'], optimizer.previous_delta['l1']))
+
+        restored = Optimizers(weights=weights, settings=settings)
+        restored.load_state_dict(state)
+        new_weights = restored.fed_optimize(weights=weights, delta=delta)
+        for key in layers:
+            self.assertTrue(allclose(new_weights[key], expected[key]))
+            self.assertTrue(allclose(restored.previous_momentum[key], optimizer.previous_momentum[key]))
+
+        with self.assertRaises(ValueError):
+            Optimizers(weights=weights, settings=FedoptSettings(global_optimizer='FedYogi')).load_state_dict(state)
+
+
+
+    @unittest.skipUnless(torch.cuda.is_available(), "Requires a CUDA device.")
+    def test_state_device(self):
+        settings = FedoptSettings(global_optimizer='FedYogi',
+                                  b1=0.4,
+                                  b2=0.6,
+                                  tau=0.3)
+        layers = ['l1', 'l2', 'l3', 'l4', 'lout']
+        weights = OrderedDict((key, rand(3, 4)) for key in layers)
+        delta = OrderedDict((key, rand(3, 4)) for key in layers)
+        for fused in (False, True):
+            settings.fused = fused
+            reference = Optimizers(weights=weights, settings=settings)
+            optimizer = Optimizers(weights=weights, settings=settings, device='cuda')
+            optimizer.load_state_dict(reference.state_dict())
+            expected = reference.fed_optimize(weights=weights, delta=delta)
+            # The state follows the (CPU) weights passed to the step.
+            new_weights = optimizer.fed_optimize(weights=weights, delta=delta)
+            self.assertEqual(optimizer.device, torch.device('cpu'))
+            for key in layers:
+                self.assertEqual(new_weights[key].device, torch.device('cpu'))
+                self.assertEqual(optimizer.previous_momentum[key].device, torch.device('cpu'))
+                self.assertTrue(allclose(new_weights[key], expected[key]))
+                self.assertTrue(allclose(optimizer.previous_momentum[key], reference.previous_momentum[key]))
+
+
 if __name__ == '__main__':
     unittest.main()
         
\ No newline at end of file
@@ -0,0 +1,40 @@
+from forcha.utils.orchestrations import Cost_Estimator
+from types import SimpleNamespace
+import unittest
+
+
+def node(node_id: int, samples: int) -> SimpleNamespace:
+    return SimpleNamespace(node_id=node_id, train_data=list(range(samples)))
+
+
+class TestCostEstimatorClass(unittest.TestCase):
+
+
+    def test_order(self):
+        estimator = Cost_Estimator()
+        nodes = [node(0, 10), node(1, 40), node(2, 20), node(3, 40)]
+        # Without measurements, the nodes are ordered by the size of their data (ties keep the sample order).
+        self.assertEqual([n.node_id for n in estimator.order(nodes)], [1, 3, 2, 0])
+        # Measured rates take over: node 0 is slow per sample.
+        estimator.record(nodes[0], 10.)
+        estimator.record(nodes[1], 4.)
+        self.assertEqual(estimator.estimate(nodes[0]), 10.)
+        self.assertEqual(estimator.estimate(nodes[1]), 4.)
+        # Unmeasured nodes get the average rate of the measured ones.
+        self.assertAlmostEqual(estimator.estimate(nodes[2]), 20 * (1. + 0.1) / 2)
+        self.assertEqual([n.node_id for n in estimator.order(nodes)], [3, 2, 0, 1])
+
+
+    def test_record(self):
+        estimator = Cost_Estimator(smoothing=0.5)
+        estimator.record(node(0, 10), 10.)
+        estimator.record(node(0, 10), 20.)
+        self.assertAlmostEqual(estimator.rates[0], 1.5)
+        # Nodes without the data held by the orchestrator count as a single sample.
+        remote = SimpleNamespace(node_id=1)
+        estimator.record(remote, 3.)
+        self.assertEqual(estimator.estimate(remote), 3.)
+
+
+if __name__ == '__main__':
+    unittest.main()
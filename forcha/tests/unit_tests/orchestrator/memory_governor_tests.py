@@ -0,0 +1,42 @@
+from forcha.utils.orchestrations import Memory_Governor
+import unittest
+from unittest import mock
+
+
+class TestMemoryGovernorClass(unittest.TestCase):
+
+
+    def test_slots(self):
+        governor = Memory_Governor(budget=1000.)
+        # A single probing task runs until the first measurement.
+        self.assertEqual(governor.slots(8), 1)
+        governor.record(300)
+        self.assertEqual(governor.slots(8), 3)
+        self.assertEqual(governor.slots(2), 2)
+        # The largest peak is kept.
+        governor.record(100)
+        self.assertEqual(governor.slots(8), 3)
+        governor.record(600)
+        self.assertEqual(governor.slots(8), 1)
+        # At least one task runs, even over the budget.
+        governor.record(5000)
+        self.assertEqual(governor.slots(8), 1)
+
+
+    def test_unmeasurable(self):
+        logger = mock.Mock()
+        governor = Memory_Governor(budget=1000., logger=logger)
+        # Without the measurements (e.g. on Windows), the budget is not enforced.
+        governor.record(None)
+        governor.record(None)
+        self.assertEqual(governor.slots(8), 8)
+        logger.warning.assert_called_once()
+
+
+    def test_budget(self):
+        with self.assertRaises(ValueError):
+            Memory_Governor(budget=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,28 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+import datasets
+import numpy as np
+import torch
 from forcha.components.orchestrator.generic_orchestrator import Orchestrator
 from forcha.components.settings.settings import Settings
+from forcha.utils.computations import Streaming_Aggregator
 from forcha.models.templates.mnist import MNIST_Expanded_CNN
+from forcha.models.templates.mnist import MNIST_MLP
 from datasets import load_dataset
 
+
+def synthetic_dataset(size: int, seed: int, label: int = None) -> datasets.arrow_dataset.Dataset:
+    generator = np.random.default_rng(seed)
+    labels = generator.integers(0, 10, size) if label is None else np.full(size, label)
+    features = datasets.Features({'image': datasets.Image(), 'label': datasets.ClassLabel(num_classes=11)})
+    return datasets.Dataset.from_dict(
+        {'image': list(generator.integers(0, 255, (size, 28, 28), dtype=np.uint8)),
+         'label': labels.tolist()},
+        features=features)
+
 class TestSettingsClass(unittest.TestCase):
     
     
@@ -46,6 +65,159 @@ class TestSettingsClass(unittest.TestCase):
         orchestrator.prepare_orchestrator(model=model, validation_data=orchestrator_data)
         orchestrator.prepare_training(nodes_data=nodes_data)
         orchestrator.train_protocol()
+    
+    
+    def test_deadline_training(self):
+        orchestrator_data = load_dataset('mnist', split="test[:128]")
+        nodes_data = [[load_dataset('mnist', split=f'train[{256 * node}:{256 * (node + 1)}]'),
+                       load_dataset('mnist', split=f'test[{64 * node}:{64 * (node + 1)}]')]
+                      for node in range(3)]
+
+        settings = Settings(number_of_nodes=3,
+                            sample_size=3,
+                            global_epochs=2,
+                            local_epochs=1)
+        model = MNIST_Expanded_CNN()
+        orchestrator = Orchestrator(settings=settings,
+                                    number_of_workers=3,
+                                    round_quota=2,
+                                    late_updates='carry',
+                                    simulated_latency={2: 60})
+        orchestrator.prepare_orchestrator(model=model, validation_data=orchestrator_data)
+        orchestrator.prepare_training(nodes_data=nodes_data)
+        orchestrator.train_protocol()
+        # The straggling node never makes it into the aggregation.
+        self.assertEqual(orchestrator.pending, {})
+        self.assertIsNone(orchestrator.deadline_pool)
+
+
+    def test_deadline_failed_node(self):
+        # Labels of the node 2 are out of the range of the model, so its training raises.
+        nodes_data = [[synthetic_dataset(32, node, label=10 if node == 2 else None), synthetic_dataset(16, 100 + node)]
+                      for node in range(3)]
+        with tempfile.TemporaryDirectory() as root_name:
+            settings = Settings(number_of_nodes=3,
+                                sample_size=3,
+                                global_epochs=2,
+                                local_epochs=1,
+                                force_cpu=True,
+                                root_name=root_name)
+            orchestrator = Orchestrator(settings=settings,
+                                        number_of_workers=3,
+                                        round_quota=3)
+            orchestrator.prepare_orchestrator(model=MNIST_MLP(), validation_data=synthetic_dataset(32, 42))
+            orchestrator.prepare_training(nodes_data=nodes_data)
+            updates, training_results = orchestrator.train_with_deadline(orchestrator.network, iteration=0)
+            # The round closes without the failed node, which can be dispatched again.
+            self.assertEqual(sorted(updates), [0, 1])
+            self.assertEqual(sorted(training_results), [0, 1])
+            self.assertEqual(orchestrator.pending, {})
+            updates, _ = orchestrator.train_with_deadline(orchestrator.network, iteration=1)
+            self.assertEqual(sorted(updates), [0, 1])
+            orchestrator.close_pool()
+
+
+    def test_streaming_window(self):
+        # The nodes arrive in the order 1, 2, 0.
+        nodes_data = [[synthetic_dataset(32, node), synthetic_dataset(16, 100 + node)] for node in range(3)]
+        for window, order in [(3, [0, 1, 2]), (0, [1, 2, 0])]:
+            with tempfile.TemporaryDirectory() as root_name:
+                settings = Settings(number_of_nodes=3,
+                                    sample_size=3,
+                                    global_epochs=1,
+                                    local_epochs=1,
+                                    force_cpu=True,
+                                    root_name=root_name)
+                orchestrator = Orchestrator(settings=settings,
+                                            streaming_aggregation=True,
+                                            streaming_window=window,
+                                            simulated_latency={0: 20, 2: 10})
+                orchestrator.prepare_orchestrator(model=MNIST_MLP(), validation_data=synthetic_dataset(32, 42))
+                orchestrator.prepare_training(nodes_data=nodes_data)
+                aggregator = Streaming_Aggregator()
+                updates, _ = orchestrator.train_sampled_nodes(orchestrator.network, iteration=0, aggregator=aggregator)
+            # The updates are folded in the order of the sample, unless more than the window wait
+            # (without the window, in the order of the arrivals).
+            expected = Streaming_Aggregator()
+            for node in order:
+                expected.fold(updates[node])
+            for key, tensor in expected.accumulator.items():
+                self.assertTrue(torch.equal(aggregator.accumulator[key], tensor))
+        with self.assertRaises(ValueError):
+            Orchestrator(settings=Settings(), streaming_window=-1)
+
+
+    def test_resume_training(self):
+        orchestrator_data = load_dataset('mnist', split="test[:128]")
+        nodes_data = [[load_dataset('mnist', split=f'train[{256 * node}:{256 * (node + 1)}]'),
+                       load_dataset('mnist', split=f'test[{64 * node}:{64 * (node + 1)}]')]
+                      for node in range(3)]
+
+        def prepare(root_name, **kwargs):
+            torch.manual_seed(42)
+            settings = Settings(number_of_nodes=3,
+                                sample_size=2,
+                                global_epochs=3,
+                                local_epochs=1,
+                                root_name=root_name)
+            orchestrator = Orchestrator(settings=settings, number_of_workers=2, **kwargs)
+            orchestrator.prepare_orchestrator(model=MNIST_Expanded_CNN(), validation_data=orchestrator_data)
+            orchestrator.prepare_training(nodes_data=[list(data) for data in nodes_data])
+            return orchestrator
+
+        with tempfile.TemporaryDirectory() as root_name:
+            reference = prepare(root_name)
+            reference.train_protocol()
+
+            # The run is interrupted during the second round (checkpointed after the first one).
+            interrupted = prepare(root_name, checkpoint_interval=1)
+            with mock.patch.object(interrupted, 'export_profile', side_effect=[None, KeyboardInterrupt]):
+                with self.assertRaises(KeyboardInterrupt):
+                    interrupted.train_protocol()
+            archive = os.path.dirname(interrupted.settings.results_path)
+
+            resumed = prepare(root_name, resume_from=archive)
+            resumed.train_protocol()
+            self.assertEqual(resumed.settings.results_path, interrupted.settings.results_path)
+            # The archive created for the resumed run is not left behind.
+            self.assertEqual(len(os.listdir(root_name)), 2)
+            for key, tensor in reference.central_model.get_weights().items():
+                self.assertTrue(torch.equal(tensor, resumed.central_model.get_weights()[key]))
+            with open(os.path.join(reference.settings.results_path, 'training_metrics.csv')) as expected, \
+                 open(os.path.join(resumed.settings.results_path, 'training_metrics.csv')) as recorded:
+                self.assertEqual(expected.read(), recorded.read())
+
+
+    def test_asynchronous_training(self):
+        orchestrator_data = load_dataset('mnist', split="test[:128]")
+        nodes_data = [[load_dataset('mnist', split=f'train[{256 * node}:{256 * (node + 1)}]'),
+                       load_dataset('mnist', split=f'test[{64 * node}:{64 * (node + 1)}]')]
+                      for node in range(3)]
+
+        def prepare(root_name, **kwargs):
+            torch.manual_seed(42)
+            settings = Settings(number_of_nodes=3,
+                                sample_size=2,
+                                global_epochs=2,
+                                local_epochs=1,
+                                root_name=root_name)
+            orchestrator = Orchestrator(settings=settings, number_of_workers=2, **kwargs)
+            orchestrator.prepare_orchestrator(model=MNIST_Expanded_CNN(), validation_data=orchestrator_data)
+            orchestrator.prepare_training(nodes_data=[list(data) for data in nodes_data])
+            return orchestrator
+
+        with tempfile.TemporaryDirectory() as root_name:
+            reference = prepare(root_name)
+            reference.train_protocol()
+            asynchronous = prepare(root_name, asynchronous=True, checkpoint_interval=1)
+            self.assertEqual(asynchronous.train_protocol(), 0)
+            # Writes in the background produce the same archive.
+            for file_name in ['training_metrics.csv', 'local_model_on_nodes.csv', 'global_model_on_nodes.csv']:
+                with open(os.path.join(reference.settings.results_path, file_name)) as expected, \
+                     open(os.path.join(asynchronous.settings.results_path, file_name)) as recorded:
+                    self.assertEqual(expected.read(), recorded.read())
+            checkpoint = os.path.join(os.path.dirname(asynchronous.settings.results_path), 'checkpoints', 'checkpoint.pt')
+            self.assertEqual(torch.load(checkpoint, weights_only=False)['iteration'], 1)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
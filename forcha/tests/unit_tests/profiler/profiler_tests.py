@@ -0,0 +1,73 @@
+from forcha.utils.profiler import Profiler, children_rss, peak_rss
+import unittest
+import tempfile
+import pickle
+import csv
+import os
+import subprocess
+import sys
+
+
+class TestProfilerClass(unittest.TestCase):
+
+
+    def test_disabled(self):
+        profiler = Profiler(enabled=False, node_name='orchestrator')
+        with profiler.phase('training', iteration=0):
+            pass
+        profiler.record(name='transport', wall_time=1.0)
+        self.assertEqual(profiler.pop_records(), [])
+
+
+    def test_phases(self):
+        profiler = Profiler(enabled=True, node_name='orchestrator')
+        with profiler.phase('training', iteration=0):
+            pass
+        profiler.record(name='transport', wall_time=1.0, node=3)
+        records = profiler.pop_records()
+        self.assertEqual([entry['phase'] for entry in records], ['training', 'transport'])
+        self.assertEqual([entry['node'] for entry in records], ['orchestrator', 3])
+        self.assertEqual(records[0]['iteration'], 0)
+        self.assertGreaterEqual(records[0]['wall_time'], 0.0)
+        self.assertEqual(profiler.pop_records(), [])
+
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "Reads the /proc file system.")
+    def test_children(self):
+        # A child process holding 256 MB (e.g. a worker of a DataLoader).
+        child = subprocess.Popen(
+            [sys.executable, '-c', "import sys, time; data = bytearray(256 * 2 ** 20); print('ready', flush=True); time.sleep(60)"],
+            stdout=subprocess.PIPE, text=True)
+        try:
+            child.stdout.readline()
+            self.assertGreaterEqual(children_rss(), 200 * 2 ** 20)
+            self.assertGreaterEqual(peak_rss(children=True) - peak_rss(), 200 * 2 ** 20)
+        finally:
+            child.kill()
+            child.wait()
+            child.stdout.close()
+
+
+    def test_pickle(self):
+        profiler = Profiler(enabled=True, node_name=1)
+        with profiler.phase('local_training', iteration=2):
+            pass
+        unpickled = pickle.loads(pickle.dumps(profiler))
+        self.assertEqual(unpickled.pop_records()[0]['phase'], 'local_training')
+
+
+    def test_export(self):
+        profiler = Profiler(enabled=True, node_name='orchestrator')
+        with tempfile.TemporaryDirectory() as path:
+            for iteration in range(2):
+                with profiler.phase('aggregation'):
+                    pass
+                profiler.export(iteration=iteration, saving_path=path)
+            with open(os.path.join(path, 'phase_profile.csv'), 'r') as csv_file:
+                rows = list(csv.DictReader(csv_file))
+        self.assertEqual([row['iteration'] for row in rows], ['0', '1'])
+        self.assertEqual(list(rows[0].keys()), Profiler.field_names)
+
+
+if __name__ == '__main__':
+    unittest.main()
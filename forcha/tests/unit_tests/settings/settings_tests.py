@@ -1,6 +1,8 @@
 import unittest
 from forcha.components.settings.settings import Settings
 import time
+import tempfile
+import os
 
 class TestSettingsClass(unittest.TestCase):
 
@@ -42,6 +44,27 @@ class TestSettingsClass(unittest.TestCase):
         self.assertEqual(test_object.optimizer, optimizer)
         self.assertEqual(test_object.nesterov, nesterov)
         self.assertEqual(test_object.batch_size, batch_size)
+    
+    
+    def test_archive(self):
+        with tempfile.TemporaryDirectory() as root_name:
+            first = Settings(root_name=root_name)
+            second = Settings(root_name=root_name)
+            # Archives created within the same second are numbered, and stay in the root directory.
+            archives = sorted(os.listdir(root_name))
+            self.assertEqual(len(archives), 2)
+            self.assertNotEqual(first.results_path, second.results_path)
+            for settings in (first, second):
+                self.assertEqual(os.path.dirname(os.path.dirname(settings.results_path)), root_name)
+            
+            # Resuming from the archive (or from its checkpoint) does not create a new one.
+            archive = os.path.dirname(first.results_path)
+            for resume_from in (archive, os.path.join(archive, 'checkpoints', 'checkpoint.pt')):
+                resumed = Settings(root_name=root_name, resume_from=resume_from)
+                self.assertEqual(resumed.results_path, first.results_path)
+                self.assertEqual(resumed.nodes_model_path, first.nodes_model_path)
+                self.assertEqual(resumed.orchestrator_model_path, first.orchestrator_model_path)
+            self.assertEqual(sorted(os.listdir(root_name)), archives)
         
         
 if __name__ == '__main__':